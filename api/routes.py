@@ -1,12 +1,175 @@
+import os
+import math
+import time
+import asyncio
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from api.schemas import QueryRequest, SessionEndRequest, ExtractUserInfoRequest, FeedbackRequest
-from api.websocket import cleanup_session
-from services.session import chat_sessions
+from api.schemas import QueryRequest, QueryBatchRequest, SessionEndRequest, ExtractUserInfoRequest, FeedbackRequest, CacheInvalidateRequest
+from api.streaming import QueueSender
+from api.websocket import cleanup_session, start_query, answer_query
+from services.session import chat_sessions, session_reaper
+from services.cache import response_cache
+from services.coalesce import request_coalescer
+from services.registry import registry
+from services.session_log import session_log_sink
+from services.scheduler import llm_scheduler
+from services.metrics import metrics
+from services.embeddings import refresh_collections
+from database.collections import collection_pointer
 from utils.helpers import extract_user_info
+from utils.log import get_logger, log_writer
 
 router = APIRouter()
+log = get_logger("http")
+
+# 한 번의 /query/batch 요청으로 받을 수 있는 최대 질문 수
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
+# /metrics에 함께 내보낼 다른 모듈의 상태 값
+metrics.callback("biblo_active_sessions", "Chat sessions in the session store", lambda: len(chat_sessions))
+metrics.stats("biblo_llm_scheduler", "LLM scheduler", llm_scheduler.get_stats, gauges=("active", "waiting"))
+metrics.stats("biblo_response_cache", "Response cache", response_cache.get_stats, gauges=("entries", "bytes"))
+metrics.stats("biblo_request_coalescer", "Identical in-flight prompt coalescing", request_coalescer.get_stats, gauges=("inflight",))
+metrics.stats("biblo_session_reaper", "Session reaper", lambda: session_reaper.stats)
+metrics.stats("biblo_session_log", "Session log sink", lambda: session_log_sink.stats)
+metrics.stats("biblo_log", "Structured log writer", lambda: log_writer.stats)
+
+async def run_query(sender: QueueSender, req: Request, payload: QueryRequest):
+    """HTTP 질문 하나를 /stream과 같은 흐름(분류 또는 추측 실행, 세션 준비, answer_query)으로 처리해 sender에 프레임 전송"""
+    started_at = time.perf_counter()
+    try:
+        if not payload.prompt:
+            await sender.send({"error": "No prompt provided", "type": "error"})
+            return
+        session = await chat_sessions.aget(payload.session_id) if payload.session_id else None
+        session, query_type, prepared, is_new_session = await start_query(req, payload.prompt, session, extract_user_info(req))
+        await sender.send({
+            "type": "session_info",
+            "session_id": session.session_id,
+            "is_new_session": is_new_session
+        })
+        await answer_query(sender, session, payload.prompt, query_type, started_at=started_at, prepared=prepared)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error("HTTP 질문 처리 오류", session_id=payload.session_id, error=str(e))
+        await sender.send({"error": str(e), "type": "error"})
+    finally:
+        sender.close()
+
+def query_result(sender: QueueSender) -> dict:
+    """run_query가 보낸 프레임을 하나의 JSON 응답으로 정리"""
+    end = sender.last_frame("message_end")
+    if end is not None:
+        session_info = sender.last_frame("session_info")
+        return {
+            "status": "success",
+            "session_id": session_info["session_id"],
+            "is_new_session": session_info["is_new_session"],
+            "user_message_id": sender.last_frame("user_message_saved")["message_id"],
+            "message_id": end["message_id"],
+            "response": end["full_response"]
+        }
+    busy = sender.last_frame("busy")
+    if busy is not None:
+        return {"status": "busy", "reason": busy["reason"], "retry_after": busy["retry_after"]}
+    error = sender.last_frame("error")
+    return {"status": "error", "message": error["error"] if error else "No response generated"}
+
+async def stream_query(sender: QueueSender, req: Request, payload: QueryRequest):
+    """질문을 처리하며 프레임을 SSE로 전송 (클라이언트가 연결을 끊으면 응답 생성 중단)
+
+    응답 전송이 시작될 때 작업을 만들므로 응답을 시작하기 전에 연결이 끊겨도 작업이 남지 않습니다.
+    """
+    task = asyncio.create_task(run_query(sender, req, payload))
+    try:
+        async for event in sender.sse_events():
+            yield event
+    finally:
+        if not task.done():
+            task.cancel()
+            log.info("클라이언트 연결 해제로 응답 생성 중단")
+
+async def wait_for_http_disconnect(req: Request):
+    """요청 본문을 읽은 뒤 클라이언트가 연결을 끊을 때까지 대기"""
+    while True:
+        message = await req.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_until_disconnect(req: Request, work) -> bool:
+    """work 코루틴을 실행하다 클라이언트가 먼저 연결을 끊으면 취소 (끝까지 실행했으면 True)"""
+    work_task = asyncio.create_task(work)
+    disconnect_task = asyncio.create_task(wait_for_http_disconnect(req))
+    try:
+        await asyncio.wait({work_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work_task.cancel()
+        raise
+    finally:
+        disconnect_task.cancel()
+    if not work_task.done():
+        work_task.cancel()
+        log.info("클라이언트 연결 해제로 응답 생성 중단")
+        await asyncio.gather(work_task, return_exceptions=True)
+        return False
+    work_task.result()
+    return True
+
+def cancelled_response() -> JSONResponse:
+    # 받을 클라이언트가 없으므로 접근 로그용 상태 코드만 남김 (499: client closed request)
+    return JSONResponse(status_code=499, content={"status": "cancelled"})
+
+@router.post("/query")
+async def query_endpoint(payload: QueryRequest, req: Request):
+    """WebSocket 없이 질문하는 API
+
+    stream이 true면 /stream과 같은 프레임(session_info, user_message_saved, message_start, token, message_end)을
+    Server-Sent Events로 보내고, false면 답변이 끝난 뒤 하나의 JSON으로 응답합니다.
+    """
+    if not payload.prompt:
+        raise HTTPException(status_code=400, detail="No prompt provided")
+    sender = QueueSender()
+    if payload.stream:
+        return StreamingResponse(
+            stream_query(sender, req, payload),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    # 답변이 끝나기 전에 클라이언트가 연결을 끊으면 응답 생성 중단
+    if not await run_until_disconnect(req, run_query(sender, req, payload)):
+        return cancelled_response()
+    result = query_result(sender)
+    if result["status"] == "busy":
+        return JSONResponse(
+            status_code=503,
+            content=result,
+            headers={"Retry-After": str(math.ceil(result["retry_after"] or 1))}
+        )
+    return JSONResponse(status_code=200 if result["status"] == "success" else 500, content=result)
+
+@router.post("/query/batch")
+async def query_batch_endpoint(payload: QueryBatchRequest, req: Request):
+    """여러 질문을 한 번에 받아 JSON으로 응답하는 API (결과는 질문 순서대로, 질문별 status 포함)
+
+    모든 질문을 동시에 처리하므로 분류, 임베딩, 벡터 검색이 각 배처에서 한 번의 배치로 묶입니다.
+    같은 session_id를 사용한 질문끼리는 스케줄러가 세션당 하나씩 차례로 답변합니다.
+    """
+    if not payload.queries:
+        raise HTTPException(status_code=400, detail="No queries provided")
+    if len(payload.queries) > QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Too many queries (max {QUERY_BATCH_MAX_SIZE})")
+    senders = [QueueSender() for _ in payload.queries]
+    
+    async def run_all():
+        await asyncio.gather(*(run_query(sender, req, query) for sender, query in zip(senders, payload.queries)))
+    
+    if not await run_until_disconnect(req, run_all()):
+        return cancelled_response()
+    return {"status": "success", "results": [query_result(sender) for sender in senders]}
 
 @router.post("/extract_user_info")
 async def extract_user_info_endpoint(payload: ExtractUserInfoRequest, req: Request):
@@ -15,12 +178,13 @@ async def extract_user_info_endpoint(payload: ExtractUserInfoRequest, req: Reque
     session_id = payload.session_id
     
     # 해당 session_id가 존재하는지 확인
-    if session_id in chat_sessions:
-        session = chat_sessions[session_id]
+    session = await chat_sessions.aget(session_id)
+    if session is not None:
         # 세션의 사용자 정보 업데이트
         session.user_ip = user_info['ip']
         session.user_os = user_info['os']
         session.user_browser = user_info['browser']
+        await chat_sessions.call(session.save)
     else:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -28,8 +192,8 @@ async def extract_user_info_endpoint(payload: ExtractUserInfoRequest, req: Reque
 async def end_session(request: SessionEndRequest):
     """채팅 세션 종료 API"""
     session_id = request.session_id
-    if session_id in chat_sessions:
-        cleanup_session(session_id)
+    if await chat_sessions.call(chat_sessions.__contains__, session_id):
+        await chat_sessions.call(cleanup_session, session_id)
         return {"status": "success", "message": "Session ended successfully"}
     else:
         return {"status": "error", "message": "Session not found"}
@@ -46,16 +210,56 @@ async def feedback_endpoint(request: FeedbackRequest):
         return {"status": "error", "message": "Invalid feedback value. Must be 0 (dislike) or 1 (like)."}
     
     # 세션 존재 여부 확인
-    if session_id not in chat_sessions:
+    session = await chat_sessions.aget(session_id)
+    if session is None:
         return {"status": "error", "message": "Session not found."}
     
     # 피드백 추가
-    session = chat_sessions[session_id]
-    if session.add_feedback(message_id, feedback_value):
+    if await chat_sessions.call(session.add_feedback, message_id, feedback_value):
         return {
             "status": "success", 
             "message": "Feedback recorded successfully.",
             "feedback_summary": session.get_feedback_summary()
         }
     else:
-        return {"status": "error", "message": "Message ID not found in this session."} 
\ No newline at end of file
+        return {"status": "error", "message": "Message ID not found in this session."}
+
+@router.post("/cache/invalidate")
+async def cache_invalidate_endpoint(request: CacheInvalidateRequest):
+    """응답 캐시 무효화 API (컬렉션 단위 또는 전체)"""
+    removed = response_cache.invalidate(request.collection)
+    return {
+        "status": "success",
+        "removed": removed,
+        "cache_stats": response_cache.get_stats()
+    }
+
+@router.post("/collections/reload")
+async def collections_reload_endpoint():
+    """컬렉션 포인터를 즉시 다시 읽어 새 컬렉션 버전으로 전환하는 API"""
+    changed = refresh_collections(force=True)
+    return {"status": "success", "changed": changed, "collections": collection_pointer.status()}
+
+@router.get("/healthz")
+async def healthz_endpoint():
+    """프로세스 생존 확인 API (컴포넌트별 로딩 상태 포함)"""
+    return {"status": "ok", "components": registry.status()}
+
+@router.get("/readyz")
+async def readyz_endpoint():
+    """모든 모델과 벡터 저장소가 로드 및 예열되었는지 확인하는 API"""
+    ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "components": registry.status()}
+    )
+
+@router.get("/sessions/stats")
+async def session_stats_endpoint():
+    """세션 수, 추정 메모리 사용량, 세션 정리 및 세션 로그 저장 카운터 조회 API"""
+    return dict(await chat_sessions.call(session_reaper.get_stats), session_log=dict(session_log_sink.stats))
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """단계별 지연 시간 히스토그램과 서버 상태 지표 조회 API (Prometheus 텍스트 형식)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
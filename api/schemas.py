@@ -1,11 +1,14 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class QueryRequest(BaseModel):
     prompt: str
     session_id: Optional[str] = None
     stream: Optional[bool] = False  # 스트리밍 모드 요청 여부
 
+class QueryBatchRequest(BaseModel):
+    queries: List[QueryRequest]  # 각 질문의 stream 값은 무시하고 JSON으로 한 번에 응답
+
 class SessionEndRequest(BaseModel):
     session_id: str
 
@@ -15,4 +18,7 @@ class ExtractUserInfoRequest(BaseModel):
 class FeedbackRequest(BaseModel):
     session_id: str
     message_id: str
-    feedback_value: int  # 1: 좋아요, 0: 싫어요 
\ No newline at end of file
+    feedback_value: int  # 1: 좋아요, 0: 싫어요
+
+class CacheInvalidateRequest(BaseModel):
+    collection: Optional[str] = None  # None이면 전체 캐시 무효화
@@ -0,0 +1,171 @@
+import os
+import json
+import asyncio
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional
+
+from fastapi import WebSocket
+
+# 토큰 프레임 병합 설정 (0이면 해당 기준 비활성화, 둘 다 0이면 토큰마다 전송)
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "30"))
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "256"))
+# SSE 연결이 유휴 상태로 끊기지 않도록 프레임이 없을 때 보내는 주석 줄 간격 (초, 0이면 보내지 않음)
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+# 사용 가능한 프레임 인코딩 (json은 항상 사용 가능)
+FRAME_ENCODINGS = ["json"]
+try:
+    import orjson
+    FRAME_ENCODINGS.append("orjson")
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+    FRAME_ENCODINGS.append("msgpack")
+except ImportError:
+    msgpack = None
+
+
+def negotiate_encoding(requested: str = None) -> str:
+    """클라이언트가 요청한 인코딩을 사용할 수 있으면 선택하고, 아니면 json 사용"""
+    return requested if requested in FRAME_ENCODINGS else "json"
+
+
+class FrameSender:
+    """협상된 인코딩으로 WebSocket 프레임을 전송
+
+    json과 orjson은 텍스트 프레임(JSON), msgpack은 바이너리 프레임으로 전송합니다.
+    여러 작업이 같은 연결로 동시에 보내도 프레임이 섞이지 않도록 전송을 직렬화합니다.
+    """
+
+    def __init__(self, websocket: WebSocket, encoding: str = "json"):
+        self.websocket = websocket
+        self.encoding = negotiate_encoding(encoding)
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self._lock = asyncio.Lock()
+
+    def encode(self, payload: dict):
+        if self.encoding == "msgpack":
+            return msgpack.packb(payload, use_bin_type=True)
+        if self.encoding == "orjson":
+            return orjson.dumps(payload).decode("utf-8")
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+    async def send(self, payload: dict):
+        data = self.encode(payload)
+        async with self._lock:
+            if isinstance(data, bytes):
+                await self.websocket.send_bytes(data)
+            else:
+                await self.websocket.send_text(data)
+        self.frames_sent += 1
+        self.bytes_sent += len(data)
+
+    async def send_text(self, text: str):
+        """인코딩 없이 텍스트 프레임 전송 (ping/pong 등)"""
+        async with self._lock:
+            await self.websocket.send_text(text)
+
+
+class QueueSender:
+    """FrameSender 대신 프레임을 큐에 쌓아 HTTP 응답(SSE 스트림 또는 JSON)으로 전달
+
+    answer_query 등 WebSocket 처리 로직을 HTTP 요청에서도 그대로 사용하기 위한 어댑터입니다.
+    close()를 호출하면 큐를 읽는 쪽에 스트림 끝을 알립니다.
+    """
+
+    encoding = "json"
+
+    def __init__(self):
+        self.frames: List[dict] = []
+        self.frames_sent = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, payload: dict):
+        self.frames.append(payload)
+        self._queue.put_nowait(payload)
+        self.frames_sent += 1
+
+    def close(self):
+        self._queue.put_nowait(None)
+
+    def last_frame(self, frame_type: str) -> Optional[dict]:
+        """지금까지 보낸 프레임 중 frame_type인 마지막 프레임"""
+        for frame in reversed(self.frames):
+            if frame.get("type") == frame_type:
+                return frame
+        return None
+
+    async def sse_events(self, keepalive: float = SSE_KEEPALIVE_SECONDS) -> AsyncGenerator[str, None]:
+        """큐의 프레임을 Server-Sent Events 형식(event: type, data: JSON)으로 변환"""
+        while True:
+            try:
+                if keepalive > 0:
+                    frame = await asyncio.wait_for(self._queue.get(), keepalive)
+                else:
+                    frame = await self._queue.get()
+            except asyncio.TimeoutError:
+                # 분류나 검색이 오래 걸려도 로드 밸런서가 연결을 끊지 않도록 주석 줄 전송
+                yield ": keepalive\n\n"
+                continue
+            if frame is None:
+                return
+            data = json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+            yield f"event: {frame.get('type', 'message')}\ndata: {data}\n\n"
+
+
+class TokenCoalescer:
+    """LLM 토큰을 모아 flush_ms마다 또는 flush_bytes 이상 쌓이면 한 프레임으로 전송"""
+
+    def __init__(
+        self,
+        send_tokens: Callable[[str], Awaitable[None]],
+        flush_ms: float = STREAM_FLUSH_MS,
+        flush_bytes: int = STREAM_FLUSH_BYTES,
+    ):
+        self.send_tokens = send_tokens
+        self.flush_delay = max(0.0, flush_ms) / 1000
+        self.flush_bytes = max(0, flush_bytes)
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, token: str):
+        if not token:
+            return
+        self._buffer.append(token)
+        self._buffered_bytes += len(token.encode("utf-8"))
+        if (self.flush_delay == 0 and self.flush_bytes == 0) or (
+            self.flush_bytes and self._buffered_bytes >= self.flush_bytes
+        ):
+            await self.flush()
+        elif self.flush_delay and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        # 연결이 끊겨 전송에 실패한 경우는 다음 전송에서 처리되므로 여기서는 예외만 회수
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    async def flush(self):
+        """버퍼에 쌓인 토큰을 즉시 전송"""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._buffered_bytes = 0
+            await self.send_tokens(text)
+
+    def cancel(self):
+        """예약된 전송을 취소하고 버퍼를 비움"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._buffer = []
+        self._buffered_bytes = 0
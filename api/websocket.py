@@ -1,112 +1,287 @@
 import uuid
 import time
-from fastapi import WebSocket, WebSocketDisconnect
-from typing import AsyncGenerator
 import json
+import asyncio
+from contextlib import aclosing
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
+from typing import AsyncGenerator, Dict, Optional
 
-from services.session import chat_sessions, ChatSession
-from services.bert import classify_type
-from services.llm import generate_streaming_response
-from utils.helpers import format_timestamp
+from services.session import chat_sessions, session_reaper, ChatSession
+from services.bert import classify
+from services.coalesce import request_coalescer
+from services.pipeline import QUERY_PIPELINE, prepare_query, remember_classification
+from services.session_log import session_log_sink
+from services.scheduler import SchedulerBusy
+from services.metrics import observe_stage, ACTIVE_WEBSOCKETS
+from api.streaming import FrameSender, TokenCoalescer
+from utils.log import get_logger
 
+log = get_logger("websocket")
 
-async def stream_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    
-    try:
-        # 초기 연결 메시지 받기
-        data = await websocket.receive_json()
-        user_prompt = data.get("prompt")
-        session_id = data.get("session_id")
-        
+
+async def create_session(connection: HTTPConnection, query_type: Optional[int], user_info: dict = None) -> ChatSession:
+    """새 채팅 세션 생성 및 등록 (user_info가 없으면 연결의 IP만 기록, query_type이 None이면 첫 질문을 분류할 때 결정)"""
+    if user_info is not None:
+        user_ip, user_os, user_browser = user_info["ip"], user_info["os"], user_info["browser"]
+    else:
         # 사용자 정보 추출 (WebSocket에서는 제한적으로만 가능)
-        user_ip = websocket.client.host if hasattr(websocket, 'client') and websocket.client else "unknown"
+        user_ip = connection.client.host if hasattr(connection, 'client') and connection.client else "unknown"
         user_os = "unknown"
         user_browser = "unknown"
-        
-        if not user_prompt:
-            await websocket.send_json({"error": "No prompt provided", "type": "error"})
-            return
-        
+    
+    new_session_id = str(uuid.uuid4())
+    session = ChatSession(
+        new_session_id, 
+        query_type, 
+        user_ip=user_ip, 
+        user_os=user_os, 
+        user_browser=user_browser
+    )
+    await chat_sessions.call(chat_sessions.__setitem__, new_session_id, session)
+    # 세션 수 상한은 정리 주기를 기다리지 않고 등록할 때마다 확인
+    await chat_sessions.call(session_reaper.enforce_max_sessions, keep=new_session_id)
+    return session
+
+def resolve_trace_id(data: dict) -> Optional[str]:
+    """요청의 trace_id를 반환 ("trace": true만 보낸 경우 서버에서 생성)"""
+    trace_id = data.get("trace_id")
+    if trace_id:
+        return str(trace_id)
+    return uuid.uuid4().hex if data.get("trace") is True else None
+
+def request_tag(request_id: str = None, trace_id: str = None) -> dict:
+    """한 요청의 프레임마다 붙일 식별자"""
+    tag = {}
+    if request_id:
+        tag["request_id"] = request_id
+    if trace_id:
+        tag["trace_id"] = trace_id
+    return tag
+
+async def start_query(connection: HTTPConnection, user_prompt: str, session: Optional[ChatSession], user_info: dict = None) -> tuple:
+    """질문의 query_type을 정하고 세션을 준비 (WebSocket과 HTTP 질문 요청이 함께 사용)
+
+    speculative 모드면 분류와 두 컬렉션 검색을 함께 미리 실행합니다 (이전 분류를 재사용할 수 있으면 분류 생략).
+    세션이 없으면 새로 만들고 (세션, query_type, prepared, 새 세션 여부)를 반환합니다.
+    """
+    prepared = None
+    if QUERY_PIPELINE == "speculative":
+        prepared = await prepare_query(user_prompt, session)
+        query_type = prepared.query_type
+    else:
         # BERT 분류기를 이용해 타입 결정
-        query_type = classify_type(user_prompt)
-        
-        # 세션 관리
-        if not session_id or session_id not in chat_sessions:
-            new_session_id = str(uuid.uuid4())
-            chat_sessions[new_session_id] = ChatSession(
-                new_session_id, 
-                query_type, 
-                user_ip=user_ip, 
-                user_os=user_os, 
-                user_browser=user_browser
-            )
-            session = chat_sessions[new_session_id]
-            
-            # 세션 정보 전송
-            await websocket.send_json({
-                "type": "session_info",
-                "session_id": new_session_id,
-                "is_new_session": True
-            })
-        else:
-            session = chat_sessions[session_id]
-            session.query_type = query_type
-        
+        query_type, _ = await classify(user_prompt)
+    
+    # 세션 관리
+    is_new_session = session is None
+    if is_new_session:
+        session = await create_session(connection, query_type, user_info)
+    else:
+        session.query_type = query_type
+    if prepared is not None:
+        remember_classification(session, prepared)
+    await chat_sessions.call(session.save)
+    return session, query_type, prepared, is_new_session
+
+async def answer_query(
+    sender: FrameSender,
+    session: ChatSession,
+    user_prompt: str,
+    query_type: int,
+    request_id: str = None,
+    sync_mode: str = None,
+    last_message_id: str = None,
+    trace_id: str = None,
+    started_at: float = None,
+    prepared=None
+):
+    """사용자 메시지 저장부터 응답 스트리밍, 응답 저장까지 질문 하나를 처리
+
+    request_id와 trace_id가 있으면 모든 프레임에 포함하여 한 연결에서 여러 질문의 프레임을 구분합니다.
+    작업이 취소되면 LLM 스트림을 즉시 닫고 응답은 저장하지 않습니다.
+    started_at(time.perf_counter)부터 첫 토큰까지의 시간은 request_ttft로 기록합니다.
+    prepared는 speculative 모드에서 미리 끝낸 분류와 검색 결과입니다.
+    """
+    tag = request_tag(request_id, trace_id)
+    if started_at is None:
+        started_at = time.perf_counter()
+    
+    # LLM 스케줄러 슬롯은 업스트림 LLM 스트림을 읽는 동안만 사용 (캐시된 응답이나 같은 질문의 스트림에 합류한 요청은 슬롯 없이 처리)
+    # 대기열이 가득 차면 스트림에서 SchedulerBusy가 발생하고 busy 프레임 전송 (응답은 저장하지 않음)
+    # 응답을 저장할 때까지 세션 정리 대상에서 제외
+    session_reaper.hold(session.session_id)
+    try:
         # 사용자 메시지 저장
-        user_message_id = session.add_message("user", user_prompt)
+        user_message_id = await chat_sessions.call(session.add_message, "user", user_prompt)
         
         # 중요: 사용자 메시지 저장 확인 메시지 전송
-        await websocket.send_json({
+        await sender.send({
             "type": "user_message_saved",
             "message_id": user_message_id,
-            "content": user_prompt
+            "content": user_prompt,
+            **tag
         })
         
         # 중요: 여기서 생성된 assistant_message_id를 사용해 저장까지 일관되게 처리
         assistant_message_id = str(uuid.uuid4())
-        await websocket.send_json({
+        await sender.send({
             "type": "message_start",
-            "message_id": assistant_message_id
+            "message_id": assistant_message_id,
+            **tag
         })
         
-        # 스트리밍 응답 생성 및 전송
-        full_response = ""
-        async for chunk in generate_streaming_response(user_prompt, session, query_type):
-            full_response += chunk
-            await websocket.send_json({
-                "type": "token",
-                "token": chunk
-            })
+        # 스트리밍 응답 생성 및 전송 (토큰을 모아 일정 시간/크기마다 한 프레임으로 전송)
+        response_parts = []
+        coalescer = TokenCoalescer(lambda text: sender.send({
+            "type": "token",
+            "token": text,
+            **tag
+        }))
+        try:
+            # 같은 질문이 동시에 진행 중이면 그 LLM 스트림에 합류 (저장은 이 세션에 따로 함)
+            async with aclosing(request_coalescer.stream(user_prompt, session, query_type, prepared)) as stream:
+                async for chunk in stream:
+                    if not response_parts:
+                        # 요청 수신(분류 포함)부터 첫 토큰까지의 시간
+                        observe_stage("request_ttft", time.perf_counter() - started_at)
+                    response_parts.append(chunk)
+                    await coalescer.add(chunk)
+            await coalescer.flush()
+        finally:
+            coalescer.cancel()
+        full_response = "".join(response_parts)
         
         # 중요: 응답 완료 시 동일한 assistant_message_id로 메시지 저장
-        session.add_message("🖥️ Biblo AI", full_response, assistant_message_id)
+        await chat_sessions.call(session.add_message, "🖥️ Biblo AI", full_response, assistant_message_id, reply_to=user_message_id)
         
         # 응답 완료 메시지 - 현재 대화 기록도 함께 전송
-        await websocket.send_json({
+        await sender.send({
             "type": "message_end",
             "message_id": assistant_message_id,
             "full_response": full_response,
-            "conversation_history": session.conversation_history  # 전체 대화 기록 포함
+            **history_payload(session, sync_mode, last_message_id),
+            **tag
+        })
+    except SchedulerBusy as e:
+        await sender.send({
+            "type": "busy",
+            "reason": e.reason,
+            "retry_after": e.retry_after,
+            **tag
         })
+    finally:
+        session_reaper.release(session.session_id)
+
+async def wait_for_disconnect(websocket: WebSocket):
+    """클라이언트가 연결을 끊거나 cancel 메시지를 보낼 때까지 대기"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        try:
+            if json.loads(message.get("text") or "{}").get("type") == "cancel":
+                return
+        except (ValueError, AttributeError):
+            pass
+
+async def stream_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    ACTIVE_WEBSOCKETS.labels(endpoint="stream").inc()
+    sender = FrameSender(websocket)
+    tag = {}
+    
+    try:
+        # 초기 연결 메시지 받기
+        data = await websocket.receive_json()
+        started_at = time.perf_counter()
+        user_prompt = data.get("prompt")
+        session_id = data.get("session_id")
+        # 요청 추적 ID (클라이언트가 보낸 경우 모든 프레임에 포함)
+        trace_id = resolve_trace_id(data)
+        tag = request_tag(trace_id=trace_id)
+        
+        # 프레임 인코딩 협상 (json, orjson, msgpack - 지원하지 않으면 json)
+        sender = FrameSender(websocket, data.get("encoding"))
+        # 대화 기록 동기화 방식 (delta면 클라이언트가 받지 못한 메시지만 전송)
+        sync_mode = data.get("sync")
+        last_message_id = data.get("last_message_id")
+        
+        if not user_prompt:
+            await sender.send({"error": "No prompt provided", "type": "error", **tag})
+            return
+        
+        session = await chat_sessions.aget(session_id) if session_id else None
+        session, query_type, prepared, is_new_session = await start_query(websocket, user_prompt, session)
+        if is_new_session:
+            # 세션 정보 전송
+            await sender.send({
+                "type": "session_info",
+                "session_id": session.session_id,
+                "is_new_session": True,
+                **tag
+            })
+        
+        # 응답 생성 중 연결이 끊기거나 cancel 메시지를 받으면 생성 중단
+        answer_task = asyncio.create_task(
+            answer_query(
+                sender, session, user_prompt, query_type,
+                sync_mode=sync_mode,
+                last_message_id=last_message_id,
+                trace_id=trace_id,
+                started_at=started_at,
+                prepared=prepared
+            )
+        )
+        disconnect_task = asyncio.create_task(wait_for_disconnect(websocket))
+        await asyncio.wait({answer_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        disconnect_task.cancel()
+        if not answer_task.done():
+            answer_task.cancel()
+            log.info("클라이언트 요청으로 응답 생성 중단", session_id=session.session_id)
+            try:
+                await answer_task
+            except asyncio.CancelledError:
+                pass
+            # cancel 메시지로 중단한 경우 알림 (연결이 끊긴 경우 전송 실패는 무시)
+            try:
+                await sender.send({"type": "cancelled", **tag})
+            except Exception:
+                pass
+        else:
+            await answer_task
         
     except WebSocketDisconnect:
-        print("클라이언트 연결 해제")
+        log.info("클라이언트 연결 해제")
     except Exception as e:
-        print(f"WebSocket 오류: {str(e)}")
-        await websocket.send_json({"error": str(e), "type": "error"})
+        log.error("WebSocket 오류", endpoint="stream", error=str(e), **tag)
+        await sender.send({"error": str(e), "type": "error", **tag})
+    finally:
+        ACTIVE_WEBSOCKETS.labels(endpoint="stream").dec()
+
+def history_payload(session: ChatSession, sync_mode: str = None, last_message_id: str = None) -> dict:
+    """프레임에 담을 대화 기록
+
+    sync_mode가 "delta"면 last_message_id 이후의 메시지(messages)와 그 기준 순번(base_seq)만 보내고,
+    base_seq가 0이면 전체 기록입니다. 그 외에는 기존 클라이언트를 위해 전체 대화 기록을 보냅니다.
+    """
+    if sync_mode == "delta":
+        base_seq, messages = session.get_messages_since(last_message_id)
+        return {
+            "sync": "delta",
+            "base_seq": base_seq,
+            "last_seq": session.last_seq,
+            "messages": messages
+        }
+    return {"conversation_history": session.conversation_history}  # 전체 대화 기록 포함
 
 # 세션 정리 함수
 def cleanup_session(session_id: str):
-    if session_id in chat_sessions:
-        session = chat_sessions[session_id]
-        print(f"세션 종료 및 정리: {session_id}")
+    session = chat_sessions.get(session_id)
+    if session is not None:
+        log.info("세션 종료 및 정리", session_id=session_id)
         
-        # 피드백 요약 정보 출력
-        feedback_summary = session.get_feedback_summary()
-        print(f"피드백 요약: {feedback_summary}")
-        
-        # 새로운 형식의 로그 출력 (포맷팅된 타임스탬프 사용)
+        # 새로운 형식의 로그 (포맷팅된 타임스탬프 사용)
         session_log = {
             "sessionID": session.session_id,
             "user_ip": session.user_ip,
@@ -114,22 +289,86 @@ def cleanup_session(session_id: str):
             "user_browser": session.user_browser,
             "session_start": session.created_at_formatted,  # 포맷팅된 타임스탬프 사용
             "session_end": session.last_interaction_formatted,  # 포맷팅된 타임스탬프 사용
+            "feedback_summary": session.get_feedback_summary(),
             "chat": session.get_chat_log()
         }
         
-        # 로그 출력
-        print("세션 로그:")
-        print(json.dumps(session_log, indent=2, ensure_ascii=False))
+        # 로그는 백그라운드에서 배치로 저장 (JSONL, SQLite 등)
+        session_log_sink.submit(session_log)
         
         # 메모리에서 세션 제거
         del chat_sessions[session_id]
 
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def handle_query_request(sender: FrameSender, session_id: str, request: dict, sync_mode: str = None):
+    """영구 연결로 들어온 질문 하나를 처리 (에러는 request_id와 trace_id를 붙여 전송)"""
+    started_at = time.perf_counter()
+    request_id = request.get("request_id")
+    user_prompt = request.get("prompt")
+    trace_id = resolve_trace_id(request)
+    tag = request_tag(request_id, trace_id)
+    try:
+        if not user_prompt:
+            await sender.send({"error": "No prompt provided", "type": "error", **tag})
+            return
+        
+        session = await chat_sessions.aget(session_id)
+        if session is None:
+            await sender.send({"type": "session_status", "status": "not_found", **tag})
+            return
+        session, query_type, prepared, _ = await start_query(None, user_prompt, session)
+        
+        await answer_query(
+            sender, session, user_prompt, query_type,
+            request_id=request_id,
+            sync_mode=request.get("sync", sync_mode),
+            last_message_id=request.get("last_message_id"),
+            trace_id=trace_id,
+            started_at=started_at,
+            prepared=prepared
+        )
+    except asyncio.CancelledError:
+        # 취소 알림 (연결이 끊긴 경우 전송 실패는 무시)
+        try:
+            await sender.send({"type": "cancelled", **tag})
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        log.error("WebSocket 오류", endpoint="ws", session_id=session_id, error=str(e), **tag)
+        await sender.send({"error": str(e), "type": "error", **tag})
+
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    sync: Optional[str] = None,
+    last_message_id: Optional[str] = None,
+    encoding: Optional[str] = None,
+    create: bool = False,
+    query_type: Optional[int] = None
+):
+    """세션당 하나의 영구 연결
+
+    ping 외에 {"type": "query", "request_id": ..., "prompt": ...} 요청을 여러 개 받아 동시에 처리하고,
+    {"type": "cancel", "request_id": ...}를 받거나 연결이 끊기면 진행 중인 응답 생성을 중단합니다.
+    진행 중인 요청과 같은 request_id의 질문은 error 프레임으로 거절합니다.
+    ?create=true로 만든 세션의 query_type은 query_type 파라미터가 없으면 첫 질문을 분류할 때 정해집니다.
+    """
     await websocket.accept()
+    sender = FrameSender(websocket, encoding)
     
     # 세션이 존재하는지 확인하고, 존재하지 않으면 상태 메시지 전송
-    if session_id not in chat_sessions:
-        await websocket.send_json({
+    session = await chat_sessions.aget(session_id)
+    if session is None and create:
+        # 영구 연결로 대화를 시작하는 클라이언트를 위해 새 세션 생성
+        session = await create_session(websocket, query_type=query_type)
+        session_id = session.session_id
+        await sender.send({
+            "type": "session_info",
+            "session_id": session_id,
+            "is_new_session": True
+        })
+    if session is None:
+        await sender.send({
             "type": "session_status",
             "status": "not_found"
         })
@@ -137,13 +376,14 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         return
     
     # 세션이 존재하면 현재 대화 기록 전송
-    session = chat_sessions[session_id]
-    await websocket.send_json({
+    await sender.send({
         "type": "session_status",
         "status": "active",
-        "conversation_history": session.conversation_history
+        **history_payload(session, sync, last_message_id)
     })
     
+    tasks: Dict[str, asyncio.Task] = {}
+    ACTIVE_WEBSOCKETS.labels(endpoint="ws").inc()
     try:
         while True:
             # 클라이언트가 연결되어 있는지 확인하기 위한 핑
@@ -151,14 +391,40 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             
             # 핑-퐁 메커니즘 구현 (연결 유지)
             if message == "ping":
-                await websocket.send_text("pong")
+                await sender.send_text("pong")
+            else:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    request = None
+                if isinstance(request, dict) and request.get("type") == "query":
+                    # 질문마다 작업을 만들어 여러 응답을 한 연결로 동시에 스트리밍
+                    request_id = request.setdefault("request_id", str(uuid.uuid4()))
+                    if request_id in tasks:
+                        # 같은 request_id로 두 응답을 섞어 보내지 않도록 거절 (진행 중인 요청은 그대로 유지)
+                        await sender.send({"error": "Duplicate request_id", "type": "error", **request_tag(request_id, resolve_trace_id(request))})
+                    else:
+                        task = asyncio.create_task(handle_query_request(sender, session_id, request, sync))
+                        tasks[request_id] = task
+                        # 끝난 작업 자신의 항목만 제거
+                        task.add_done_callback(lambda done, rid=request_id: tasks.pop(rid) if tasks.get(rid) is done else None)
+                elif isinstance(request, dict) and request.get("type") == "cancel":
+                    task = tasks.get(request.get("request_id"))
+                    if task is not None:
+                        task.cancel()
             
             # 세션이 유효한지 확인
-            if session_id in chat_sessions:
-                chat_sessions[session_id].last_interaction = time.time()
-                chat_sessions[session_id].last_interaction_formatted = format_timestamp(time.time())
+            session = await chat_sessions.aget(session_id)
+            if session is not None:
+                session.last_interaction = time.time()
+                await chat_sessions.call(session.save)
     except WebSocketDisconnect:
         # 클라이언트 연결 해제 시 세션은 유지 (즉시 정리하지 않음)
-        print(f"WebSocket 연결 해제: 세션 {session_id}는 유지됩니다")
+        log.info("WebSocket 연결 해제 (세션 유지)", session_id=session_id)
     except Exception as e:
-        print(f"WebSocket 오류: {str(e)}")
\ No newline at end of file
+        log.error("WebSocket 오류", endpoint="ws", session_id=session_id, error=str(e))
+    finally:
+        # 아무도 받지 않을 응답 생성 중단
+        for task in list(tasks.values()):
+            task.cancel()
+        ACTIVE_WEBSOCKETS.labels(endpoint="ws").dec()
@@ -0,0 +1,112 @@
+"""분류기와 임베딩 모델의 추론 백엔드(PyTorch, ONNX Runtime fp32/int8) 처리량 비교
+
+백엔드별 배치 크기별 처리량(문장/초)과 모델 로딩 시간, 로딩 후 RSS 증가량을 비교합니다.
+PyTorch 대비 분류 일치율과 임베딩 코사인 유사도는 tests/test_onnx_models.py가 아래 기준값으로 확인합니다.
+
+    python -m services.onnx_models
+    python -m benchmarks.bench_inference --backends torch onnx onnx-int8 --batch-sizes 1 16
+    python -m benchmarks.bench_inference --texts queries.txt
+"""
+import time
+import argparse
+
+from services.bert import load_bert, predict_classes
+from services.embeddings import load_embedding_model
+from benchmarks.fakes import synthetic_documents, LIBRARY_TOPICS, LIBRARY_SUBJECTS, COMPANY_TOPICS
+from benchmarks.server import rss_bytes
+
+# PyTorch 대비 최소 분류 일치율과 최소 임베딩 코사인 유사도 (ONNX 백엔드 일치도 테스트 기준)
+MIN_AGREEMENT = 0.98
+MIN_COSINE = 0.98
+
+SAMPLE_PROMPTS = [
+    "도서관 운영 시간이 어떻게 되나요?",
+    "주말에도 열람실을 이용할 수 있나요?",
+    "책을 몇 권까지 빌릴 수 있어요?",
+    "대출 기간을 연장하고 싶어요",
+    "연체료는 얼마인가요?",
+    "스터디룸 예약은 어디서 하나요?",
+    "졸업생도 도서관을 이용할 수 있나요?",
+    "전자책은 어떻게 보나요?",
+    "분실한 책은 어떻게 변상하나요?",
+    "다른 도서관 책을 빌려볼 수 있나요?",
+    "복사기는 몇 층에 있나요?",
+    "텐소프트웍스는 어떤 회사인가요?",
+    "Ten Softworks의 주요 사업은 무엇인가요?",
+    "Biblo AI는 어떤 서비스인가요?",
+    "회사 설립 연도가 궁금해요",
+    "채용 공고는 어디서 볼 수 있나요?",
+    "파트너사로 협업하려면 어떻게 해야 하나요?",
+    "고객 지원 연락처를 알려주세요",
+    "검색 엔진은 어떤 기술을 쓰나요?",
+    "안녕하세요",
+]
+
+
+def load_texts(path: str, count: int, seed: int):
+    """분류용 질문과 임베딩용 문장 목록 (path가 있으면 한 줄에 한 문장)"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts, texts
+    documents = synthetic_documents(LIBRARY_TOPICS + COMPANY_TOPICS, LIBRARY_SUBJECTS + ["텐소프트웍스", "Biblo AI"], count, seed)
+    return SAMPLE_PROMPTS, SAMPLE_PROMPTS + [source_text for _, source_text in documents]
+
+
+def throughput(fn, texts, batch_size: int, repeat: int) -> float:
+    """배치 크기별 처리량 (문장/초)"""
+    fn(texts[:batch_size])
+    start = time.perf_counter()
+    processed = 0
+    for _ in range(repeat):
+        for offset in range(0, len(texts), batch_size):
+            batch = texts[offset:offset + batch_size]
+            fn(batch)
+            processed += len(batch)
+    return processed / (time.perf_counter() - start)
+
+
+def run_backend(backend: str, prompts, documents, args) -> dict:
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    bert = load_bert(backend)
+    embeddings = load_embedding_model(backend)
+    load_time = time.perf_counter() - start
+    result = {
+        "backend": backend,
+        "load_s": load_time,
+        "rss_mb": (rss_bytes() - rss_before) / 2**20,
+        "classify_tps": {},
+        "embed_tps": {},
+    }
+    for batch_size in args.batch_sizes:
+        result["classify_tps"][batch_size] = throughput(lambda batch: predict_classes(bert, batch), prompts, batch_size, args.repeat)
+        result["embed_tps"][batch_size] = throughput(embeddings.embed_documents, documents, batch_size, args.repeat)
+    return result
+
+
+def main(args):
+    prompts, documents = load_texts(args.texts, args.documents, args.seed)
+    print(f"분류 질문 {len(prompts)}개, 임베딩 문장 {len(documents)}개, 배치 크기 {args.batch_sizes}")
+    results = [run_backend(backend, prompts, documents, args) for backend in args.backends]
+
+    header = f"{'backend':<10} {'load s':>7} {'rss MB':>8}"
+    for batch_size in args.batch_sizes:
+        header += f" {f'cls/s b{batch_size}':>11} {f'emb/s b{batch_size}':>11}"
+    print(header)
+    for result in results:
+        line = f"{result['backend']:<10} {result['load_s']:>7.1f} {result['rss_mb']:>8.0f}"
+        for batch_size in args.batch_sizes:
+            line += f" {result['classify_tps'][batch_size]:>11.1f} {result['embed_tps'][batch_size]:>11.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="추론 백엔드 처리량 비교")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--texts", default=None, help="한 줄에 한 문장씩 있는 텍스트 파일 (기본: 내장 질문과 합성 문서)")
+    parser.add_argument("--documents", type=int, default=200, help="임베딩용 합성 문서 수")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""프로세스 내 벡터 인덱스와 Milvus 검색 결과 일치도 및 지연 시간 비교
+
+milvus_demo.db의 각 컬렉션을 services.vector_index로 내보낸 뒤, 같은 질문 벡터로 두 백엔드를
+search_by_vectors로 검색해 top-k 결과(pk)가 같은지 확인하고 단건/배치 검색 지연 시간을 비교합니다.
+질문 벡터는 저장된 문서 벡터에 잡음을 더한 것과 임의의 단위 벡터를 사용하므로 임베딩 모델이 필요 없습니다.
+
+    python -m benchmarks.bench_retrieval --queries 200 --top-k 3 --batch 32
+"""
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from services.registry import registry
+from services.embeddings import MILVUS_URI, COMPANY_COLLECTION, BIBLO_COLLECTION, search_by_vectors
+from services.vector_index import export_collection, load_index
+from benchmarks.fakes import HashEmbeddings
+from benchmarks.server import percentile
+
+
+def make_queries(index, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(index.vectors)
+    dim = vectors.shape[1]
+    near = vectors[rng.integers(0, len(vectors), count // 2)] + rng.normal(0, 0.05, (count // 2, dim))
+    far = rng.normal(0, 1, (count - count // 2, dim))
+    queries = np.vstack([near, far]).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def parity(milvus_store, index, queries: np.ndarray, top_k: int) -> dict:
+    """두 백엔드의 top-k pk 목록이 순서까지 같은 비율(exact_match)과 recall@k"""
+    milvus_hits = search_by_vectors(milvus_store, queries.tolist(), top_k)
+    index_hits = search_by_vectors(index, queries.tolist(), top_k)
+    exact = 0
+    overlap = 0
+    for expected, actual in zip(milvus_hits, index_hits):
+        expected_ids = [doc.metadata.get("pk") for doc in expected]
+        actual_ids = [doc.metadata.get("pk") for doc in actual]
+        exact += int(expected_ids == actual_ids)
+        overlap += len(set(expected_ids) & set(actual_ids))
+    return {
+        "exact_match": exact / len(queries),
+        "recall_at_k": overlap / max(1, sum(len(hits) for hits in milvus_hits)),
+    }
+
+
+def measure(store, queries: np.ndarray, top_k: int, batch: int, repeat: int) -> dict:
+    single = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            search_by_vectors(store, [query.tolist()], top_k)
+            single.append((time.perf_counter() - start) * 1e6)
+    batched = []
+    for _ in range(repeat):
+        for offset in range(0, len(queries), batch):
+            chunk = queries[offset:offset + batch].tolist()
+            start = time.perf_counter()
+            search_by_vectors(store, chunk, top_k)
+            batched.append((time.perf_counter() - start) * 1e6 / len(chunk))
+    return {
+        "single_p50_us": percentile(single, 50),
+        "single_p95_us": percentile(single, 95),
+        "batched_per_query_us": percentile(batched, 50),
+    }
+
+
+def main(args):
+    from langchain_milvus import Milvus
+
+    # 벡터로만 검색하므로 임베딩 모델은 로드하지 않음
+    registry.set("embedding", HashEmbeddings())
+    directory = args.dir or tempfile.mkdtemp(prefix="biblo-vector-index-")
+    print(f"uri={args.uri} queries={args.queries} top_k={args.top_k} batch={args.batch}")
+    print(f"{'collection':<26} {'rows':>6} {'exact':>7} {'recall':>7} {'backend':>8} {'p50 us':>9} {'p95 us':>9} {'batch us/q':>11}")
+    for collection_name in args.collections:
+        export_collection(args.uri, collection_name, directory)
+        index = load_index(collection_name, directory)
+        milvus_store = Milvus(
+            embedding_function=registry.get("embedding"),
+            collection_name=collection_name,
+            connection_args={"uri": args.uri},
+        )
+        queries = make_queries(index, args.queries, args.seed)
+        match = parity(milvus_store, index, queries, args.top_k)
+        for backend, store in (("milvus", milvus_store), ("numpy", index)):
+            latency = measure(store, queries, args.top_k, args.batch, args.repeat)
+            print(
+                f"{collection_name:<26} {len(index):>6} {match['exact_match']:>7.3f} {match['recall_at_k']:>7.3f} {backend:>8} "
+                f"{latency['single_p50_us']:>9.1f} {latency['single_p95_us']:>9.1f} {latency['batched_per_query_us']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="프로세스 내 벡터 인덱스 일치도 및 지연 시간 비교")
+    parser.add_argument("--uri", default=MILVUS_URI)
+    parser.add_argument("--dir", default=None, help="인덱스를 내보낼 디렉터리 (기본: 임시 디렉터리)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("collections", nargs="*", default=[COMPANY_COLLECTION, BIBLO_COLLECTION])
+    main(parser.parse_args())
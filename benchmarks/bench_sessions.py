@@ -0,0 +1,145 @@
+"""세션 메시지 저장 구조의 메모리 사용량 및 조회 시간 벤치마크
+
+레이아웃마다 별도 하위 프로세스에서 세션 N개를 만들고 RSS 증가량(세션당 바이트)과 생성 시간을 측정합니다.
+
+- session: 실제 ChatSession (메시지 레코드, 프롬프트용 기록, 피드백 카운터 포함)
+- records: 메시지 저장 부분만 (__slots__ Message 목록 + ID 인덱스)
+- dicts: 이전 메시지 저장 구조 (포맷팅된 타임스탬프를 포함한 dict 목록 + ID 인덱스)
+
+session 레이아웃은 피드백 추가, 피드백 요약, 채팅 로그 생성 시간도 함께 측정합니다.
+
+    python -m benchmarks.bench_sessions --sessions 100000 --turns 2
+"""
+import gc
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import subprocess
+
+from benchmarks.server import rss_bytes
+
+LAYOUTS = ("session", "records", "dicts")
+
+
+def make_turns(rng: random.Random, turns: int, answer_chars: int):
+    """(질문, 답변) 목록 생성"""
+    base = "도서관 운영 시간은 평일 08:00~22:00, 주말 09:00~18:00입니다. "
+    answer = (base * (answer_chars // len(base) + 1))[:answer_chars]
+    return [(f"도서관 질문 {rng.randint(1, 1000)}번: 운영 시간이 어떻게 되나요?", answer) for _ in range(turns)]
+
+
+def build_sessions(layout: str, count: int, turns: int, answer_chars: int, seed: int) -> list:
+    from services.session import ChatSession, Message, ASSISTANT_ROLE
+    from utils.helpers import format_timestamp
+
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        conversation = make_turns(rng, turns, answer_chars)
+        if layout == "session":
+            session = ChatSession(str(uuid.uuid4()), 1)
+            for question, answer in conversation:
+                question_id = session.add_message("user", question)
+                session.add_message(ASSISTANT_ROLE, answer, reply_to=question_id)
+            sessions.append(session)
+            continue
+
+        messages, index = [], {}
+        for question, answer in conversation:
+            for role, content in (("user", question), (ASSISTANT_ROLE, answer)):
+                timestamp = time.time()
+                message_id = str(uuid.uuid4())
+                if layout == "records":
+                    message = Message(message_id, role, content, timestamp)
+                    message.seq = len(messages) + 1
+                else:
+                    message = {
+                        "id": message_id,
+                        "role": role,
+                        "content": content,
+                        "timestamp": timestamp,
+                        "timestamp_formatted": format_timestamp(timestamp),
+                        "seq": len(messages) + 1,
+                    }
+                index[message_id] = len(messages)
+                messages.append(message)
+        sessions.append((messages, index))
+    return sessions
+
+
+def measure_operations(sessions: list) -> dict:
+    """세션당 피드백 추가, 피드백 요약, 채팅 로그 생성 시간 (마이크로초)"""
+    timings = {"add_feedback_us": 0.0, "feedback_summary_us": 0.0, "chat_log_us": 0.0}
+    for session in sessions:
+        last_answer = session.messages[-1].id
+        start = time.perf_counter()
+        session.add_feedback(last_answer, 1)
+        middle = time.perf_counter()
+        session.get_feedback_summary()
+        summary_end = time.perf_counter()
+        session.get_chat_log()
+        end = time.perf_counter()
+        timings["add_feedback_us"] += (middle - start) * 1e6
+        timings["feedback_summary_us"] += (summary_end - middle) * 1e6
+        timings["chat_log_us"] += (end - summary_end) * 1e6
+    return {key: value / len(sessions) for key, value in timings.items()}
+
+
+def run_worker(args) -> dict:
+    # 모듈 import와 토크나이저 로딩이 측정에 포함되지 않도록 먼저 한 번 생성
+    build_sessions(args.worker, 1, args.turns, args.answer_chars, args.seed)
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    sessions = build_sessions(args.worker, args.sessions, args.turns, args.answer_chars, args.seed)
+    build_time = time.perf_counter() - start
+    gc.collect()
+    rss_delta = rss_bytes() - rss_before
+    result = {
+        "layout": args.worker,
+        "sessions": args.sessions,
+        "rss_mb": rss_delta / 2**20,
+        "bytes_per_session": rss_delta / args.sessions,
+        "build_s": build_time,
+    }
+    if args.worker == "session":
+        result.update(measure_operations(sessions))
+        result["estimated_bytes_per_session"] = sum(session.approx_bytes for session in sessions) / args.sessions
+    return result
+
+
+def main(args):
+    print(f"세션 {args.sessions}개, 세션당 {args.turns}턴, 답변 {args.answer_chars}자")
+    print(f"{'layout':<9} {'rss MB':>9} {'B/session':>10} {'build s':>8} {'feedback us':>12} {'summary us':>11} {'chat log us':>12} {'est B/session':>14}")
+    for layout in args.layouts:
+        # 레이아웃마다 새 프로세스에서 측정해 이전 레이아웃이 남긴 메모리의 영향을 받지 않도록 함
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_sessions", "--worker", layout,
+             "--sessions", str(args.sessions), "--turns", str(args.turns),
+             "--answer-chars", str(args.answer_chars), "--seed", str(args.seed)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{layout:<9} {result['rss_mb']:>9.1f} {result['bytes_per_session']:>10.0f} {result['build_s']:>8.2f} "
+            f"{result.get('add_feedback_us', 0):>12.2f} {result.get('feedback_summary_us', 0):>11.2f} "
+            f"{result.get('chat_log_us', 0):>12.2f} {result.get('estimated_bytes_per_session', 0):>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="세션 메시지 저장 구조 메모리 벤치마크")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=2, help="세션당 질문/답변 쌍 수")
+    parser.add_argument("--answer-chars", type=int, default=400, help="답변 길이(글자)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--worker", choices=LAYOUTS, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+    else:
+        main(args)
@@ -0,0 +1,80 @@
+"""토큰 프레임 병합 및 프레임 인코딩 벤치마크
+
+가짜 LLM 스트림을 여러 개 동시에 전송하면서 답변당 프레임 수, 전송 바이트,
+스트림당 서버 CPU 시간을 비교합니다.
+
+    python -m benchmarks.bench_streaming --streams 50 --tokens 400
+"""
+import time
+import asyncio
+import argparse
+
+from api.streaming import FrameSender, TokenCoalescer, FRAME_ENCODINGS
+
+
+class FakeWebSocket:
+    """전송된 프레임을 버리기만 하는 WebSocket"""
+
+    async def send_text(self, data: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+
+async def fake_llm_stream(tokens: int, interval: float):
+    """일정 간격으로 한국어 토큰을 내보내는 가짜 LLM"""
+    for i in range(tokens):
+        await asyncio.sleep(interval)
+        yield "도서관" if i % 3 else " 이용"
+
+
+async def run_stream(encoding: str, flush_ms: float, flush_bytes: int, tokens: int, interval: float) -> FrameSender:
+    sender = FrameSender(FakeWebSocket(), encoding)
+    coalescer = TokenCoalescer(lambda text: sender.send({"type": "token", "token": text}), flush_ms, flush_bytes)
+    response_parts = []
+    async for chunk in fake_llm_stream(tokens, interval):
+        response_parts.append(chunk)
+        await coalescer.add(chunk)
+    await coalescer.flush()
+    await sender.send({"type": "message_end", "full_response": "".join(response_parts)})
+    return sender
+
+
+async def run_case(name: str, encoding: str, flush_ms: float, flush_bytes: int, args) -> dict:
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    senders = await asyncio.gather(*(
+        run_stream(encoding, flush_ms, flush_bytes, args.tokens, args.interval) for _ in range(args.streams)
+    ))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {
+        "case": name,
+        "frames_per_answer": sum(s.frames_sent for s in senders) / len(senders),
+        "bytes_per_answer": sum(s.bytes_sent for s in senders) / len(senders),
+        "cpu_ms_per_stream": cpu * 1000 / len(senders),
+        "wall_s": wall,
+    }
+
+
+async def main(args):
+    cases = [("legacy (토큰마다 json)", "json", 0, 0)]
+    for encoding in FRAME_ENCODINGS:
+        cases.append((f"병합 {args.flush_ms}ms/{args.flush_bytes}B ({encoding})", encoding, args.flush_ms, args.flush_bytes))
+
+    print(f"streams={args.streams} tokens={args.tokens} interval={args.interval * 1000:.1f}ms")
+    print(f"{'case':<40} {'frames/answer':>14} {'bytes/answer':>13} {'cpu ms/stream':>14}")
+    for name, encoding, flush_ms, flush_bytes in cases:
+        result = await run_case(name, encoding, flush_ms, flush_bytes, args)
+        print(f"{result['case']:<40} {result['frames_per_answer']:>14.1f} {result['bytes_per_answer']:>13.0f} {result['cpu_ms_per_stream']:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="토큰 프레임 병합 벤치마크")
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--interval", type=float, default=0.002, help="토큰 간격(초)")
+    parser.add_argument("--flush-ms", type=float, default=30)
+    parser.add_argument("--flush-bytes", type=int, default=256)
+    asyncio.run(main(parser.parse_args()))
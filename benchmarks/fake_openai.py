@@ -0,0 +1,121 @@
+"""OpenAI 호환 가짜 Chat Completions 서버
+
+실제 ChatOpenAI 클라이언트와 llm_scheduler 경로(레이트 리밋, 재시도, 첫 토큰 타임아웃)를
+외부 API 없이 측정하기 위한 서버입니다. 응답 지연과 오류(429, 500, 첫 토큰 지연)를 주입할 수 있습니다.
+
+    python -m benchmarks.fake_openai --port 9100 --ttft 0.3 --fail-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=bench uvicorn main:app
+"""
+import time
+import uuid
+import json
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fakes import FakeStreamingLLM
+
+
+def create_app(
+    tokens: int = 200,
+    ttft: float = 0.3,
+    token_interval: float = 0.02,
+    fail_rate: float = 0.0,
+    fail_status: int = 429,
+    stall_rate: float = 0.0,
+    stall_seconds: float = 60.0,
+    seed: int = 0,
+) -> FastAPI:
+    """가짜 Chat Completions 앱 생성
+
+    fail_rate 비율의 요청은 fail_status 오류로, stall_rate 비율의 요청은 첫 토큰 전에
+    stall_seconds 동안 멈추도록 응답합니다.
+    """
+    app = FastAPI()
+    llm = FakeStreamingLLM(tokens, ttft, token_interval)
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "failed": 0, "stalled": 0, "completed": 0}
+
+    def chunk_payload(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats = app.state.stats
+        stats["requests"] += 1
+        model = body.get("model", "fake")
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+
+        roll = rng.random()
+        if roll < fail_rate:
+            stats["failed"] += 1
+            return JSONResponse(
+                status_code=fail_status,
+                content={"error": {"message": "injected failure", "type": "fake_error", "code": fail_status}},
+            )
+        stall = roll < fail_rate + stall_rate
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        if not body.get("stream"):
+            parts = [token async for token in llm.astream(prompt)]
+            stats["completed"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(parts), "total_tokens": len(parts)},
+            }
+
+        async def event_stream():
+            if stall:
+                stats["stalled"] += 1
+                await asyncio.sleep(stall_seconds)
+            yield chunk_payload(completion_id, model, {"role": "assistant", "content": ""})
+            async for token in llm.astream(prompt):
+                yield chunk_payload(completion_id, model, {"content": token})
+            yield chunk_payload(completion_id, model, {}, "stop")
+            yield "data: [DONE]\n\n"
+            stats["completed"] += 1
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats_endpoint():
+        return app.state.stats
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI 호환 가짜 스트리밍 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.3, help="첫 토큰 지연(초)")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="토큰 간격(초)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="오류로 응답할 요청 비율")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="첫 토큰 전에 멈출 요청 비율")
+    parser.add_argument("--stall-seconds", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.tokens, args.ttft, args.token_interval, args.fail_rate, args.fail_status,
+                   args.stall_rate, args.stall_seconds, args.seed),
+        host=args.host, port=args.port, log_level="warning",
+    )
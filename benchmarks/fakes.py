@@ -0,0 +1,167 @@
+"""벤치마크용 대체 컴포넌트
+
+외부 API나 대형 모델 없이 서버 전체 경로를 실행할 수 있도록 결정적인 가짜 LLM,
+해시 기반 임베딩, 키워드 분류기, 합성 데이터로 채운 임시 Milvus Lite DB를 제공합니다.
+install_fakes()가 registry.set()으로 실제 컴포넌트 대신 등록합니다.
+"""
+import os
+import time
+import random
+import asyncio
+import hashlib
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.registry import registry
+from services.embeddings import COMPANY_COLLECTION, BIBLO_COLLECTION
+
+# 가짜 LLM이 반복해서 내보낼 답변 문장
+FAKE_ANSWER = (
+    "비블로대학교 도서관은 평일 08:00부터 22:00까지 운영되며, 주말에는 09:00부터 18:00까지 이용할 수 있습니다. "
+    "학부생은 최대 5권을 14일 동안 대출할 수 있고, 연체료는 1일당 500원입니다. "
+)
+
+
+class FakeStreamingLLM:
+    """첫 토큰 지연(ttft)과 토큰 간격(token_interval)을 흉내 내는 결정적 스트리밍 LLM
+
+    ChatOpenAI.astream처럼 토큰을 비동기로 내보내며, 같은 프롬프트에는 항상 같은 답변을 만듭니다.
+    """
+
+    def __init__(self, tokens: int = 200, ttft: float = 0.3, token_interval: float = 0.02):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.token_interval = token_interval
+        self._pieces = [piece + " " for piece in FAKE_ANSWER.split()]
+
+    async def astream(self, prompt: str):
+        offset = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16) % len(self._pieces)
+        await asyncio.sleep(self.ttft)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield self._pieces[(offset + i) % len(self._pieces)]
+
+
+class HashEmbeddings(Embeddings):
+    """글자 2-gram을 해싱해 만든 정규화 벡터 (모델 다운로드 없이 비슷한 문장이 가까운 벡터가 됨)"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = " ".join(text.split())
+        for i in range(max(1, len(text) - 1)):
+            digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class KeywordClassifier:
+    """회사 관련 단어가 있으면 0(회사), 아니면 1(도서관)로 분류하는 BatchClassifier용 predict_fn
+
+    latency(초)를 주면 배치마다 그만큼 분류 워커 스레드를 점유해 KoELECTRA forward pass 시간을 흉내 냅니다.
+    """
+
+    COMPANY_KEYWORDS = ("텐소프트웍스", "Ten Softworks", "회사", "Biblo AI", "채용", "파트너")
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def __call__(self, prompts: List[str]) -> List[Tuple[int, float]]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return [
+            (0, 0.99) if any(keyword in prompt for keyword in self.COMPANY_KEYWORDS) else (1, 0.99)
+            for prompt in prompts
+        ]
+
+
+# 합성 문서 생성용 템플릿
+LIBRARY_TOPICS = ["운영 시간", "대출 권수", "대출 기간", "연체료", "열람실 좌석", "스터디룸 예약", "전자책", "복사 및 출력", "분실 도서", "상호대차"]
+LIBRARY_SUBJECTS = ["학부생", "대학원생", "교수", "졸업생", "외부 이용자"]
+COMPANY_TOPICS = ["설립 연도", "주요 사업", "Biblo AI", "검색 엔진", "파트너사", "채용", "연구 개발", "고객 지원", "데이터 분석", "보안 정책"]
+
+
+def synthetic_documents(topics: List[str], subjects: List[str], count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """(핵심정보, 원문) 쌍 목록 생성"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        topic = topics[i % len(topics)]
+        subject = rng.choice(subjects)
+        number = rng.randint(1, 30)
+        text = f"{subject}의 {topic} 안내 {i}: 기준 값은 {number}입니다."
+        source_text = f"{text} 자세한 내용은 {topic} 규정 제{number}조를 참고하세요. " * 3
+        documents.append((text, source_text))
+    return documents
+
+
+def seed_milvus(uri: str, embeddings: Embeddings, docs_per_collection: int = 200, seed: int = 0):
+    """임시 Milvus Lite DB에 서비스와 같은 이름과 스키마(text, vector, source_text)의 컬렉션 생성
+
+    반환값은 (회사 컬렉션 저장소, 도서관 컬렉션 저장소)입니다.
+    """
+    from langchain_milvus import Milvus
+
+    stores = []
+    for collection_name, topics, subjects in (
+        (COMPANY_COLLECTION, COMPANY_TOPICS, ["텐소프트웍스", "Ten Softworks", "Biblo AI"]),
+        (BIBLO_COLLECTION, LIBRARY_TOPICS, LIBRARY_SUBJECTS),
+    ):
+        documents = synthetic_documents(topics, subjects, docs_per_collection, seed)
+        stores.append(Milvus.from_texts(
+            [text for text, _ in documents],
+            embeddings,
+            metadatas=[{"source_text": source_text} for _, source_text in documents],
+            collection_name=collection_name,
+            connection_args={"uri": uri},
+            index_params={"index_type": "FLAT", "metric_type": "IP"},
+            search_params={"metric_type": "IP", "params": {}},
+            auto_id=True,
+            drop_old=True,
+        ))
+    return tuple(stores)
+
+
+def install_fakes(
+    workdir: str,
+    llm=None,
+    embeddings: Embeddings = None,
+    docs_per_collection: int = 200,
+    fake_classifier: bool = True,
+    classifier_latency: float = 0.0,
+):
+    """레지스트리의 컴포넌트를 벤치마크용 대체 컴포넌트로 교체
+
+    llm이 None이면 등록된 로더(ChatOpenAI)를 그대로 사용하므로, OPENAI_BASE_URL을
+    가짜 OpenAI 호환 서버로 지정해 실제 클라이언트 경로를 측정할 수 있습니다.
+    """
+    from services.bert import batch_classifier
+
+    embeddings = embeddings or HashEmbeddings()
+    company_store, biblo_store = seed_milvus(
+        os.path.join(workdir, "milvus_bench.db"), embeddings, docs_per_collection
+    )
+    registry.set("embedding", embeddings)
+    registry.set("company_store", company_store)
+    registry.set("biblo_store", biblo_store)
+    if llm is not None:
+        registry.set("llm", llm)
+    if fake_classifier:
+        classifier = KeywordClassifier(classifier_latency)
+        batch_classifier.predict_fn = classifier
+        registry.set("bert", classifier)
@@ -0,0 +1,284 @@
+"""동시 WebSocket 세션 부하 테스트
+
+대체 컴포넌트를 사용하는 벤치마크 서버(benchmarks.server)를 띄우고, N개의 세션이 동시에
+/stream으로 여러 턴의 대화를 진행하면서 TTFT, 초당 토큰 수, 전체 응답 시간과 서버의
+이벤트 루프 지연, RSS를 측정합니다. 결과는 JSON으로 저장하고 이전 결과와 비교할 수 있습니다.
+
+    python -m benchmarks.load_test --sessions 100 --turns 3
+    python -m benchmarks.load_test --sessions 100 --llm openai --compare benchmarks/results/baseline.json
+    python -m benchmarks.load_test --url ws://127.0.0.1:8100 --sessions 50   # 이미 실행 중인 서버
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import subprocess
+
+import httpx
+import websockets
+
+from benchmarks.server import percentile
+from utils.helpers import count_tokens
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+LIBRARY_QUESTIONS = [
+    "도서관 운영 시간이 어떻게 되나요?",
+    "학부생은 몇 권까지 대출할 수 있나요?",
+    "연체료는 하루에 얼마인가요?",
+    "스터디룸은 어떻게 예약하나요?",
+    "열람실 좌석은 몇 시간까지 사용할 수 있나요?",
+]
+COMPANY_QUESTIONS = [
+    "텐소프트웍스는 어떤 회사인가요?",
+    "Biblo AI의 주요 기능을 알려주세요.",
+    "텐소프트웍스의 파트너사는 어디인가요?",
+]
+
+# 비교 시 값이 작을수록 좋은 지표와 클수록 좋은 지표
+LOWER_IS_BETTER = [
+    ("ttft_ms", "p50"), ("ttft_ms", "p95"), ("ttft_ms", "p99"),
+    ("total_ms", "p50"), ("total_ms", "p95"), ("total_ms", "p99"),
+    ("server", "loop_lag_ms", "p99"), ("server", "peak_rss_mb"),
+]
+HIGHER_IS_BETTER = [("tokens_per_sec", "p50"), ("throughput_rps",)]
+
+
+def summarize(values) -> dict:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "count": len(values),
+    }
+
+
+def make_prompt(rng: random.Random, run_id: str, session_index: int, turn: int, unique: bool) -> str:
+    questions = COMPANY_QUESTIONS if rng.random() < 0.3 else LIBRARY_QUESTIONS
+    prompt = rng.choice(questions)
+    # 응답 캐시에 걸리지 않도록 실행, 세션, 턴 번호를 붙임 (같은 서버로 여러 번 실행해도 캐시되지 않음)
+    return f"{prompt} ({run_id}-{session_index}-{turn})" if unique else prompt
+
+
+async def run_turn(url: str, prompt: str, session_id: str, results: list, timeout: float):
+    record = {"ok": False, "status": "error"}
+    start = time.perf_counter()
+    first_token_at = None
+    try:
+        async with websockets.connect(f"{url}/stream", max_size=None, ping_interval=None) as ws:
+            payload = {"prompt": prompt, "sync": "delta"}
+            if session_id:
+                payload["session_id"] = session_id
+            await ws.send(json.dumps(payload))
+            while True:
+                frame = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                frame_type = frame.get("type")
+                if frame_type == "session_info":
+                    session_id = frame["session_id"]
+                elif frame_type == "token" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                elif frame_type == "message_end":
+                    end = time.perf_counter()
+                    tokens = count_tokens(frame.get("full_response", ""))
+                    stream_time = end - (first_token_at or end)
+                    record = {
+                        "ok": True,
+                        "status": "ok",
+                        "ttft_ms": ((first_token_at or end) - start) * 1000,
+                        "total_ms": (end - start) * 1000,
+                        "tokens": tokens,
+                        "tokens_per_sec": tokens / stream_time if stream_time > 0 else 0.0,
+                    }
+                    break
+                elif frame_type in ("busy", "error"):
+                    record = {"ok": False, "status": frame_type}
+                    break
+    except (asyncio.TimeoutError, OSError, websockets.WebSocketException) as e:
+        record = {"ok": False, "status": type(e).__name__}
+    results.append(record)
+    return session_id
+
+
+async def run_session(url: str, run_id: str, session_index: int, args, results: list):
+    rng = random.Random(args.seed + session_index)
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    session_id = None
+    for turn in range(args.turns):
+        prompt = make_prompt(rng, run_id, session_index, turn, not args.repeat_prompts)
+        session_id = await run_turn(url, prompt, session_id, results, args.timeout)
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, args.think_time * 2))
+
+
+def wait_until_ready(http_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{http_url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"서버가 {timeout}초 안에 준비되지 않았습니다: {http_url}")
+
+
+def start_processes(args) -> list:
+    """가짜 OpenAI 서버(--llm openai)와 벤치마크 서버를 하위 프로세스로 실행"""
+    processes = []
+    env = dict(os.environ)
+    if args.pipeline:
+        env["QUERY_PIPELINE"] = args.pipeline
+    if args.llm == "openai":
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_openai",
+            "--port", str(args.openai_port),
+            "--tokens", str(args.tokens), "--ttft", str(args.ttft), "--token-interval", str(args.token_interval),
+            "--fail-rate", str(args.fail_rate), "--stall-rate", str(args.stall_rate),
+        ]))
+        base_url = f"http://127.0.0.1:{args.openai_port}/v1"
+        env.update(OPENAI_BASE_URL=base_url, OPENAI_API_BASE=base_url, OPENAI_API_KEY="bench")
+    processes.append(subprocess.Popen([
+        sys.executable, "-m", "benchmarks.server",
+        "--port", str(args.port), "--llm", args.llm,
+        "--tokens", str(args.tokens), "--ttft", str(args.ttft), "--token-interval", str(args.token_interval),
+        "--docs", str(args.docs), "--classifier-latency", str(args.classifier_latency),
+    ] + (["--embedding-model", args.embedding_model] if args.embedding_model else []), env=env))
+    return processes
+
+
+def stop_processes(processes: list):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run_load(url: str, http_url: str, args) -> dict:
+    async with httpx.AsyncClient(base_url=http_url, timeout=10) as client:
+        await client.post("/bench/reset")
+        results: list = []
+        run_id = f"{time.time():.0f}"
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(url, run_id, i, args, results) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+        server_stats = (await client.get("/bench/stats")).json()
+        metrics_text = (await client.get("/metrics")).text
+
+    completed = [record for record in results if record["ok"]]
+    statuses = {}
+    for record in results:
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "requests": len(results),
+        "completed": len(completed),
+        "statuses": statuses,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(completed) / elapsed if elapsed else 0.0,
+        "ttft_ms": summarize([record["ttft_ms"] for record in completed]),
+        "total_ms": summarize([record["total_ms"] for record in completed]),
+        "tokens_per_sec": summarize([record["tokens_per_sec"] for record in completed]),
+        "server": server_stats,
+        "server_metrics": [line for line in metrics_text.splitlines() if line and not line.startswith("#") and "_bucket" not in line],
+    }
+
+
+def lookup(result: dict, path: tuple):
+    value = result
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> bool:
+    """이전 결과와 비교해 출력하고, tolerance 이상 나빠진 지표가 있으면 False 반환"""
+    ok = True
+    print(f"\n{'metric':<30} {'baseline':>12} {'current':>12} {'change':>9}")
+    for paths, lower_is_better in ((LOWER_IS_BETTER, True), (HIGHER_IS_BETTER, False)):
+        for path in paths:
+            old, new = lookup(baseline, path), lookup(current, path)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old == 0:
+                continue
+            change = (new - old) / old
+            regressed = change > tolerance if lower_is_better else change < -tolerance
+            ok = ok and not regressed
+            print(f"{'.'.join(path):<30} {old:>12.2f} {new:>12.2f} {change * 100:>8.1f}%{'  회귀' if regressed else ''}")
+    return ok
+
+
+def print_summary(result: dict):
+    print(f"\n요청 {result['requests']}개, 완료 {result['completed']}개, 상태 {result['statuses']}, {result['elapsed_s']:.1f}초")
+    for name in ("ttft_ms", "total_ms", "tokens_per_sec"):
+        stats = result[name]
+        print(f"{name:<16} p50={stats['p50']:.1f} p95={stats['p95']:.1f} p99={stats['p99']:.1f}")
+    lag = result["server"]["loop_lag_ms"]
+    print(f"{'loop_lag_ms':<16} p50={lag['p50']:.1f} p95={lag['p95']:.1f} p99={lag['p99']:.1f} max={lag['max']:.1f}")
+    print(f"{'rss_mb':<16} {result['server']['rss_mb']:.1f} (peak {result['server']['peak_rss_mb']:.1f})")
+    print(f"{'throughput_rps':<16} {result['throughput_rps']:.2f}")
+
+
+def main(args) -> int:
+    processes = []
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        url = f"ws://127.0.0.1:{args.port}"
+        processes = start_processes(args)
+    http_url = "http" + url[len("ws"):]
+    try:
+        wait_until_ready(http_url, args.startup_timeout)
+        result = asyncio.run(run_load(url, http_url, args))
+    finally:
+        stop_processes(processes)
+
+    print_summary(result)
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(baseline, result, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="동시 WebSocket 세션 부하 테스트")
+    parser.add_argument("--url", default=None, help="이미 실행 중인 서버 주소 (ws://host:port, /bench/* 필요)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--openai-port", type=int, default=9100)
+    parser.add_argument("--llm", choices=["fake", "openai"], default="fake")
+    parser.add_argument("--sessions", type=int, default=50, help="동시 세션 수")
+    parser.add_argument("--turns", type=int, default=3, help="세션당 질문 수")
+    parser.add_argument("--think-time", type=float, default=0.5, help="질문 사이 평균 대기 시간(초)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="세션 시작을 분산할 시간(초)")
+    parser.add_argument("--repeat-prompts", action="store_true", help="같은 질문을 반복해 응답 캐시 효과 측정")
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="가짜 OpenAI 서버의 오류 응답 비율")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="가짜 OpenAI 서버의 첫 토큰 지연 비율")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--classifier-latency", type=float, default=0.0, help="키워드 분류기의 배치당 지연 시간(초)")
+    parser.add_argument("--pipeline", choices=["serial", "speculative"], default=None, help="서버의 QUERY_PIPELINE (기본: 환경변수)")
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--timeout", type=float, default=60.0, help="프레임 수신 제한 시간(초)")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="결과 JSON 경로")
+    parser.add_argument("--compare", default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="회귀로 판단할 변화율")
+    sys.exit(main(parser.parse_args()))
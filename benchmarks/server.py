@@ -0,0 +1,140 @@
+"""대체 컴포넌트로 FastAPI 앱을 실행하는 벤치마크 서버
+
+실제 main.app을 그대로 띄우되 모델과 벡터 저장소는 benchmarks.fakes의 컴포넌트로 교체하고,
+이벤트 루프 지연과 RSS를 측정하는 /bench/stats, /bench/reset 엔드포인트를 추가합니다.
+
+    python -m benchmarks.server --port 8100 --llm fake
+    python -m benchmarks.server --port 8100 --llm openai   # OPENAI_BASE_URL의 가짜 OpenAI 서버 사용
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import deque
+
+
+def rss_bytes() -> int:
+    """현재 프로세스의 RSS (리눅스가 아니면 최대 RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values, q: float) -> float:
+    """정렬하지 않은 값 목록의 q 백분위수 (선형 보간)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LoopLagMonitor:
+    """interval마다 깨어나 예정보다 늦게 깨어난 시간(이벤트 루프 지연)을 기록"""
+
+    def __init__(self, interval: float = 0.05, max_samples: int = 100000):
+        self.interval = interval
+        self.samples = deque(maxlen=max_samples)
+        self.peak_rss = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def reset(self):
+        self.samples.clear()
+        self.peak_rss = rss_bytes()
+
+    def get_stats(self) -> dict:
+        samples = [sample * 1000 for sample in self.samples]
+        return {
+            "loop_lag_ms": {
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "max": max(samples, default=0.0),
+                "samples": len(samples),
+            },
+            "rss_mb": rss_bytes() / 1024 / 1024,
+            "peak_rss_mb": max(self.peak_rss, rss_bytes()) / 1024 / 1024,
+        }
+
+
+def create_app(args):
+    """대체 컴포넌트를 등록한 main.app 반환"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix="biblo-bench-")
+    # 세션 로그와 세션 저장소가 작업 디렉터리를 더럽히지 않도록 임시 디렉터리 사용
+    os.environ.setdefault("SESSION_LOG_BACKENDS", "jsonl")
+    os.environ.setdefault("SESSION_LOG_DIR", os.path.join(workdir, "logs"))
+    os.environ.setdefault("SESSION_DB_PATH", os.path.join(workdir, "sessions.db"))
+
+    from main import app
+    from benchmarks.fakes import FakeStreamingLLM, HashEmbeddings, install_fakes
+
+    if args.embedding_model:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=args.embedding_model)
+    else:
+        embeddings = HashEmbeddings(args.embedding_dim)
+    llm = FakeStreamingLLM(args.tokens, args.ttft, args.token_interval) if args.llm == "fake" else None
+    install_fakes(workdir, llm=llm, embeddings=embeddings, docs_per_collection=args.docs, fake_classifier=not args.real_classifier,
+                  classifier_latency=args.classifier_latency)
+
+    monitor = LoopLagMonitor(args.lag_interval)
+
+    @app.on_event("startup")
+    async def start_monitor():
+        monitor.start()
+
+    @app.get("/bench/stats")
+    async def bench_stats():
+        return monitor.get_stats()
+
+    @app.post("/bench/reset")
+    async def bench_reset():
+        monitor.reset()
+        return {"status": "success"}
+
+    print(f"벤치마크 서버 작업 디렉터리: {workdir}")
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="대체 컴포넌트를 사용하는 벤치마크 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workdir", default=None, help="임시 Milvus DB와 로그를 둘 디렉터리")
+    parser.add_argument("--llm", choices=["fake", "openai"], default="fake",
+                        help="fake: 프로세스 내 가짜 LLM, openai: ChatOpenAI (OPENAI_BASE_URL로 가짜 서버 지정)")
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    parser.add_argument("--embedding-model", default=None, help="작은 HuggingFace 임베딩 모델 (없으면 해시 임베딩)")
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--docs", type=int, default=200, help="컬렉션별 합성 문서 수")
+    parser.add_argument("--real-classifier", action="store_true", help="KoELECTRA 분류기 사용")
+    parser.add_argument("--classifier-latency", type=float, default=0.0, help="키워드 분류기의 배치당 지연 시간(초)")
+    parser.add_argument("--lag-interval", type=float, default=0.05)
+    return parser
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = build_parser().parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning", ws_ping_interval=None)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 활성 컬렉션 버전 포인터 설정
+COLLECTION_POINTER_PATH = os.getenv("COLLECTION_POINTER_PATH", "./database/milvus/collections.json")
+COLLECTION_POINTER_CHECK_INTERVAL = float(os.getenv("COLLECTION_POINTER_CHECK_INTERVAL", "5"))
+
+
+class CollectionPointer:
+    """논리 컬렉션 이름(bibliography_collection 등)을 현재 활성 버전의 (uri, 컬렉션)으로 연결하는 포인터 파일
+
+    수집 CLI(database.ingest)가 새 버전을 만든 뒤 파일 전체를 원자적으로 교체하면,
+    서버의 각 워커는 check()로 변경을 감지해 재시작 없이 새 버전으로 전환합니다.
+    포인터에 없는 컬렉션은 기본 uri의 같은 이름 컬렉션을 사용합니다.
+    """
+
+    def __init__(self, path: str = COLLECTION_POINTER_PATH, check_interval: float = COLLECTION_POINTER_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._entries: Dict[str, dict] = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, entries: Dict[str, dict]):
+        # 읽는 쪽이 중간 상태를 보지 않도록 임시 파일에 쓴 뒤 os.replace로 원자적 교체
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._load()
+
+    def _load(self):
+        try:
+            self._mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime = None
+        self._entries = self._read()
+
+    def resolve(self, name: str, default_uri: str) -> Tuple[str, str]:
+        """논리 컬렉션 이름의 활성 (uri, 컬렉션 이름)"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return default_uri, name
+        return entry["uri"], entry["collection"]
+
+    def get(self, name: str) -> Optional[dict]:
+        return self._entries.get(name)
+
+    def check(self, force: bool = False) -> List[str]:
+        """포인터 파일이 바뀌었으면 다시 읽고 활성 버전이 바뀐 논리 컬렉션 이름 목록 반환
+
+        파일 확인은 check_interval초에 한 번만 하므로 요청마다 호출해도 됩니다.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return []
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return []
+            previous = self._entries
+            self._load()
+            names = set(previous) | set(self._entries)
+            return sorted(
+                name for name in names
+                if (previous.get(name) or {}).get("version") != (self._entries.get(name) or {}).get("version")
+            )
+
+    def activate(self, name: str, uri: str, collection: str, version: str, fingerprint: str, count: int):
+        """논리 컬렉션의 활성 버전을 교체 (이전 활성 버전은 history 맨 앞에 기록)"""
+        with self._lock:
+            entries = self._read()
+            current = entries.get(name)
+            history = (current or {}).get("history", [])
+            if current is not None:
+                history = [{key: current[key] for key in ("uri", "collection", "version")}] + history
+            entries[name] = {
+                "uri": uri,
+                "collection": collection,
+                "version": version,
+                "fingerprint": fingerprint,
+                "count": count,
+                "activated_at": time.time(),
+                "history": history,
+            }
+            self._write(entries)
+
+    def prune_history(self, name: str, keep: int) -> List[dict]:
+        """활성 버전 외에 keep개를 넘는 이전 버전 기록을 제거하고 제거된 기록 반환"""
+        with self._lock:
+            entries = self._read()
+            entry = entries.get(name)
+            if entry is None:
+                return []
+            removed = entry.get("history", [])[keep:]
+            if not removed:
+                return []
+            entry["history"] = entry["history"][:keep]
+            self._write(entries)
+            return removed
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            name: {key: value for key, value in entry.items() if key != "history"}
+            for name, entry in self._entries.items()
+        }
+
+# 컬렉션 포인터 인스턴스
+collection_pointer = CollectionPointer()
@@ -0,0 +1,276 @@
+"""bibliography_collection, syllabus_collection 수집 CLI
+
+파일(.txt, .md, .jsonl)에서 문서를 스트리밍으로 읽어 청크로 나누고, 큰 배치로 임베딩해
+새 컬렉션 버전에 일괄 삽입한 뒤 컬렉션 포인터를 원자적으로 교체합니다. 실행 중인 서버는
+포인터 변경을 감지해 재시작 없이 새 버전으로 전환합니다 (POST /collections/reload로 즉시 전환 가능).
+
+청크 내용 해시로 임베딩을 캐시하므로 다시 실행하면 바뀐 청크만 임베딩하고,
+전체 내용이 활성 버전과 같으면 새 버전을 만들지 않습니다.
+
+    python -m database.ingest --collection syllabus_collection data/syllabus/
+    python -m database.ingest --collection bibliography_collection company.jsonl --notify http://localhost:8000
+
+.jsonl은 한 줄에 {"text": 핵심정보, "source_text": 원문} 레코드 하나이며, text 없이 "content"만 있으면
+content를 청크로 나눕니다. .txt와 .md는 파일 전체를 청크로 나누고 source_text에 출처 파일을 기록합니다.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from database.collections import collection_pointer
+from services.embeddings import MILVUS_URI, EMBEDDING_MODEL, EMBEDDING_BACKEND, COMPANY_COLLECTION, BIBLO_COLLECTION
+
+# 수집 설정
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "500"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "50"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_CACHE_PATH = os.getenv("INGEST_CACHE_PATH", "./database/milvus/embedding_cache.db")
+INGEST_VERSIONS_DIR = os.getenv("INGEST_VERSIONS_DIR", "./database/milvus/versions")
+INGEST_KEEP_VERSIONS = int(os.getenv("INGEST_KEEP_VERSIONS", "2"))  # 활성 버전 외에 남겨둘 이전 버전 수
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".jsonl")
+VARCHAR_MAX_LENGTH = 65535
+REMOTE_URI_PREFIXES = ("http://", "https://", "tcp://", "grpc://")
+
+
+class Chunk:
+    __slots__ = ("text", "source_text", "content_hash", "embedding_key")
+
+    def __init__(self, text: str, source_text: str):
+        self.text = text
+        self.source_text = source_text
+        # 행 내용 해시 (버전 지문 계산용)와 임베딩 캐시 키 (임베딩은 text와 모델, 추론 백엔드에만 의존)
+        self.content_hash = hashlib.sha256(f"{text}\x00{source_text}".encode("utf-8")).hexdigest()
+        self.embedding_key = hashlib.sha256(f"{EMBEDDING_MODEL}\x00{EMBEDDING_BACKEND}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """청크 텍스트 해시별 임베딩 벡터를 보관하는 SQLite 캐시"""
+
+    def __init__(self, path: str = INGEST_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for offset in range(0, len(keys), 500):
+            part = keys[offset:offset + 500]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            found.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def iter_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, filename)
+        elif path.endswith(SUPPORTED_EXTENSIONS):
+            yield path
+        else:
+            raise ValueError(f"지원하지 않는 파일 형식: {path}")
+
+
+def iter_chunks(paths: List[str], chunk_size: int, chunk_overlap: int) -> Iterator[Chunk]:
+    """파일을 하나씩 읽어 청크를 생성 (전체 문서를 메모리에 올리지 않음)"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for path in iter_files(paths):
+        source = f"출처: {os.path.basename(path)}"
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = iter([{"content": f.read(), "source_text": source}])
+            for record in records:
+                if record.get("text"):
+                    yield Chunk(record["text"], record.get("source_text", ""))
+                    continue
+                for piece in splitter.split_text(record.get("content", "")):
+                    yield Chunk(piece, record.get("source_text") or source)
+
+
+def fingerprint_chunks(chunks: Iterator[Chunk]):
+    """중복을 제외한 청크 수와 내용 지문 (청크 순서와 무관)"""
+    hashes = {chunk.content_hash for chunk in chunks}
+    digest = hashlib.sha256()
+    for content_hash in sorted(hashes):
+        digest.update(content_hash.encode("ascii"))
+    return len(hashes), digest.hexdigest()
+
+
+def version_target(base_uri: str, name: str, version: str, versions_dir: str):
+    """새 버전의 (uri, 컬렉션 이름)
+
+    Milvus Lite 파일은 한 프로세스만 열 수 있으므로 버전마다 별도 DB 파일을 만들고,
+    Milvus 서버는 같은 uri에 버전 이름을 붙인 컬렉션을 만듭니다.
+    """
+    if base_uri.startswith(REMOTE_URI_PREFIXES):
+        return base_uri, f"{name}__v{version}"
+    os.makedirs(versions_dir, exist_ok=True)
+    return os.path.join(versions_dir, f"{name}__v{version}.db"), name
+
+
+def create_collection(client, collection_name: str, dim: int):
+    """서비스 컬렉션과 같은 스키마 (pk, text, vector, source_text)와 FLAT/IP 인덱스로 컬렉션 생성"""
+    from pymilvus import MilvusClient, DataType
+
+    schema = MilvusClient.create_schema(auto_id=True, enable_dynamic_field=False)
+    schema.add_field("pk", DataType.INT64, is_primary=True)
+    schema.add_field("text", DataType.VARCHAR, max_length=VARCHAR_MAX_LENGTH)
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=dim)
+    schema.add_field("source_text", DataType.VARCHAR, max_length=VARCHAR_MAX_LENGTH)
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="vector", index_type="FLAT", metric_type="IP")
+    client.create_collection(collection_name, schema=schema, index_params=index_params)
+
+
+def drop_version(entry: dict, versions_dir: str = INGEST_VERSIONS_DIR):
+    """포인터 기록에서 밀려난 이전 버전 삭제"""
+    uri, collection_name = entry["uri"], entry["collection"]
+    if uri.startswith(REMOTE_URI_PREFIXES):
+        from pymilvus import MilvusClient
+
+        client = MilvusClient(uri=uri)
+        try:
+            client.drop_collection(collection_name)
+        finally:
+            client.close()
+    elif os.path.abspath(os.path.dirname(uri)) == os.path.abspath(versions_dir) and os.path.exists(uri):
+        # 이 CLI가 만든 버전 파일만 삭제 (기본 milvus_demo.db는 유지)
+        os.remove(uri)
+    print(f"이전 버전 삭제: {collection_name} ({uri})")
+
+
+def ingest(args) -> int:
+    name = args.collection
+    unique_count, fingerprint = fingerprint_chunks(iter_chunks(args.paths, args.chunk_size, args.chunk_overlap))
+    if unique_count == 0:
+        print("수집할 청크가 없습니다")
+        return 1
+
+    active = collection_pointer.get(name)
+    if active is not None and active.get("fingerprint") == fingerprint and not args.force:
+        print(f"변경 없음: {name} (활성 버전 {active['version']}, {active['count']}개 청크)")
+        return 0
+
+    cache = EmbeddingCache(args.cache)
+    embeddings = None
+    stats = {"chunks": 0, "duplicates": 0, "cached": 0, "embedded": 0, "inserted": 0}
+    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+    base_uri = args.uri or (active or {}).get("uri") or MILVUS_URI
+    uri, collection_name = version_target(base_uri, name, version, args.versions_dir)
+    client = None
+    try:
+        seen = set()
+        batch: List[Chunk] = []
+
+        def flush(batch: List[Chunk]):
+            nonlocal embeddings, client
+            keys = [chunk.embedding_key for chunk in batch]
+            vectors = cache.get_many(keys)
+            missing = [chunk for chunk in batch if chunk.embedding_key not in vectors]
+            stats["cached"] += len(batch) - len(missing)
+            if missing:
+                if embeddings is None:
+                    from services.embeddings import load_embedding_model
+                    embeddings = load_embedding_model()
+                new_vectors = dict(zip(
+                    [chunk.embedding_key for chunk in missing],
+                    embeddings.embed_documents([chunk.text for chunk in missing]),
+                ))
+                cache.put_many(new_vectors)
+                vectors.update(new_vectors)
+                stats["embedded"] += len(missing)
+            if args.dry_run:
+                return
+            if client is None:
+                from pymilvus import MilvusClient
+                client = MilvusClient(uri=uri)
+                create_collection(client, collection_name, len(vectors[keys[0]]))
+            client.insert(collection_name, [
+                {"text": chunk.text, "vector": vectors[chunk.embedding_key], "source_text": chunk.source_text}
+                for chunk in batch
+            ])
+            stats["inserted"] += len(batch)
+
+        for chunk in iter_chunks(args.paths, args.chunk_size, args.chunk_overlap):
+            stats["chunks"] += 1
+            if chunk.content_hash in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(chunk.content_hash)
+            batch.append(chunk)
+            if len(batch) >= args.batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        if client is not None:
+            client.flush(collection_name)
+    finally:
+        if client is not None:
+            client.close()
+        cache.close()
+
+    print(
+        f"{name}: 청크 {stats['chunks']}개 (중복 {stats['duplicates']}개), "
+        f"캐시 사용 {stats['cached']}개, 새로 임베딩 {stats['embedded']}개, 삽입 {stats['inserted']}개"
+    )
+    if args.dry_run:
+        return 0
+
+    # 새 버전으로 원자적 교체 후 오래된 버전 정리
+    collection_pointer.activate(name, uri, collection_name, version, fingerprint, stats["inserted"])
+    print(f"활성 버전 교체: {name} -> {collection_name} ({uri}, 버전 {version})")
+    for entry in collection_pointer.prune_history(name, args.keep_versions):
+        drop_version(entry, args.versions_dir)
+
+    if args.notify:
+        import httpx
+        response = httpx.post(f"{args.notify.rstrip('/')}/collections/reload", timeout=10)
+        print(f"서버 알림: {response.status_code} {response.text}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="문서를 청크로 나누고 임베딩해 새 컬렉션 버전으로 교체")
+    parser.add_argument("--collection", required=True, choices=[COMPANY_COLLECTION, BIBLO_COLLECTION])
+    parser.add_argument("paths", nargs="+", help="수집할 파일 또는 디렉터리 (.txt, .md, .jsonl)")
+    parser.add_argument("--uri", default=None, help="Milvus uri (기본: 활성 버전의 uri 또는 milvus_demo.db)")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=INGEST_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="임베딩 및 삽입 배치 크기")
+    parser.add_argument("--cache", default=INGEST_CACHE_PATH, help="임베딩 캐시 SQLite 경로")
+    parser.add_argument("--versions-dir", default=INGEST_VERSIONS_DIR, help="Milvus Lite 버전 파일 디렉터리")
+    parser.add_argument("--keep-versions", type=int, default=INGEST_KEEP_VERSIONS, help="남겨둘 이전 버전 수")
+    parser.add_argument("--force", action="store_true", help="내용이 같아도 새 버전 생성")
+    parser.add_argument("--dry-run", action="store_true", help="임베딩 캐시만 채우고 컬렉션은 만들지 않음")
+    parser.add_argument("--notify", default=None, help="전환을 바로 알릴 서버 주소 (POST /collections/reload)")
+    raise SystemExit(ingest(parser.parse_args()))
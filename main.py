@@ -1,3 +1,4 @@
+import os
 import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,6 +9,13 @@ load_dotenv()
 
 from api import api_router
 from api.websocket import stream_endpoint, websocket_endpoint
+from services.registry import registry
+from utils.log import get_logger
+
+log = get_logger("server")
+
+# 서버 시작 시 모델을 미리 로드할지 여부 (false면 첫 요청 시 로드)
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
 
 # FastAPI 애플리케이션 생성
 app = FastAPI()
@@ -32,18 +40,41 @@ app.websocket("/ws/{session_id}")(websocket_endpoint)
 @app.on_event("startup")
 async def startup_event():
     # 서버 시작 시 이벤트 핸들러
-    pass
+    # 모델과 벡터 저장소를 백그라운드에서 병렬 로드 및 예열 (/readyz로 완료 여부 확인)
+    if PRELOAD_MODELS:
+        app.state.model_init_task = asyncio.create_task(registry.initialize())
+    # 유휴 세션 정리 작업 시작 (정리되는 세션은 cleanup_session으로 처리)
+    from api.websocket import cleanup_session
+    from services.session import session_reaper
+    session_reaper.start(on_evict=cleanup_session)
 
 # 서버 종료 이벤트
 @app.on_event("shutdown")
 async def shutdown_event():
     from api.websocket import cleanup_session
-    from services.session import chat_sessions
+    from services.session import chat_sessions, session_reaper
+    from services.bert import batch_classifier
+    from services.embeddings import retrieval_executor
+    from services.session_log import session_log_sink, SESSION_LOG_SHUTDOWN_TIMEOUT
     # 서버 종료 시 이벤트 핸들러
+    await session_reaper.stop()
     # 모든 세션 정리 및 RDBMS 저장
-    sessions_to_cleanup = list(chat_sessions.keys())
-    for session_id in sessions_to_cleanup:
-        cleanup_session(session_id)
+    # 공유 저장소의 세션은 다른 워커가 계속 사용하므로 이 워커가 종료할 때 정리하지 않음
+    if not chat_sessions.shared:
+        sessions_to_cleanup = list(chat_sessions.keys())
+        for session_id in sessions_to_cleanup:
+            cleanup_session(session_id)
+    chat_sessions.close()
+    # 남은 세션 로그를 제한 시간 안에 저장
+    if not await asyncio.to_thread(session_log_sink.close, SESSION_LOG_SHUTDOWN_TIMEOUT):
+        log.warning("세션 로그 저장이 제한 시간 안에 끝나지 않았습니다", timeout=SESSION_LOG_SHUTDOWN_TIMEOUT)
+    # 배치 분류기 워커 종료
+    batch_classifier.stop(timeout=5)
+    # 검색 스레드 풀 종료
+    retrieval_executor.shutdown(wait=False, cancel_futures=True)
+    # 남은 로그 기록
+    from utils.log import log_writer, LOG_SHUTDOWN_TIMEOUT
+    await asyncio.to_thread(log_writer.close, LOG_SHUTDOWN_TIMEOUT)
 
 # 앱 실행 (개발용)
 if __name__ == "__main__":
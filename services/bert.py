@@ -1,22 +1,167 @@
-import torch
-from transformers import XLMRobertaForSequenceClassification, XLMRobertaTokenizer, ElectraForSequenceClassification, AutoTokenizer
+import os
+import time
+import queue
+import asyncio
+import threading
+from typing import Callable, List, Tuple
 
-def load_bert():
-    model_name = "vanguard-huggingface/biblo-koelectra-V1.0"
-    model = ElectraForSequenceClassification.from_pretrained(model_name)
-    tokenizer = AutoTokenizer.from_pretrained("monologg/koelectra-base-v3-discriminator")
+from services.registry import registry
+from services.metrics import stage_timer
+from utils.log import get_logger
+
+log = get_logger("classifier")
+
+# 배치 분류 설정
+CLASSIFIER_MAX_BATCH_SIZE = int(os.getenv("CLASSIFIER_MAX_BATCH_SIZE", "16"))
+CLASSIFIER_MAX_WAIT_MS = float(os.getenv("CLASSIFIER_MAX_WAIT_MS", "5"))
+
+# 추론 백엔드 설정 (torch | onnx | onnx-int8, 분류기만 따로 지정하려면 CLASSIFIER_BACKEND)
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", os.getenv("INFERENCE_BACKEND", "torch"))
+
+BERT_MODEL = "vanguard-huggingface/biblo-koelectra-V1.0"
+BERT_TOKENIZER = "monologg/koelectra-base-v3-discriminator"
+
+def load_bert(backend: str = CLASSIFIER_BACKEND):
+    if backend != "torch":
+        from services.onnx_models import INFERENCE_BACKENDS, load_onnx_classifier
+
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"지원하지 않는 추론 백엔드입니다: {backend}")
+        # ONNX 모델이 없으면 처음 로드할 때 내보낸 뒤 ONNX Runtime 세션 생성
+        return load_onnx_classifier(backend)
+
+    import torch
+    from transformers import ElectraForSequenceClassification, AutoTokenizer
+
+    model = ElectraForSequenceClassification.from_pretrained(BERT_MODEL)
+    tokenizer = AutoTokenizer.from_pretrained(BERT_TOKENIZER)
     bert_device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model.to(bert_device)
     return model, tokenizer, bert_device
 
-# BERT 모델 초기화
-BERT, BERT_TOKENIZER, BERT_DEVICE = load_bert()
+def predict_classes(bert, prompts: List[str]) -> List[Tuple[int, float]]:
+    """load_bert()로 로드한 분류기로 (클래스, 확신도) 목록 반환"""
+    from services.onnx_models import OnnxSequenceClassifier
 
-def classify_type(prompt: str) -> int:
-    inputs = BERT_TOKENIZER(prompt, return_tensors="pt", truncation=True, padding=True)
-    inputs = {key: value.to(BERT_DEVICE) for key, value in inputs.items()}
+    if isinstance(bert, OnnxSequenceClassifier):
+        return bert.predict(prompts)
+
+    import torch
+
+    model, tokenizer, device = bert
+    inputs = tokenizer(prompts, return_tensors="pt", truncation=True, padding=True)
+    inputs = {key: value.to(device) for key, value in inputs.items()}
     with torch.no_grad():
-        outputs = BERT(**inputs)
-    predicted_class = torch.argmax(outputs.logits, dim=1).item()
-    print(f"타입 분류 결과: {predicted_class}")
-    return predicted_class
\ No newline at end of file
+        outputs = model(**inputs)
+    probabilities = torch.softmax(outputs.logits, dim=1)
+    confidences, predicted = torch.max(probabilities, dim=1)
+    return [(int(c), float(p)) for c, p in zip(predicted.tolist(), confidences.tolist())]
+
+def classify_batch(prompts: List[str]) -> List[Tuple[int, float]]:
+    """여러 프롬프트를 한 번의 forward pass로 분류하여 (클래스, 확신도) 목록 반환"""
+    return predict_classes(registry.get("bert"), prompts)
+
+# BERT 모델은 처음 사용할 때 또는 서버 시작 시 로드
+registry.register("bert", load_bert, warmup=lambda _: classify_batch(["도서관 운영 시간이 어떻게 되나요?"]))
+
+def classify_type(prompt: str) -> int:
+    predicted_class, _ = classify_batch([prompt])[0]
+    log.debug("타입 분류 결과", query_type=predicted_class)
+    return predicted_class
+
+
+class BatchClassifier:
+    """프롬프트를 큐에 모아 전용 워커 스레드에서 동적 배치로 분류하는 비동기 분류기
+
+    predict_fn은 프롬프트 리스트를 받아 (클래스, 확신도) 리스트를 반환하는 함수로,
+    기본값은 KoELECTRA를 사용하는 classify_batch 입니다.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[str]], List[Tuple[int, float]]] = classify_batch,
+        max_batch_size: int = CLASSIFIER_MAX_BATCH_SIZE,
+        max_wait_ms: float = CLASSIFIER_MAX_WAIT_MS,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """워커 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="bert-batch-classifier", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """큐에 남은 요청을 처리한 뒤 워커 스레드 종료"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    async def classify(self, prompt: str) -> Tuple[int, float]:
+        """프롬프트를 분류하여 (클래스, 확신도) 반환"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((prompt, future, loop))
+        return await future
+
+    def _collect_batch(self, first) -> Tuple[list, bool]:
+        """첫 요청 이후 max_wait 동안 max_batch_size까지 요청을 모음"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect_batch(first)
+            prompts = [prompt for prompt, _, _ in batch]
+            try:
+                results = self.predict_fn(prompts)
+            except Exception as e:
+                for _, future, loop in batch:
+                    loop.call_soon_threadsafe(_set_future_exception, future, e)
+            else:
+                for (_, future, loop), result in zip(batch, results):
+                    loop.call_soon_threadsafe(_set_future_result, future, result)
+            if stopping:
+                break
+
+
+def _set_future_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+def _set_future_exception(future: asyncio.Future, exc: Exception):
+    if not future.done():
+        future.set_exception(exc)
+
+# 비동기 배치 분류기 인스턴스
+batch_classifier = BatchClassifier()
+
+async def classify(prompt: str) -> Tuple[int, float]:
+    """이벤트 루프를 막지 않고 프롬프트를 분류하여 (클래스, 확신도) 반환"""
+    with stage_timer("classification"):
+        predicted_class, confidence = await batch_classifier.classify(prompt)
+    log.debug("타입 분류 결과", query_type=predicted_class, confidence=round(confidence, 3))
+    return predicted_class, confidence
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 응답 캐시 설정
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 이전 대화 내용이 없는 질문만 캐시 (대화 맥락에 의존하는 답변 재사용 방지)
+RESPONSE_CACHE_HISTORY_FREE_ONLY = os.getenv("RESPONSE_CACHE_HISTORY_FREE_ONLY", "true").lower() == "true"
+
+
+class CacheEntry:
+    def __init__(self, query_type: int, collection: str, embedding: np.ndarray, chunks: List[str], created_at: float):
+        self.query_type = query_type
+        self.collection = collection
+        self.embedding = embedding
+        self.chunks = chunks
+        self.created_at = created_at
+        self.size = embedding.nbytes + sum(sys.getsizeof(chunk) for chunk in chunks) + 256
+
+
+class _EmbeddingMatrix:
+    """query_type 하나의 정규화된 임베딩을 연속된 행렬로 모아 한 번의 행렬 곱으로 채점
+
+    keys[i]가 matrix의 i번째 행 항목의 키이며, 삭제할 때는 마지막 행을 빈자리로 옮겨 연속성을 유지합니다.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, vector: np.ndarray):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                grown = np.empty((row * 2, self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key: str):
+        row = self.rows.pop(key)
+        last_key = self.keys.pop()
+        if last_key != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+
+    def best(self, vector: np.ndarray):
+        """(가장 가까운 항목의 키, 코사인 유사도) 반환"""
+        scores = self.matrix[:len(self.keys)] @ vector
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+class ResponseCache:
+    """query_type + 질문 임베딩으로 LLM 응답을 재사용하는 시맨틱 캐시
+
+    동일한 임베딩이면 정확히 일치(exact hit), 아니면 같은 query_type의 항목 중
+    코사인 유사도가 threshold 이상인 가장 가까운 항목을 반환합니다.
+    LRU 순서와 TTL로 만료시키고, 전체 크기가 max_bytes를 넘으면 오래된 항목부터 제거합니다.
+    유사도 검색은 query_type별 임베딩 행렬에 대한 행렬 곱 한 번과 argmax로 처리하고,
+    TTL 만료는 생성 순서 큐의 앞쪽만 확인합니다.
+    """
+
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._matrices: Dict[int, _EmbeddingMatrix] = {}
+        # (생성 시각, 키, 항목)을 생성 순서로 보관 (교체되거나 제거된 항목은 만료 확인 때 건너뜀)
+        self._expiry: "deque[tuple]" = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _key(query_type: int, embedding: np.ndarray) -> str:
+        return f"{query_type}:{hashlib.sha1(embedding.tobytes()).hexdigest()}"
+
+    def lookup(self, query_type: int, embedding) -> Optional[List[str]]:
+        """캐시된 응답 청크 목록 반환 (없으면 None)"""
+        vector = self._normalize(embedding)
+        key = self._key(query_type, vector)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry.chunks
+
+            matrix = self._matrices.get(query_type)
+            if not matrix or matrix.matrix.shape[1] != vector.shape[0]:
+                self.stats["misses"] += 1
+                return None
+            best_key, best_score = matrix.best(vector)
+            if best_score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return self._entries[best_key].chunks
+
+    def store(self, query_type: int, collection: str, embedding, chunks: List[str]):
+        """LLM 응답 청크를 캐시에 저장"""
+        vector = self._normalize(embedding)
+        key = self._key(query_type, vector)
+        entry = CacheEntry(query_type, collection, vector, list(chunks), time.monotonic())
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            matrix = self._matrices.get(query_type)
+            if matrix is not None and matrix.matrix.shape[1] != vector.shape[0]:
+                # 임베딩 차원이 바뀌었으면(모델 교체) 이전 항목은 더 이상 비교할 수 없으므로 제거
+                for old_key in list(matrix.keys):
+                    self._remove(old_key)
+                matrix = None
+            if matrix is None:
+                matrix = self._matrices[query_type] = _EmbeddingMatrix(vector.shape[0])
+            self._entries[key] = entry
+            matrix.add(key, vector)
+            self._expiry.append((entry.created_at, key, entry))
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+            self._compact_expiry()
+
+    def invalidate(self, collection: str = None) -> int:
+        """컬렉션 단위로 캐시 무효화 (collection이 None이면 전체), 제거된 항목 수 반환"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if collection is None or entry.collection == collection]
+            for key in keys:
+                self._remove(key)
+            self._compact_expiry()
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._matrices[entry.query_type].remove(key)
+        self._bytes -= entry.size
+
+    def _expire(self, now: float):
+        # TTL이 모든 항목에 같으므로 생성 순서 큐의 앞쪽부터 만료된 항목만 확인
+        while self._expiry and now - self._expiry[0][0] >= self.ttl:
+            _, key, entry = self._expiry.popleft()
+            if self._entries.get(key) is entry:
+                self._remove(key)
+                self.stats["evictions"] += 1
+
+    def _compact_expiry(self):
+        # 용량 초과나 무효화로 제거된 항목이 큐에 많이 남으면 살아 있는 항목만으로 다시 구성
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = deque(sorted(
+                ((entry.created_at, key, entry) for key, entry in self._entries.items()),
+                key=lambda item: item[0],
+            ))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+# 응답 캐시 인스턴스
+response_cache = ResponseCache()
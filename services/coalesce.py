@@ -0,0 +1,132 @@
+import os
+import asyncio
+import unicodedata
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from services.llm import generate_streaming_response
+from utils.log import get_logger
+
+log = get_logger("coalesce")
+
+# 동일 질문 요청 병합 설정
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+# 이전 대화 내용이 없는 질문만 병합 (대화 맥락이 다른 세션끼리 답변을 공유하지 않음)
+COALESCE_HISTORY_FREE_ONLY = os.getenv("COALESCE_HISTORY_FREE_ONLY", "true").lower() == "true"
+
+CoalesceKey = Tuple[int, str, bool]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """병합 키용 질문 정규화 (유니코드 정규화, 공백 정리, 대소문자와 끝 문장부호 무시)"""
+    text = " ".join(unicodedata.normalize("NFKC", prompt).split()).casefold()
+    return text.rstrip(" ?!.~")
+
+
+class InflightStream:
+    """업스트림 스트림 하나의 출력을 버퍼에 쌓으며 여러 구독자에게 전달"""
+
+    def __init__(self, key: CoalesceKey):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None  # 업스트림 스트림이 실패한 경우 구독자마다 다시 발생
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def publish(self, chunk: str = None):
+        if chunk is not None:
+            self.chunks.append(chunk)
+        # 기다리는 구독자를 모두 깨우고 다음 청크를 위한 새 이벤트로 교체
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait(self):
+        await self._updated.wait()
+
+
+class RequestCoalescer:
+    """같은 질문이 동시에 여러 번 들어오면 LLM 스트림 하나를 여러 요청이 나눠 받는 single-flight 병합
+
+    키는 (query_type, 정규화한 질문, 이전 대화 없음 여부)입니다. 처음 요청한 세션의 검색과 LLM 스트림을
+    백그라운드 작업으로 실행하고, 나중에 합류한 요청은 지금까지 받은 청크를 처음부터 다시 받은 뒤
+    이후 청크를 함께 받습니다. 메시지 저장은 각 요청이 자기 세션에 따로 합니다.
+    구독자가 모두 떠나면 업스트림 스트림을 닫습니다.
+    """
+
+    def __init__(self, history_free_only: bool = COALESCE_HISTORY_FREE_ONLY):
+        self.history_free_only = history_free_only
+        self._inflight: Dict[CoalesceKey, InflightStream] = {}
+        self.stats = {"leaders": 0, "joined": 0, "bypassed": 0, "replayed_chunks": 0, "upstream_cancelled": 0}
+
+    def _start(self, key: CoalesceKey, prompt: str, session, query_type: int, prepared) -> InflightStream:
+        flight = InflightStream(key)
+        self._inflight[key] = flight
+        flight.task = asyncio.create_task(self._produce(flight, prompt, session, query_type, prepared))
+        return flight
+
+    async def _produce(self, flight: InflightStream, prompt: str, session, query_type: int, prepared):
+        try:
+            async with aclosing(generate_streaming_response(prompt, session, query_type, prepared)) as stream:
+                async for chunk in stream:
+                    flight.publish(chunk)
+        except Exception as e:
+            # 백그라운드 작업에 남기지 않고 구독자가 버퍼를 다 받은 뒤 각자 다시 발생시키도록 보관
+            flight.error = e
+        finally:
+            # 완료(또는 취소) 후 새 요청은 새 스트림을 시작 (완료된 답변은 응답 캐시가 처리)
+            if self._inflight.get(flight.key) is flight:
+                del self._inflight[flight.key]
+            flight.done = True
+            flight.publish()
+
+    async def stream(self, prompt: str, session, query_type: int, prepared=None) -> AsyncGenerator[str, None]:
+        """generate_streaming_response와 같은 청크를 내보내되 같은 질문의 진행 중인 스트림이 있으면 합류"""
+        history_free = len(session.messages) <= 1
+        if not COALESCE_ENABLED or (self.history_free_only and not history_free):
+            self.stats["bypassed"] += 1
+            async with aclosing(generate_streaming_response(prompt, session, query_type, prepared)) as stream:
+                async for chunk in stream:
+                    yield chunk
+            return
+
+        key = (query_type, normalize_prompt(prompt), history_free)
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.stats["leaders"] += 1
+            flight = self._start(key, prompt, session, query_type, prepared)
+        else:
+            self.stats["joined"] += 1
+            self.stats["replayed_chunks"] += len(flight.chunks)
+            log.info("🔗 진행 중인 동일 질문 스트림에 합류", subscribers=flight.subscribers + 1, buffered_chunks=len(flight.chunks))
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    chunk = flight.chunks[position]
+                    position += 1
+                    yield chunk
+                elif flight.done:
+                    if flight.error is not None:
+                        # 잘린 답변이 정상 응답으로 저장되지 않도록 실패를 그대로 전달
+                        raise flight.error
+                    break
+                else:
+                    await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 아무도 받지 않는 업스트림 스트림 중단
+                self.stats["upstream_cancelled"] += 1
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, inflight=len(self._inflight))
+
+# 요청 병합 인스턴스
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,160 @@
+import os
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from services.metrics import metrics
+from utils.helpers import count_tokens, truncate_tokens
+from utils.log import get_logger
+
+log = get_logger("context")
+
+# 검색 결과 컨텍스트 조립 설정
+CONTEXT_ASSEMBLY = os.getenv("CONTEXT_ASSEMBLY", "true").lower() == "true"  # false면 상위 3개 결과를 그대로 연결
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))  # 중복 제거 전에 가져올 후보 수
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "3"))  # 프롬프트에 넣을 최대 청크 수
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # 컨텍스트 전체 토큰 예산
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1에 가까울수록 관련도, 0에 가까울수록 다양성 우선
+CONTEXT_DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.95"))  # 이미 고른 청크와 코사인 유사도가 이 이상이면 제외
+CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "32"))  # 잘라서 넣을 때 남은 예산이 이보다 작으면 생략
+# 기존 방식(상위 3개 결과를 그대로 연결)과 비교한 토큰 수
+BASELINE_TOP_K = 3
+
+CONTEXT_TOKENS = metrics.counter(
+    "biblo_context_tokens_total",
+    "Context tokens the previous top-3 concatenation would have sent (baseline) and the tokens actually packed into prompts",
+    labelnames=("kind",),
+)
+CONTEXT_CHUNKS = metrics.counter(
+    "biblo_context_chunks_total",
+    "Retrieved candidate chunks by what context assembly did with them",
+    labelnames=("outcome",),
+)
+
+# 문장 경계 (마침표/물음표/느낌표 뒤 공백, 줄바꿈)
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def format_chunk(document) -> str:
+    """검색 결과 하나를 프롬프트용 텍스트로 변환 (build_context와 같은 형식)"""
+    return f"핵심정보: {document.page_content} \n{document.metadata.get('source_text', '')}"
+
+
+def mmr_select(query_vector: Sequence[float], vectors, k: int, lambda_mult: float = CONTEXT_MMR_LAMBDA,
+               duplicate_similarity: float = CONTEXT_DUPLICATE_SIMILARITY) -> tuple:
+    """MMR(Maximal Marginal Relevance)로 후보 중 k개 선택
+
+    질문과의 관련도와 이미 고른 청크와의 유사도를 함께 고려하고,
+    이미 고른 청크와 거의 같은 후보는 제외합니다. (선택한 행 번호 목록, 제외한 중복 수) 반환
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if len(matrix) == 0 or k <= 0:
+        return [], 0
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+
+    selected: List[int] = []
+    remaining = list(range(len(matrix)))
+    duplicates = 0
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = int(np.argmax(scores))
+        candidate = remaining.pop(best)
+        if selected and redundancy[best] >= duplicate_similarity:
+            duplicates += 1
+            continue
+        selected.append(candidate)
+    return selected, duplicates
+
+
+def truncate_sentences(text: str, max_tokens: int) -> str:
+    """max_tokens 안에 들어가는 앞쪽 문장들만 남기기 (첫 문장도 들어가지 않으면 첫 문장을 토큰 단위로 자름)"""
+    sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+    kept, used = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence + " ")
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if not kept and sentences:
+        return truncate_tokens(sentences[0], max_tokens - 1).strip()
+    return " ".join(kept)
+
+
+def pack_chunks(documents: list, budget: int = CONTEXT_TOKEN_BUDGET, min_chunk_tokens: int = CONTEXT_MIN_CHUNK_TOKENS) -> tuple:
+    """순서대로 청크를 토큰 예산 안에 채우고, 몫을 넘는 청크는 문장 단위로 잘라 넣기 (첫 문장부터 몫을 넘으면 토큰 단위로 자름)
+
+    각 청크의 몫은 남은 예산을 남은 청크 수로 나눈 값이라 긴 원문 하나가 예산을 모두 차지하지 않고,
+    앞 청크가 짧으면 남은 예산은 뒤 청크가 사용합니다. (청크 텍스트 목록, 사용한 토큰 수, 잘린 청크 수) 반환
+    """
+    chunks, used, truncated = [], 0, 0
+    for position, document in enumerate(documents):
+        allowance = (budget - used) // (len(documents) - position)
+        if allowance < min_chunk_tokens:
+            continue
+        chunk = format_chunk(document)
+        tokens = count_tokens(chunk + "\n")
+        if tokens > allowance:
+            header = f"핵심정보: {document.page_content} \n"
+            body = truncate_sentences(document.metadata.get("source_text", ""), allowance - count_tokens(header))
+            if not body:
+                continue
+            chunk = header + body
+            tokens = count_tokens(chunk + "\n")
+            truncated += 1
+        chunks.append(chunk)
+        used += tokens
+    return chunks, used, truncated
+
+
+def assemble_context(query_vector: Optional[Sequence[float]], documents: list, vectors=None, title: str = "") -> str:
+    """과다 조회한 검색 결과에서 MMR로 중복을 제거하고 토큰 예산에 맞춰 컨텍스트 문자열 생성
+
+    vectors는 documents와 같은 순서의 문서 벡터입니다 (없으면 검색 순서대로 같은 텍스트만 제거).
+    기존 방식(상위 3개를 그대로 연결) 대비 줄어든 토큰 수를 요청마다 기록합니다.
+    """
+    if vectors is not None and query_vector is not None and len(documents) > 0:
+        order, duplicates = mmr_select(query_vector, vectors, CONTEXT_MAX_CHUNKS)
+        selected = [documents[i] for i in order]
+    else:
+        seen, selected, duplicates = set(), [], 0
+        for document in documents:
+            chunk = format_chunk(document)
+            if chunk in seen:
+                duplicates += 1
+                continue
+            seen.add(chunk)
+            if len(selected) < CONTEXT_MAX_CHUNKS:
+                selected.append(document)
+
+    chunks, packed_tokens, truncated = pack_chunks(selected)
+    baseline_tokens = count_tokens("\n".join(format_chunk(document) for document in documents[:BASELINE_TOP_K]))
+    context = "\n".join(chunks)
+
+    CONTEXT_TOKENS.labels(kind="baseline").inc(baseline_tokens)
+    CONTEXT_TOKENS.labels(kind="packed").inc(packed_tokens)
+    CONTEXT_CHUNKS.labels(outcome="packed").inc(len(chunks) - truncated)
+    CONTEXT_CHUNKS.labels(outcome="truncated").inc(truncated)
+    CONTEXT_CHUNKS.labels(outcome="duplicate").inc(duplicates)
+    CONTEXT_CHUNKS.labels(outcome="unused").inc(len(documents) - len(chunks) - duplicates)
+    log.info(
+        "📦 컨텍스트 조립",
+        title=title,
+        candidates=len(documents),
+        chunks=len(chunks),
+        duplicates=duplicates,
+        truncated=truncated,
+        packed_tokens=packed_tokens,
+        baseline_tokens=baseline_tokens,
+        saved_tokens=baseline_tokens - packed_tokens,
+    )
+    return context
@@ -1,50 +1,353 @@
-import torch
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_milvus import Milvus
-
-# 임베딩 모델 초기화
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
-embedding_model = HuggingFaceEmbeddings(
-    model_name="jhgan/ko-sroberta-multitask",
-    model_kwargs={"device": device}
-)
-
-# Milvus 컬렉션 연결
-company_store = Milvus(
-    embedding_function=embedding_model,
-    collection_name="bibliography_collection",
-    connection_args={"uri": "./database/milvus/milvus_demo.db"}
-)
-biblo_store = Milvus(
-    embedding_function=embedding_model,
-    collection_name="syllabus_collection",
-    connection_args={"uri": "./database/milvus/milvus_demo.db"}
-)
-
-def search_company_collections(query, store=company_store, top_k=3):
-    query_embedding = embedding_model.embed_query(query)
-    company_results = store.similarity_search_by_vector(query_embedding, k=top_k)
-    
-    # 테스트용: 검색된 결과를 상세히 출력
-    print("=== Company Collection 검색 결과 ===")
-    for res in company_results:
-        print(f"{res.page_content}\n")
-    
-    context = "\n".join(
-        f"핵심정보: {res.page_content} \n{res.metadata.get('source_text', '')}" for res in company_results
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from services.registry import registry
+from services.metrics import stage_timer
+from services.vector_index import VectorIndex
+from services.cache import response_cache
+from services.context import CONTEXT_ASSEMBLY, CONTEXT_CANDIDATES, assemble_context, format_chunk
+from database.collections import collection_pointer
+from utils.log import get_logger
+
+log = get_logger("retrieval")
+
+# 비동기 검색 설정
+RETRIEVAL_MAX_WORKERS = int(os.getenv("RETRIEVAL_MAX_WORKERS", "4"))
+RETRIEVAL_MAX_BATCH_SIZE = int(os.getenv("RETRIEVAL_MAX_BATCH_SIZE", "32"))
+RETRIEVAL_BATCH_WAIT_MS = float(os.getenv("RETRIEVAL_BATCH_WAIT_MS", "2"))
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "milvus")  # milvus | numpy (내보낸 벡터를 메모리 맵으로 검색)
+
+# Milvus 컬렉션 이름
+COMPANY_COLLECTION = "bibliography_collection"
+BIBLO_COLLECTION = "syllabus_collection"
+MILVUS_URI = "./database/milvus/milvus_demo.db"
+EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"
+
+# 추론 백엔드 설정 (torch | onnx | onnx-int8, 임베딩 모델만 따로 지정하려면 EMBEDDING_BACKEND)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", os.getenv("INFERENCE_BACKEND", "torch"))
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    if backend != "torch":
+        from services.onnx_models import INFERENCE_BACKENDS, load_onnx_embeddings
+
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"지원하지 않는 추론 백엔드입니다: {backend}")
+        return load_onnx_embeddings(backend)
+
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    # 임베딩 모델 초기화
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": device}
     )
-    return context
 
-def search_biblo_collections(query, store=biblo_store, top_k=3):
-    query_embedding = embedding_model.embed_query(query)
-    biblo_results = store.similarity_search_by_vector(query_embedding, k=top_k)
-    
-    # 테스트용: 검색된 결과를 상세히 출력
-    print("=== Biblo Collection 검색 결과 ===")
-    for res in biblo_results:
-        print(f"{res.page_content}\n")
-    
-    context = "\n".join(
-        f"핵심정보: {res.page_content} \n{res.metadata.get('source_text', '')}" for res in biblo_results
+def load_store(collection_name: str):
+    # 수집 CLI로 만든 새 버전이 있으면 포인터가 가리키는 활성 버전 사용
+    uri, physical_name = collection_pointer.resolve(collection_name, MILVUS_URI)
+    if RETRIEVAL_BACKEND == "numpy":
+        from services.vector_index import load_index
+
+        # 처음 사용할 때 Milvus DB에서 벡터를 내보내고 이후에는 내보낸 파일을 메모리 맵으로 로드
+        return load_index(physical_name, uri=uri)
+
+    from langchain_milvus import Milvus
+
+    # Milvus 컬렉션 연결
+    return Milvus(
+        embedding_function=registry.get("embedding"),
+        collection_name=physical_name,
+        connection_args={"uri": uri}
     )
-    return context 
\ No newline at end of file
+
+def warmup_store(store):
+    search_by_vectors(store, [embed_query("도서관")], top_k=1)
+
+def close_store(store):
+    """교체된 저장소의 Milvus 연결 닫기 (다른 컬렉션 저장소가 같은 연결을 사용 중이면 유지)"""
+    alias = getattr(store, "alias", None)
+    if isinstance(store, VectorIndex) or alias is None:
+        # 메모리 맵 인덱스는 참조가 사라지면 해제됨
+        return
+    if any(getattr(registry.peek(component), "alias", None) == alias for component in COLLECTION_COMPONENTS.values()):
+        return
+    from pymilvus import connections
+
+    connections.disconnect(alias)
+
+# 임베딩 모델과 Milvus 컬렉션은 처음 사용할 때 또는 서버 시작 시 로드
+registry.register("embedding", load_embedding_model, warmup=lambda model: model.embed_documents(["도서관 운영 시간"]))
+registry.register("company_store", lambda: load_store(COMPANY_COLLECTION), warmup=warmup_store, close=close_store)
+registry.register("biblo_store", lambda: load_store(BIBLO_COLLECTION), warmup=warmup_store, close=close_store)
+
+# 논리 컬렉션 이름별 레지스트리 컴포넌트
+COLLECTION_COMPONENTS = {COMPANY_COLLECTION: "company_store", BIBLO_COLLECTION: "biblo_store"}
+
+def _reload_collection(name: str, component: str):
+    uri, physical_name = collection_pointer.resolve(name, MILVUS_URI)
+    try:
+        # 새 저장소를 로드하고 예열한 뒤 교체하고, 교체된 뒤에 응답 캐시 무효화
+        registry.reload(component, on_swap=lambda: response_cache.invalidate(name))
+    except Exception as e:
+        log.error("컬렉션 버전 전환 실패 (이전 버전 계속 사용)", collection=name, active=physical_name, error=str(e))
+        return
+    log.info("컬렉션 버전 전환", collection=name, active=physical_name, uri=uri)
+
+def refresh_collections(force: bool = False) -> List[str]:
+    """활성 컬렉션 버전이 바뀌었으면 새 저장소를 백그라운드에서 로드 및 예열한 뒤 교체하고 응답 캐시 무효화
+
+    교체가 끝날 때까지는 이전 버전의 저장소로 계속 검색하므로 /readyz와 요청 처리가 멈추지 않습니다.
+    """
+    changed = collection_pointer.check(force)
+    for name in changed:
+        component = COLLECTION_COMPONENTS.get(name)
+        if component is None:
+            response_cache.invalidate(name)
+            continue
+        threading.Thread(
+            target=_reload_collection, args=(name, component), name=f"reload-{component}", daemon=True
+        ).start()
+    return changed
+
+def embed_query(query):
+    """질문 임베딩 생성"""
+    return registry.get("embedding").embed_query(query)
+
+def retrieval_k(top_k: int) -> int:
+    """컨텍스트 조립을 사용하면 중복 제거 후에도 충분하도록 후보를 더 많이 조회"""
+    return max(top_k, CONTEXT_CANDIDATES) if CONTEXT_ASSEMBLY else top_k
+
+def split_hits(hits):
+    """검색 결과 하나를 (Document 목록, 문서 벡터 목록) 형태로 변환 (컨텍스트 조립을 사용하지 않으면 벡터는 None)"""
+    return hits if CONTEXT_ASSEMBLY else (hits, None)
+
+def build_context(results, title: str, query_embedding=None, vectors=None) -> str:
+    """검색 결과를 프롬프트용 컨텍스트 문자열로 변환 (CONTEXT_ASSEMBLY면 중복 제거 후 토큰 예산에 맞춰 조립)"""
+    # 테스트용: 검색된 결과를 상세히 기록 (LOG_LEVELS=retrieval=debug)
+    if log.enabled("debug"):
+        log.debug("검색 결과", title=title, results=[res.page_content for res in results])
+    
+    if CONTEXT_ASSEMBLY:
+        return assemble_context(query_embedding, results, vectors, title)
+    context = "\n".join(format_chunk(res) for res in results)
+    return context
+
+def search_company_collections(query, store=None, top_k=3, query_embedding=None):
+    if store is None:
+        store = registry.get("company_store")
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    company_results, vectors = split_hits(search_by_vectors(store, [query_embedding], retrieval_k(top_k), CONTEXT_ASSEMBLY)[0])
+    return build_context(company_results, "Company Collection", query_embedding, vectors)
+
+def search_biblo_collections(query, store=None, top_k=3, query_embedding=None):
+    if store is None:
+        store = registry.get("biblo_store")
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    biblo_results, vectors = split_hits(search_by_vectors(store, [query_embedding], retrieval_k(top_k), CONTEXT_ASSEMBLY)[0])
+    return build_context(biblo_results, "Biblo Collection", query_embedding, vectors)
+
+# MilvusBatchSearch가 사용하는 langchain_milvus.Milvus 내부 속성 (langchain-milvus 0.1.9 기준)
+MILVUS_PRIVATE_ATTRS = ("col", "search_params", "enable_dynamic_field", "fields", "timeout",
+                        "_as_list", "_remove_forbidden_fields", "_vector_field", "_parse_document")
+
+
+class MilvusBatchSearch:
+    """여러 질문 벡터를 한 번의 Milvus 검색 요청으로 조회하는 어댑터
+
+    공개 API인 similarity_search_by_vector는 벡터 하나씩만 검색하고 문서 벡터를 돌려주지 않으므로
+    langchain_milvus.Milvus의 내부 속성을 사용합니다. 내부 속성을 사용하는 곳은 이 클래스뿐이며,
+    설치된 버전에 필요한 속성이 없으면 supports()가 False를 반환해 공개 API로 대신 검색합니다.
+    """
+
+    _checked: Dict[type, bool] = {}
+
+    @classmethod
+    def supports(cls, store) -> bool:
+        supported = cls._checked.get(type(store))
+        if supported is None:
+            missing = [name for name in MILVUS_PRIVATE_ATTRS if not hasattr(store, name)]
+            supported = cls._checked[type(store)] = not missing
+            if missing:
+                log.warning("Milvus 다중 벡터 검색을 사용할 수 없어 벡터별 검색으로 대체", store=type(store).__name__, missing=missing)
+        return supported
+
+    @staticmethod
+    def search(store, vectors: List[List[float]], top_k: int, with_vectors: bool) -> list:
+        if store.col is None:
+            return [([], []) if with_vectors else [] for _ in vectors]
+        param = store._as_list(store.search_params)[0]
+        if store.enable_dynamic_field:
+            output_fields = ["*"]
+        else:
+            output_fields = store._remove_forbidden_fields(store.fields[:])
+        if with_vectors:
+            # 벡터 필드는 기본 출력 필드에서 빠지므로 따로 요청
+            output_fields = output_fields + [store._vector_field]
+        search_res = store.col.search(
+            data=vectors,
+            anns_field=store._vector_field,
+            param=param,
+            limit=top_k,
+            output_fields=output_fields,
+            timeout=store.timeout,
+        )
+        if not with_vectors:
+            return [
+                [store._parse_document({x: hit.entity.get(x) for x in hit.entity.fields}) for hit in hits]
+                for hits in search_res
+            ]
+        results = []
+        for hits in search_res:
+            documents, document_vectors = [], []
+            for hit in hits:
+                data = {x: hit.entity.get(x) for x in hit.entity.fields}
+                document_vectors.append(data.pop(store._vector_field, None))
+                documents.append(store._parse_document(data))
+            results.append((documents, document_vectors if all(v is not None for v in document_vectors) else None))
+        return results
+
+
+def search_by_vectors(store, vectors: List[List[float]], top_k: int = 3, with_vectors: bool = False) -> list:
+    """여러 질문 벡터를 한 번의 Milvus 검색 요청으로 조회하여 벡터별 Document 목록 반환
+
+    with_vectors면 벡터별 (Document 목록, 문서 벡터 목록) 반환 (컨텍스트 조립의 중복 제거에 사용)
+    다중 벡터 검색을 사용할 수 없는 저장소는 공개 API로 벡터마다 검색하며, 이때 문서 벡터는 None입니다.
+    """
+    if isinstance(store, VectorIndex):
+        # 프로세스 내 인덱스는 한 번의 행렬 곱으로 모든 질문 벡터를 검색
+        return store.search(vectors, top_k, with_vectors=with_vectors)
+    if MilvusBatchSearch.supports(store):
+        return MilvusBatchSearch.search(store, vectors, top_k, with_vectors)
+    results = [store.similarity_search_by_vector(vector, k=top_k) for vector in vectors]
+    return [(documents, None) for documents in results] if with_vectors else results
+
+
+class RetrievalBatcher:
+    """동시에 들어온 검색 요청을 모아 한 번의 embed_documents 호출과
+    컬렉션별 한 번의 다중 벡터 Milvus 검색으로 처리하는 비동기 배처
+
+    실제 임베딩과 검색은 크기가 제한된 스레드 풀에서 실행되어 이벤트 루프를 막지 않습니다.
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        max_batch_size: int = RETRIEVAL_MAX_BATCH_SIZE,
+        max_wait_ms: float = RETRIEVAL_BATCH_WAIT_MS,
+    ):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, query: str, store=None, top_k: int = 3, query_embedding=None, with_vectors: bool = False):
+        """(질문 임베딩, 검색 결과) 반환 - store가 None이면 임베딩만 계산
+
+        with_vectors면 검색 결과는 (Document 목록, 문서 벡터 목록)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, store, top_k, query_embedding, with_vectors, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # 기다리는 동안 취소된 요청(speculative 모드에서 버린 검색 등)은 검색하지 않음
+        batch = [item for item in self._pending if not item[5].cancelled()]
+        self._pending = []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.executor, self._run_batch, batch)
+        task.add_done_callback(lambda done: self._deliver(batch, done))
+
+    @staticmethod
+    def _run_batch(batch) -> list:
+        embeddings = [query_embedding for _, _, _, query_embedding, _, _ in batch]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            vectors = registry.get("embedding").embed_documents([batch[i][0] for i in missing])
+            for i, vector in zip(missing, vectors):
+                embeddings[i] = vector
+
+        # 같은 컬렉션, top_k, 벡터 포함 여부를 사용하는 요청끼리 묶어 한 번에 검색
+        results = [None] * len(batch)
+        groups = {}
+        for i, (_, store, top_k, _, with_vectors, _) in enumerate(batch):
+            if store is not None:
+                groups.setdefault((id(store), top_k, with_vectors), (store, top_k, with_vectors, []))[3].append(i)
+        for store, top_k, with_vectors, indices in groups.values():
+            hits = search_by_vectors(store, [embeddings[i] for i in indices], top_k, with_vectors)
+            for i, docs in zip(indices, hits):
+                results[i] = docs
+        return list(zip(embeddings, results))
+
+    @staticmethod
+    def _deliver(batch, done: asyncio.Future):
+        futures = [future for _, _, _, _, _, future in batch]
+        if done.cancelled():
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+            return
+        error = done.exception()
+        for i, future in enumerate(futures):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+# 검색 전용 스레드 풀 및 배처
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval")
+retrieval_batcher = RetrievalBatcher(retrieval_executor)
+
+async def aembed_query(query: str):
+    """이벤트 루프를 막지 않고 질문 임베딩 생성"""
+    with stage_timer("embedding"):
+        query_embedding, _ = await retrieval_batcher.submit(query)
+    return query_embedding
+
+async def aretrieve(query, component: str, store=None, top_k=3, query_embedding=None) -> tuple:
+    """컨텍스트로 조립하기 전의 검색 결과 (질문 임베딩, Document 목록, 문서 벡터 목록) 반환
+
+    컬렉션 버전 확인(refresh_collections)은 요청마다 한 번, 검색을 시작하는 쪽에서 호출합니다.
+    """
+    if store is None:
+        store = await registry.aget(component)
+    if query_embedding is None:
+        query_embedding = await aembed_query(query)
+    # 임베딩 시간은 embedding 단계로 따로 기록하고 검색 시간만 측정
+    with stage_timer("vector_search"):
+        _, hits = await retrieval_batcher.submit(query, store, retrieval_k(top_k), query_embedding, CONTEXT_ASSEMBLY)
+    results, vectors = split_hits(hits)
+    return query_embedding, results, vectors
+
+def build_retrieved_context(retrieved: tuple, title: str) -> str:
+    """aretrieve 결과를 프롬프트용 컨텍스트 문자열로 변환"""
+    query_embedding, results, vectors = retrieved
+    with stage_timer("context_assembly"):
+        return build_context(results, title, query_embedding, vectors)
+
+async def asearch_company_collections(query, store=None, top_k=3, query_embedding=None):
+    retrieved = await aretrieve(query, "company_store", store, top_k, query_embedding)
+    return build_retrieved_context(retrieved, "Company Collection")
+
+async def asearch_biblo_collections(query, store=None, top_k=3, query_embedding=None):
+    retrieved = await aretrieve(query, "biblo_store", store, top_k, query_embedding)
+    return build_retrieved_context(retrieved, "Biblo Collection")
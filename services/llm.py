@@ -1,20 +1,43 @@
 from typing import AsyncGenerator
-from langchain_openai import ChatOpenAI
-from services.embeddings import search_company_collections, search_biblo_collections
+from contextlib import aclosing
+from services.embeddings import (
+    aembed_query,
+    refresh_collections,
+    asearch_company_collections,
+    asearch_biblo_collections,
+    COMPANY_COLLECTION,
+    BIBLO_COLLECTION,
+)
+from services.cache import response_cache, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_HISTORY_FREE_ONLY
+from services.registry import registry
+from services.scheduler import llm_scheduler, SchedulerBusy
+from services.metrics import stage_timer, observe_stage, TOKENS_PER_SECOND
+from utils.log import get_logger
 import os
+import time
 from dotenv import load_dotenv
 
 # 환경변수 로드
 load_dotenv()
 
-# OpenAI LLM 초기화
-llm = ChatOpenAI(
-    model="gpt-4-turbo",
-    temperature=0.7,
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    max_retries=1024,
-    streaming=True  # 스트리밍 모드 활성화
-)
+log = get_logger("llm")
+# 전체 프롬프트 기록 (LOG_LEVELS=prompt=debug로 켜고 LOG_SAMPLE_RATES=prompt=0.01 등으로 일부만 기록)
+prompt_log = get_logger("prompt")
+
+def load_llm():
+    from langchain_openai import ChatOpenAI
+
+    # OpenAI LLM 초기화
+    return ChatOpenAI(
+        model="gpt-4-turbo",
+        temperature=0.7,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,  # 재시도는 llm_scheduler에서 지수 백오프로 처리
+        streaming=True  # 스트리밍 모드 활성화
+    )
+
+# LLM 클라이언트는 처음 사용할 때 또는 서버 시작 시 생성
+registry.register("llm", load_llm)
 
 # 프롬프트 템플릿
 LIBRARY_PROMPT = """
@@ -61,43 +84,96 @@ Ten Softworks는 AI 검색엔진 기술을 선도하는 글로벌 IT 기업입
 async def generate_streaming_response(
     prompt: str, 
     session, 
-    query_type: int
+    query_type: int,
+    prepared=None
 ) -> AsyncGenerator[str, None]:
+    """prepared(services.pipeline.PreparedQuery)가 있으면 미리 계산한 임베딩과 검색 결과를 사용
+
+    LLM 스케줄러 슬롯은 업스트림 LLM 스트림을 읽는 동안만 사용하며 (캐시된 응답은 슬롯 없이 전송),
+    대기열이 가득 차면 SchedulerBusy를 그대로 전달합니다.
+    """
     try:
+        if prepared is not None:
+            query_embedding = prepared.query_embedding
+        else:
+            # 수집 CLI로 컬렉션 버전이 바뀌었으면 캐시된 응답을 사용하기 전에 반영 (prepared가 있으면 prepare_query에서 이미 확인)
+            refresh_collections()
+            query_embedding = await aembed_query(prompt)
+
+        # 응답 캐시 확인 (현재 사용자 메시지만 기록된 경우 이전 대화가 없는 질문)
+        history_free = len(session.messages) <= 1
+        use_cache = RESPONSE_CACHE_ENABLED and (history_free or not RESPONSE_CACHE_HISTORY_FREE_ONLY)
+        if use_cache:
+            cached_chunks = response_cache.lookup(query_type, query_embedding)
+            if cached_chunks is not None:
+                log.info("💾 캐시된 응답 사용", query_type=query_type)
+                for chunk_text in cached_chunks:
+                    yield chunk_text
+                return
+
         # 검색 결과와 프롬프트 선택
+        context = prepared.context if prepared is not None else None
         if query_type == 0:
             # 회사 관련 (텐소프트웍스)
-            context = search_company_collections(prompt)
+            if prepared is None:
+                context = await asearch_company_collections(prompt, query_embedding=query_embedding)
             selected_prompt = SERVICE_PROMPT
+            collection = COMPANY_COLLECTION
         else:
             # 비블로 관련 (도서관)
-            context = search_biblo_collections(prompt)
+            if prepared is None:
+                context = await asearch_biblo_collections(prompt, query_embedding=query_embedding)
             selected_prompt = LIBRARY_PROMPT
+            collection = BIBLO_COLLECTION
         
-        # 이전 대화 내용 가져오기
-        user_history = session.get_formatted_history()
-        
-        # 프롬프트 생성
-        formatted_prompt = selected_prompt.format(
-            user_query=prompt, 
-            context=context,
-            user_history=user_history
-        )
-        print(f"📃 Prompt: {formatted_prompt}")
+        with stage_timer("prompt_build"):
+            # 이전 대화 내용 가져오기
+            user_history = session.get_formatted_history()
+            
+            # 프롬프트 생성
+            formatted_prompt = selected_prompt.format(
+                user_query=prompt, 
+                context=context,
+                user_history=user_history
+            )
+        prompt_log.debug("📃 Prompt", session_id=session.session_id, prompt=formatted_prompt)
         
         # 스트리밍 응답 생성
-        full_response = ""
-        async for chunk in llm.astream(formatted_prompt):
-            if isinstance(chunk, str):
-                chunk_text = chunk
-            else:
-                # AI 응답 객체에서 텍스트 추출
-                chunk_text = chunk.content if hasattr(chunk, 'content') else str(chunk)
-            
-            full_response += chunk_text
-            yield chunk_text
+        llm = await registry.aget("llm")
+        response_chunks = []
+        first_token_at = None
+        # LLM 스케줄러 슬롯 확보 (세션당 하나씩, 대기열이 가득 차면 SchedulerBusy)
+        async with llm_scheduler.admit(session.session_id):
+            stream_start = time.perf_counter()
+            # 소비하는 쪽이 중단(취소)되면 스트림을 바로 닫아 업스트림 요청도 중단
+            # (레이트 리밋, 첫 토큰 타임아웃, 재시도는 스케줄러에서 처리)
+            async with aclosing(llm_scheduler.astream(llm, formatted_prompt)) as stream:
+                async for chunk in stream:
+                    if isinstance(chunk, str):
+                        chunk_text = chunk
+                    else:
+                        # AI 응답 객체에서 텍스트 추출
+                        chunk_text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        observe_stage("ttft", first_token_at - stream_start)
+                    response_chunks.append(chunk_text)
+                    yield chunk_text
+        
+        # 전체 스트리밍 시간과 첫 토큰 이후의 초당 토큰(청크) 수 기록
+        stream_end = time.perf_counter()
+        observe_stage("stream_total", stream_end - stream_start)
+        if first_token_at is not None and stream_end > first_token_at and len(response_chunks) > 1:
+            TOKENS_PER_SECOND.observe((len(response_chunks) - 1) / (stream_end - first_token_at))
+        
+        # 완료된 응답을 캐시에 저장
+        if use_cache:
+            response_cache.store(query_type, collection, query_embedding, response_chunks)
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         error_message = f"스트리밍 응답 생성 중 오류: {str(e)}"
-        print(error_message)
+        log.error("스트리밍 응답 생성 중 오류", session_id=session.session_id, error=str(e))
         yield error_message 
\ No newline at end of file
@@ -0,0 +1,266 @@
+import time
+import math
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# 단계별 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 초당 토큰 수 히스토그램 구간
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+
+def _escape_label_value(value) -> str:
+    """Prometheus 텍스트 형식의 레이블 값 이스케이프 (역슬래시, 큰따옴표, 줄바꿈)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _escape_help(text: str) -> str:
+    """HELP 줄 이스케이프 (역슬래시, 줄바꿈)"""
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+    return "{" + escaped + "}"
+
+def _header(name: str, documentation: str, kind: str) -> List[str]:
+    return [f"# HELP {name} {_escape_help(documentation)}", f"# TYPE {name} {kind}"]
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues, **labelkwargs):
+        if labelkwargs:
+            labelvalues = tuple(str(labelkwargs[name]) for name in self.labelnames)
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default_child(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.documentation, self.kind)
+        for labelvalues, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, labelvalues))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default_child().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default_child().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default_child().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default_child().dec(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.counts[i] += 1
+                    break
+
+    def render(self, name, labelnames, labelvalues):
+        lines = []
+        cumulative = 0
+        for upper, count in zip(self.buckets, self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, labelvalues, {"le": _format_value(upper)})
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, labelvalues)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default_child().observe(value)
+
+
+class _CallbackMetric:
+    """렌더링할 때 함수를 호출해 값을 읽는 지표 (세션 수, 다른 모듈의 카운터 등)"""
+
+    def __init__(self, name: str, documentation: str, kind: str, fn: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.documentation, self.kind)
+        try:
+            lines.append(f"{self.name} {_format_value(self.fn())}")
+        except Exception:
+            pass
+        return lines
+
+
+class _StatsMetric:
+    """get_stats()처럼 dict를 반환하는 함수의 숫자 값을 {prefix}_{key} 지표로 내보냄
+
+    gauges에 있는 키는 gauge, 나머지 키는 누적 카운터(counter)로 선언합니다.
+    """
+
+    def __init__(self, prefix: str, documentation: str, fn: Callable[[], Dict[str, float]], gauges: Sequence[str] = ()):
+        self.name = prefix
+        self.documentation = documentation
+        self.fn = fn
+        self.gauges = frozenset(gauges)
+
+    def render(self) -> List[str]:
+        try:
+            stats = self.fn()
+        except Exception:
+            return []
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.name}_{key}"
+            kind = "gauge" if key in self.gauges else "counter"
+            lines.extend(_header(name, f"{self.documentation} ({key})", kind))
+            lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식으로 내보낼 지표 모음"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], float], kind: str = "gauge"):
+        """렌더링 시점에 fn()으로 값을 읽는 지표 등록"""
+        return self._register(_CallbackMetric(name, documentation, kind, fn))
+
+    def stats(self, prefix: str, documentation: str, fn: Callable[[], Dict[str, float]], gauges: Sequence[str] = ()):
+        """렌더링 시점에 fn()이 반환한 dict의 숫자 값들을 지표로 등록 (gauges에 없는 키는 counter)"""
+        return self._register(_StatsMetric(prefix, documentation, fn, gauges))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 지표 레지스트리 인스턴스
+metrics = MetricsRegistry()
+
+STAGE_LATENCY = metrics.histogram(
+    "biblo_stage_latency_seconds",
+    "Latency of each request stage (classification, embedding, vector_search, context_assembly, query_prepare, prompt_build, ttft, request_ttft, stream_total)",
+    labelnames=("stage",),
+)
+TOKENS_PER_SECOND = metrics.histogram(
+    "biblo_llm_tokens_per_second",
+    "LLM streaming throughput in chunks per second after the first token",
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+ACTIVE_WEBSOCKETS = metrics.gauge("biblo_active_websockets", "Open WebSocket connections", labelnames=("endpoint",))
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+@contextmanager
+def stage_timer(stage: str):
+    """with 블록의 실행 시간을 단계별 지연 시간 히스토그램에 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import uuid
+import importlib.util
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.log import get_logger
+
+log = get_logger("onnx")
+
+# ONNX Runtime 추론 설정
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./LLM/onnx")
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))  # 0이면 ONNX Runtime 기본값 (물리 코어 수)
+ONNX_EMBED_BATCH_SIZE = int(os.getenv("ONNX_EMBED_BATCH_SIZE", "32"))
+ONNX_OPSET = 17
+ONNX_EXPORT_LOCK_TIMEOUT = float(os.getenv("ONNX_EXPORT_LOCK_TIMEOUT", "1800"))  # 다른 워커의 내보내기를 기다릴 최대 시간(초)
+
+# torch: PyTorch fp32, onnx: ONNX Runtime fp32, onnx-int8: ONNX Runtime 동적 int8 양자화
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+MODEL_FILES = {False: "model.onnx", True: "model.int8.onnx"}
+
+
+def _model_dir(kind: str, directory: str) -> str:
+    return os.path.join(directory, kind)
+
+
+def _read_manifest(kind: str, directory: str) -> dict:
+    try:
+        with open(os.path.join(_model_dir(kind, directory), "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _temp_path(path: str) -> str:
+    """워커마다 겹치지 않는 임시 파일 경로 (완성된 뒤 os.replace로 교체)"""
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def _export_graph(module, inputs: dict, output_name: str, path: str):
+    import torch
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs}
+    dynamic_axes[output_name] = {0: "batch"}
+    temp_path = _temp_path(path)
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            tuple(inputs.values()),
+            temp_path,
+            input_names=list(inputs),
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+        )
+    os.replace(temp_path, path)
+
+
+def _quantize(model_dir: str):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    # 가중치만 int8로 저장하고 활성값은 실행 중에 양자화 (보정 데이터 불필요)
+    fp32_path = os.path.join(model_dir, MODEL_FILES[False])
+    int8_path = os.path.join(model_dir, MODEL_FILES[True])
+    temp_path = _temp_path(int8_path)
+    quantize_dynamic(fp32_path, temp_path, weight_type=QuantType.QInt8)
+    os.replace(temp_path, int8_path)
+
+
+def _write_manifest(model_dir: str, manifest: dict):
+    path = os.path.join(model_dir, "manifest.json")
+    temp_path = _temp_path(path)
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    # manifest는 마지막에 교체하므로 manifest가 있으면 모델 파일도 모두 준비된 상태
+    os.replace(temp_path, path)
+
+
+def export_classifier(directory: str = ONNX_MODEL_DIR) -> dict:
+    """KoELECTRA 분류기를 ONNX(fp32, int8)로 내보내고 토크나이저와 함께 저장"""
+    import torch
+    from transformers import ElectraForSequenceClassification, AutoTokenizer
+    from services.bert import BERT_MODEL, BERT_TOKENIZER
+
+    class Logits(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+    model_dir = _model_dir("classifier", directory)
+    os.makedirs(model_dir, exist_ok=True)
+    model = ElectraForSequenceClassification.from_pretrained(BERT_MODEL).eval()
+    tokenizer = AutoTokenizer.from_pretrained(BERT_TOKENIZER)
+    sample = tokenizer(["도서관 운영 시간이 어떻게 되나요?"], return_tensors="pt")
+    inputs = {name: sample[name] for name in ("input_ids", "attention_mask", "token_type_ids")}
+    _export_graph(Logits(model), inputs, "logits", os.path.join(model_dir, MODEL_FILES[False]))
+    _quantize(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    manifest = {
+        "source": BERT_MODEL,
+        "tokenizer": BERT_TOKENIZER,
+        "opset": ONNX_OPSET,
+        "max_length": tokenizer.model_max_length,
+        "num_labels": model.config.num_labels,
+        "exported_at": time.time(),
+    }
+    _write_manifest(model_dir, manifest)
+    log.info("분류기 ONNX 내보내기 완료", model=BERT_MODEL, directory=model_dir)
+    return manifest
+
+
+def export_embedding(directory: str = ONNX_MODEL_DIR) -> dict:
+    """문장 임베딩 모델을 평균 풀링까지 포함한 ONNX(fp32, int8)로 내보내고 토크나이저와 함께 저장"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from services.embeddings import EMBEDDING_MODEL
+
+    class MeanPooling(torch.nn.Module):
+        # HuggingFaceEmbeddings(sentence-transformers)와 같은 마스크 평균 풀링, 정규화 없음
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            hidden = self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+    sentence_model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    transformer = sentence_model[0]
+    pooling = sentence_model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False) or len(sentence_model) > 2:
+        raise ValueError(f"평균 풀링만 사용하는 sentence-transformers 모델만 지원합니다: {EMBEDDING_MODEL}")
+
+    model_dir = _model_dir("embedding", directory)
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["도서관 운영 시간"], return_tensors="pt")
+    inputs = {name: sample[name] for name in ("input_ids", "attention_mask")}
+    _export_graph(MeanPooling(transformer.auto_model.eval()), inputs, "embedding", os.path.join(model_dir, MODEL_FILES[False]))
+    _quantize(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    manifest = {
+        "source": EMBEDDING_MODEL,
+        "opset": ONNX_OPSET,
+        "max_length": sentence_model.max_seq_length,
+        "dim": sentence_model.get_sentence_embedding_dimension(),
+        "exported_at": time.time(),
+    }
+    _write_manifest(model_dir, manifest)
+    log.info("임베딩 모델 ONNX 내보내기 완료", model=EMBEDDING_MODEL, directory=model_dir)
+    return manifest
+
+
+EXPORTERS = {"classifier": export_classifier, "embedding": export_embedding}
+
+
+def _is_current(manifest: dict, source: str) -> bool:
+    return manifest.get("source") == source and manifest.get("opset") == ONNX_OPSET
+
+
+def export_lock(kind: str, directory: str = ONNX_MODEL_DIR):
+    """같은 모델을 여러 프로세스가 동시에 내보내지 않도록 하는 파일 잠금"""
+    from filelock import FileLock
+
+    os.makedirs(directory, exist_ok=True)
+    return FileLock(os.path.join(directory, f"{kind}.lock"), timeout=ONNX_EXPORT_LOCK_TIMEOUT)
+
+
+def ensure_exported(kind: str, source: str, directory: str = ONNX_MODEL_DIR) -> dict:
+    """내보낸 모델이 없거나 원본 모델이 바뀌었으면 먼저 내보내고 manifest 반환
+
+    여러 워커가 동시에 시작해도 파일 잠금으로 한 워커만 내보내고, 나머지는 기다렸다가 결과를 사용합니다.
+    PyTorch가 없는 환경(추론 전용 이미지)에서는 내보내지 않고 내보내기 명령을 안내하는 오류를 냅니다.
+    """
+    manifest = _read_manifest(kind, directory)
+    if _is_current(manifest, source):
+        return manifest
+    if importlib.util.find_spec("torch") is None:
+        raise RuntimeError(
+            f"내보낸 ONNX 모델({kind})이 없거나 {source}와 맞지 않습니다. "
+            f"PyTorch가 설치된 환경에서 `python -m services.onnx_models --dir {directory} {kind}`로 먼저 내보내세요"
+        )
+
+    with export_lock(kind, directory):
+        # 잠금을 기다리는 동안 다른 워커가 내보냈으면 그대로 사용
+        manifest = _read_manifest(kind, directory)
+        if not _is_current(manifest, source):
+            log.info("ONNX 모델이 없거나 오래되어 내보내는 중", kind=kind, source=source)
+            manifest = EXPORTERS[kind](directory)
+    return manifest
+
+
+def create_session(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_NUM_THREADS > 0:
+        options.intra_op_num_threads = ONNX_NUM_THREADS
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxModel:
+    """내보낸 ONNX 모델 하나와 토크나이저 (세션 run은 여러 스레드에서 동시에 호출 가능)"""
+
+    def __init__(self, kind: str, quantized: bool, directory: str = ONNX_MODEL_DIR):
+        from transformers import AutoTokenizer
+
+        model_dir = _model_dir(kind, directory)
+        self.manifest = _read_manifest(kind, directory)
+        self.quantized = quantized
+        self.session = create_session(os.path.join(model_dir, MODEL_FILES[quantized]))
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = self.manifest.get("max_length") or self.tokenizer.model_max_length
+
+    def run(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length, padding=True, return_tensors="np")
+        feed = {}
+        for name in self.input_names:
+            value = encoded.get(name)
+            if value is None:
+                value = np.zeros_like(encoded["input_ids"])
+            feed[name] = value.astype(np.int64)
+        return self.session.run(None, feed)[0]
+
+
+class OnnxSequenceClassifier(OnnxModel):
+    def __init__(self, quantized: bool = False, directory: str = ONNX_MODEL_DIR):
+        super().__init__("classifier", quantized, directory)
+
+    def predict(self, prompts: List[str]) -> List[Tuple[int, float]]:
+        """(클래스, 확신도) 목록 반환 (services.bert.classify_batch와 같은 형태)"""
+        logits = self.run(prompts)
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        predicted = probabilities.argmax(axis=1)
+        return [(int(c), float(probabilities[i, c])) for i, c in enumerate(predicted)]
+
+
+class OnnxEmbeddings(OnnxModel, Embeddings):
+    """HuggingFaceEmbeddings 대신 사용하는 ONNX Runtime 문장 임베딩"""
+
+    def __init__(self, quantized: bool = False, directory: str = ONNX_MODEL_DIR, batch_size: int = ONNX_EMBED_BATCH_SIZE):
+        super().__init__("embedding", quantized, directory)
+        self.batch_size = max(1, batch_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 길이가 비슷한 문장끼리 배치를 만들어 패딩 계산을 줄이고 원래 순서로 되돌림
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for offset in range(0, len(order), self.batch_size):
+            indices = order[offset:offset + self.batch_size]
+            embeddings = self.run([texts[i] for i in indices])
+            for i, vector in zip(indices, embeddings.tolist()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.run([text])[0].tolist()
+
+
+def load_onnx_classifier(backend: str, directory: str = ONNX_MODEL_DIR) -> OnnxSequenceClassifier:
+    from services.bert import BERT_MODEL
+
+    ensure_exported("classifier", BERT_MODEL, directory)
+    return OnnxSequenceClassifier(quantized=backend == "onnx-int8", directory=directory)
+
+
+def load_onnx_embeddings(backend: str, directory: str = ONNX_MODEL_DIR) -> OnnxEmbeddings:
+    from services.embeddings import EMBEDDING_MODEL
+
+    ensure_exported("embedding", EMBEDDING_MODEL, directory)
+    return OnnxEmbeddings(quantized=backend == "onnx-int8", directory=directory)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="분류기와 임베딩 모델을 ONNX(fp32, 동적 int8)로 내보내기")
+    parser.add_argument("--dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("models", nargs="*", default=list(EXPORTERS), help="classifier, embedding (기본: 둘 다)")
+    args = parser.parse_args()
+    for kind in args.models:
+        with export_lock(kind, args.dir):
+            EXPORTERS[kind](args.dir)
@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+from typing import List, Optional
+
+from services.bert import classify
+from services.embeddings import (
+    aembed_query,
+    aretrieve,
+    refresh_collections,
+    build_retrieved_context,
+)
+from services.metrics import metrics, observe_stage
+
+# 질문 처리 방식 설정
+QUERY_PIPELINE = os.getenv("QUERY_PIPELINE", "serial")  # serial | speculative (분류와 두 컬렉션 검색을 동시에 실행)
+CLASSIFY_SKIP_CONFIDENCE = float(os.getenv("CLASSIFY_SKIP_CONFIDENCE", "0.98"))  # 이전 분류 확신도가 이 값 이상이면 분류 생략
+# 분류 없이 이전 query_type을 연속으로 재사용할 최대 질문 수 (0이면 항상 분류, 재사용 중 주제가 바뀌면 다른 컬렉션으로 답할 수 있음)
+CLASSIFY_SKIP_MAX_TURNS = int(os.getenv("CLASSIFY_SKIP_MAX_TURNS", "0"))
+
+CLASSIFICATION_DECISIONS = metrics.counter(
+    "biblo_classification_decisions_total",
+    "Speculative pipeline queries that ran the classifier or reused the session's previous query_type",
+    labelnames=("decision",),
+)
+
+# query_type별 검색할 (레지스트리 컴포넌트, 컨텍스트 제목) (0: 회사, 그 외: 도서관 - generate_streaming_response와 같은 기준)
+SEARCHES = {0: ("company_store", "Company Collection"), 1: ("biblo_store", "Biblo Collection")}
+
+
+def search_type(query_type: int) -> int:
+    return 0 if query_type == 0 else 1
+
+
+class PreparedQuery:
+    """분류와 검색을 미리 끝낸 질문 (generate_streaming_response에 그대로 전달)"""
+
+    __slots__ = ("query_type", "confidence", "query_embedding", "context", "classified")
+
+    def __init__(self, query_type: int, confidence: Optional[float], query_embedding: List[float], context: str, classified: bool):
+        self.query_type = query_type
+        self.confidence = confidence
+        self.query_embedding = query_embedding
+        self.context = context
+        self.classified = classified
+
+
+def reusable_query_type(session) -> Optional[int]:
+    """세션의 마지막 분류 확신도가 충분히 높으면 분류 없이 재사용할 query_type 반환"""
+    if session is None or session.query_confidence is None:
+        return None
+    if session.query_confidence < CLASSIFY_SKIP_CONFIDENCE or session.classification_skips >= CLASSIFY_SKIP_MAX_TURNS:
+        return None
+    return session.query_type
+
+
+def remember_classification(session, prepared: PreparedQuery):
+    """다음 질문에서 분류를 생략할 수 있는지 판단하도록 분류 결과를 세션에 기록"""
+    session.query_type = prepared.query_type
+    if prepared.classified:
+        session.query_confidence = prepared.confidence
+        session.classification_skips = 0
+    else:
+        session.classification_skips += 1
+
+
+def _consume_result(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+async def prepare_query(prompt: str, session=None) -> PreparedQuery:
+    """질문 임베딩을 한 번만 계산해 분류와 두 컬렉션 검색을 동시에 실행
+
+    분류가 끝나면 예측한 타입의 검색 결과만 사용하고 다른 컬렉션의 검색 결과는 버립니다.
+    (검색 작업을 취소해도 이미 스레드에서 실행 중인 검색은 끝까지 실행되며, 배처에서 대기 중일 때만 검색하지 않습니다)
+    세션의 이전 분류를 재사용할 수 있으면 분류 없이 해당 컬렉션만 검색합니다.
+    """
+    started_at = time.perf_counter()
+    # 수집 CLI로 컬렉션 버전이 바뀌었으면 검색 전에 반영
+    refresh_collections()
+
+    query_type = reusable_query_type(session)
+    if query_type is not None:
+        CLASSIFICATION_DECISIONS.labels(decision="skipped").inc()
+        query_embedding = await aembed_query(prompt)
+        component, title = SEARCHES[search_type(query_type)]
+        context = build_retrieved_context(await aretrieve(prompt, component, query_embedding=query_embedding), title)
+        prepared = PreparedQuery(query_type, session.query_confidence, query_embedding, context, classified=False)
+    else:
+        CLASSIFICATION_DECISIONS.labels(decision="classified").inc()
+        tasks = [asyncio.create_task(classify(prompt))]
+        try:
+            query_embedding = await aembed_query(prompt)
+            searches = {
+                collection_type: asyncio.create_task(aretrieve(prompt, component, query_embedding=query_embedding))
+                for collection_type, (component, _) in SEARCHES.items()
+            }
+            tasks.extend(searches.values())
+            query_type, confidence = await tasks[0]
+            # 선택한 컬렉션의 검색 결과만 컨텍스트로 조립
+            _, title = SEARCHES[search_type(query_type)]
+            context = build_retrieved_context(await searches[search_type(query_type)], title)
+        finally:
+            # 사용하지 않는 검색과 (오류 시) 남은 작업 취소
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                # 버린 작업의 오류는 여기서 확인 ("Task exception was never retrieved" 경고 방지)
+                task.add_done_callback(_consume_result)
+        prepared = PreparedQuery(query_type, confidence, query_embedding, context, classified=True)
+
+    observe_stage("query_prepare", time.perf_counter() - started_at)
+    return prepared
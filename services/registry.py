@@ -0,0 +1,210 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.log import get_logger
+
+log = get_logger("registry")
+
+# reload()로 교체된 이전 인스턴스를 닫기 전에 진행 중인 요청이 끝나기를 기다리는 시간(초)
+REGISTRY_CLOSE_DELAY = float(os.getenv("REGISTRY_CLOSE_DELAY", "30"))
+
+
+class Component:
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], Any]] = None,
+        close: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.close = close
+        self.instance = None
+        self.loaded = False
+        self.warmed_up = False
+        self.load_time = None
+        self.warmup_time = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "warmed_up": self.warmed_up,
+            "load_time": self.load_time,
+            "warmup_time": self.warmup_time,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """모델과 벡터 저장소를 처음 사용할 때 로드하는 지연 로딩 레지스트리
+
+    각 모듈은 import 시 로더만 등록하고, 실제 로딩은 get() 호출 또는
+    서버 시작 시 initialize()에서 병렬로 수행됩니다.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], Any]] = None,
+        close: Optional[Callable[[Any], Any]] = None,
+    ):
+        """컴포넌트 로더 등록 (warmup은 로드된 인스턴스로 실행할 예열 함수, close는 reload()로 교체된 인스턴스 정리 함수)"""
+        self._components[name] = Component(name, loader, warmup, close)
+
+    def set(self, name: str, instance: Any):
+        """로더 대신 이미 준비된 인스턴스를 사용 (테스트, 벤치마크용)"""
+        component = self._components.setdefault(name, Component(name, lambda: instance))
+        with component.lock:
+            component.instance = instance
+            component.loaded = True
+            component.warmed_up = True
+            component.load_time = 0.0
+            component.warmup_time = 0.0
+            component.error = None
+
+    def reset(self, name: str):
+        """로드된 인스턴스를 버리고 다음 get()에서 다시 로드"""
+        component = self._components[name]
+        with component.lock:
+            component.instance = None
+            component.loaded = False
+            component.warmed_up = False
+            component.load_time = None
+            component.warmup_time = None
+            component.error = None
+
+    def reload(self, name: str, on_swap: Optional[Callable[[], Any]] = None, close_delay: float = REGISTRY_CLOSE_DELAY) -> bool:
+        """새 인스턴스를 로드하고 예열한 뒤 기존 인스턴스와 교체 (로드하는 동안 기존 인스턴스가 계속 요청을 처리)
+
+        교체 후 on_swap을 호출하고, 이전 인스턴스는 진행 중인 요청이 끝나도록 close_delay초 뒤에 close로 정리합니다.
+        아직 로드되지 않은 컴포넌트는 다음 get()에서 새로 로드되므로 on_swap만 호출합니다. 교체했으면 True 반환
+        """
+        component = self._components[name]
+        with component.reload_lock:
+            if not component.loaded:
+                if on_swap is not None:
+                    on_swap()
+                return False
+            start = time.perf_counter()
+            try:
+                instance = component.loader()
+                load_time = time.perf_counter() - start
+                start = time.perf_counter()
+                if component.warmup is not None:
+                    component.warmup(instance)
+                warmup_time = time.perf_counter() - start
+            except Exception as e:
+                # 새 인스턴스를 준비하지 못하면 기존 인스턴스를 계속 사용
+                component.error = f"reload 실패: {e}"
+                raise
+            with component.lock:
+                old = component.instance
+                component.instance = instance
+                component.loaded = True
+                component.warmed_up = True
+                component.load_time = load_time
+                component.warmup_time = warmup_time
+                component.error = None
+        if on_swap is not None:
+            on_swap()
+        if old is not None and old is not instance and component.close is not None:
+            timer = threading.Timer(close_delay, self._close, (component, old))
+            timer.daemon = True
+            timer.start()
+        return True
+
+    @staticmethod
+    def _close(component: Component, instance: Any):
+        try:
+            component.close(instance)
+        except Exception as e:
+            log.error("이전 인스턴스 정리 실패", component=component.name, error=str(e))
+
+    def peek(self, name: str) -> Any:
+        """로드된 인스턴스 반환 (로드되지 않았으면 로드하지 않고 None)"""
+        component = self._components.get(name)
+        return component.instance if component is not None and component.loaded else None
+
+    def get(self, name: str) -> Any:
+        """컴포넌트 인스턴스 반환 (로드되지 않았으면 지금 로드하고 예열)"""
+        component = self._components[name]
+        if component.loaded:
+            return component.instance
+        with component.lock:
+            if not component.loaded:
+                start = time.perf_counter()
+                try:
+                    component.instance = component.loader()
+                except Exception as e:
+                    component.error = str(e)
+                    raise
+                component.load_time = time.perf_counter() - start
+                component.loaded = True
+                component.error = None
+                # 처음 사용할 때 로드한 컴포넌트도 예열까지 마쳐야 /readyz가 준비 완료로 응답
+                try:
+                    self._warmup(component, component.instance)
+                except Exception as e:
+                    # 요청 처리는 로드된 인스턴스로 계속하고 예열 실패는 상태에만 기록
+                    log.error("컴포넌트 예열 실패", component=name, error=str(e))
+        return component.instance
+
+    async def aget(self, name: str) -> Any:
+        """이벤트 루프를 막지 않고 컴포넌트 인스턴스 반환"""
+        component = self._components[name]
+        if component.loaded:
+            return component.instance
+        return await asyncio.to_thread(self.get, name)
+
+    @staticmethod
+    def _warmup(component: Component, instance: Any):
+        """예열 함수 실행 (component.lock을 잡은 상태에서 호출)"""
+        if component.warmed_up:
+            return
+        start = time.perf_counter()
+        try:
+            if component.warmup is not None:
+                component.warmup(instance)
+        except Exception as e:
+            component.error = f"warmup 실패: {e}"
+            raise
+        component.warmup_time = time.perf_counter() - start
+        component.warmed_up = True
+
+    def _load_and_warmup(self, name: str):
+        component = self._components[name]
+        instance = self.get(name)
+        with component.lock:
+            self._warmup(component, instance)
+
+    async def initialize(self, names: List[str] = None):
+        """등록된 컴포넌트를 스레드에서 병렬로 로드하고 예열"""
+        names = names or list(self._components)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._load_and_warmup, name) for name in names),
+            return_exceptions=True,
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                log.error("컴포넌트 로딩 실패", component=name, error=str(result))
+
+    def is_ready(self) -> bool:
+        return all(component.loaded and component.warmed_up for component in self._components.values())
+
+    def status(self) -> Dict[str, dict]:
+        return {name: component.status() for name, component in self._components.items()}
+
+# 모델 레지스트리 인스턴스
+registry = ModelRegistry()
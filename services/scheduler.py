@@ -0,0 +1,183 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager, aclosing
+from typing import Dict
+
+from utils.log import get_logger
+
+log = get_logger("scheduler")
+
+# LLM 요청 스케줄러 설정
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # 동시에 진행할 수 있는 전체 요청 수
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))  # 대기할 수 있는 요청 수 (넘으면 busy)
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "10"))  # 초당 LLM 호출 수 (0이면 제한 없음)
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_TTFT_TIMEOUT = float(os.getenv("LLM_TTFT_TIMEOUT", "20"))  # 첫 토큰까지 기다릴 최대 시간(초)
+
+# 재시도할 OpenAI 클라이언트 예외 (레이트 리밋, 연결 오류, 서버 오류)
+RETRYABLE_ERRORS = {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+class SchedulerBusy(Exception):
+    """대기열이 가득 차 요청을 받을 수 없을 때 발생"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"LLM scheduler busy: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """초당 rate개, 최대 burst개까지 허용하는 토큰 버킷 레이트 리미터"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class LLMScheduler:
+    """LLM 요청의 동시 실행 수, 세션별 동시 요청, 대기열 길이, 호출 속도를 제어하는 스케줄러
+
+    admit()으로 요청 슬롯을 얻고(대기열이 가득 차면 SchedulerBusy), astream()으로
+    레이트 리밋, 첫 토큰 타임아웃, 지수 백오프 재시도를 적용해 LLM 스트림을 읽습니다.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        rate_per_sec: float = LLM_RATE_PER_SEC,
+        rate_burst: int = LLM_RATE_BURST,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY,
+        retry_max_delay: float = LLM_RETRY_MAX_DELAY,
+        ttft_timeout: float = LLM_TTFT_TIMEOUT,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.ttft_timeout = ttft_timeout
+        self.rate_limiter = TokenBucket(rate_per_sec, rate_burst)
+        self._semaphore = None
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._session_refs: Dict[str, int] = {}
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "rejected": 0, "retries": 0, "ttft_timeouts": 0, "failures": 0}
+
+    @asynccontextmanager
+    async def admit(self, session_id: str):
+        """세션당 하나, 전체 max_concurrency개까지 요청 실행 (대기열이 가득 차면 SchedulerBusy)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        lock = self._session_locks.get(session_id)
+        must_wait = (lock is not None and lock.locked()) or self.active >= self.max_concurrency
+        if must_wait and self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise SchedulerBusy("queue_full")
+
+        if lock is None:
+            lock = self._session_locks[session_id] = asyncio.Lock()
+        self._session_refs[session_id] = self._session_refs.get(session_id, 0) + 1
+        self.waiting += 1
+        try:
+            await lock.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                lock.release()
+                raise
+        except BaseException:
+            self._release_session(session_id)
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            lock.release()
+            self._release_session(session_id)
+
+    def _release_session(self, session_id: str):
+        self._session_refs[session_id] -= 1
+        if self._session_refs[session_id] == 0:
+            del self._session_refs[session_id]
+            del self._session_locks[session_id]
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def astream(self, llm, prompt: str):
+        """레이트 리밋과 첫 토큰 타임아웃, 재시도를 적용한 llm.astream
+
+        첫 토큰을 받기 전에 실패한 경우에만 재시도하며, 토큰을 내보낸 뒤의 오류는 그대로 전달합니다.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            stream = llm.astream(prompt)
+            try:
+                first_chunk = await asyncio.wait_for(stream.__anext__(), self.ttft_timeout)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                await stream.aclose()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["ttft_timeouts"] += 1
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                delay = self._backoff(attempt)
+                log.warning("LLM 요청 재시도", attempt=attempt + 1, max_retries=self.max_retries, delay=round(delay, 1), error=type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+
+            async with aclosing(stream):
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            return
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, active=self.active, waiting=self.waiting)
+
+# LLM 요청 스케줄러 인스턴스
+llm_scheduler = LLMScheduler()
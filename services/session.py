@@ -1,82 +1,252 @@
+import os
+import sys
 import time
 import uuid
 import json
-from typing import Dict, List
-from langchain.memory import ConversationBufferMemory
+import asyncio
+from typing import Callable, Dict, List, Optional
 
-from utils.helpers import format_timestamp
+from services.session_store import SessionStore, create_session_store
+from utils.helpers import format_timestamp, count_tokens
+from utils.log import get_logger
+
+log = get_logger("session")
+
+# 세션 정리 설정
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))  # 마지막 상호작용 후 만료까지의 시간(초)
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "60"))
+
+# 대화 기록 토큰 예산 설정
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # 최근 대화 원문에 사용할 토큰 수
+HISTORY_EXCERPT_TOKEN_BUDGET = int(os.getenv("HISTORY_EXCERPT_TOKEN_BUDGET", "300"))  # 윈도우 밖 이전 대화 발췌에 사용할 토큰 수
+HISTORY_EXCERPT_MAX_CHARS = 80  # 발췌에 남길 메시지당 최대 글자 수
+
+# 세션 크기 추정용 고정 오버헤드 (바이트, benchmarks.bench_sessions로 측정한 값 기준)
+SESSION_BASE_BYTES = 1024
+MESSAGE_BASE_BYTES = 200
+
+def _role_text(role: str) -> str:
+    return "👤 사용자" if role == "user" else "🖥️ Biblo AI"
+
+def _history_line(message) -> str:
+    """프롬프트용 대화 기록의 메시지 한 줄"""
+    return f"{_role_text(message.role)}: {message.content}\n"
+
+def excerpt_message(content: str) -> str:
+    """메시지의 첫 문장만 남기고 HISTORY_EXCERPT_MAX_CHARS 글자로 자르기 (모델로 요약하지 않는 추출식 발췌)"""
+    text = " ".join(content.split())
+    for delimiter in (". ", "? ", "! ", "다. "):
+        position = text.find(delimiter)
+        if position != -1:
+            text = text[:position + len(delimiter)].strip()
+            break
+    if len(text) > HISTORY_EXCERPT_MAX_CHARS:
+        text = text[:HISTORY_EXCERPT_MAX_CHARS].rstrip() + "…"
+    return text
+
+ASSISTANT_ROLE = "🖥️ Biblo AI"
+
+class Message:
+    """대화 메시지 한 개 (세션 수만큼 쌓이므로 dict 대신 __slots__ 레코드로 보관)
+
+    reply_to는 답변이 가리키는 질문의 메시지 ID, pair는 짝이 되는 메시지(질문이면 답변, 답변이면 질문)의
+    세션 내 위치입니다. 포맷팅된 타임스탬프는 필요할 때만 만듭니다.
+    """
+
+    __slots__ = ("id", "role", "content", "timestamp", "seq", "reply_to", "pair")
+
+    def __init__(self, message_id: str, role: str, content: str, timestamp: float, reply_to: str = None):
+        self.id = message_id
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self.seq = 0
+        self.reply_to = reply_to
+        self.pair = None
+
+    @property
+    def timestamp_formatted(self) -> str:
+        return format_timestamp(self.timestamp)
+
+    def to_dict(self) -> dict:
+        """클라이언트 프레임용 dict (기존 conversation_history 항목과 같은 형태)"""
+        return {
+            "id": self.id,
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "timestamp_formatted": self.timestamp_formatted,
+            "seq": self.seq
+        }
 
 class ChatSession:
-    def __init__(self, session_id: str, query_type: int, user_ip: str = None, user_os: str = None, user_browser: str = None):
+    def __init__(self, session_id: str, query_type: Optional[int], user_ip: str = None, user_os: str = None, user_browser: str = None):
         self.session_id = session_id
-        self.query_type = query_type  # 0: 회사, 1: 도서관
+        self.query_type = query_type  # 0: 회사, 1: 도서관 (None: 첫 질문 분류 전)
+        # 마지막 분류 확신도와 그 뒤로 분류를 생략한 질문 수 (프로세스 내에서만 사용, 저장하지 않음)
+        self.query_confidence = None
+        self.classification_skips = 0
         self.created_at = time.time()
-        self.created_at_formatted = format_timestamp(self.created_at)
         self.last_interaction = time.time()
-        self.last_interaction_formatted = format_timestamp(self.last_interaction)
-        self.conversation_history = []
-        self.memory = ConversationBufferMemory(return_messages=True)
+        self.messages: List[Message] = []
+        self._message_index = {}  # 메시지 ID -> messages 위치
+        self._unanswered: List[int] = []  # 아직 답변이 없는 질문 위치 (오래된 순)
+        # 프롬프트용 대화 기록 (메시지별 토큰 수를 누적 관리, 줄은 포맷팅할 때 메시지에서 생성)
+        self._history_tokens: List[int] = []
+        self._window_start = 0  # 원문으로 포함되는 첫 메시지 위치
+        self._window_tokens = 0
+        self._excerpt_lines: List[str] = []  # 윈도우 밖으로 밀려난 이전 대화의 첫 문장 발췌
+        self._excerpt_tokens: List[int] = []
+        self._formatted_history = None  # 캐시된 포맷팅 결과
         self.feedback = {}  # 메시지 ID와 피드백 저장용 딕셔너리
+        # 피드백 요약용 카운터 (메시지/피드백이 추가될 때 갱신)
+        self.response_count = 0
+        self.positive_feedback = 0
+        self.approx_bytes = SESSION_BASE_BYTES  # 메모리 사용량 추정치
+        self.store = None  # 세션이 등록된 저장소 (chat_sessions에 등록될 때 설정)
         
         # 사용자 정보 추가
         self.user_ip = user_ip
         self.user_os = user_os
         self.user_browser = user_browser
     
-    def add_message(self, role: str, content: str, message_id: str = None):
+    @property
+    def created_at_formatted(self) -> str:
+        return format_timestamp(self.created_at)
+    
+    @property
+    def last_interaction_formatted(self) -> str:
+        return format_timestamp(self.last_interaction)
+    
+    @property
+    def conversation_history(self) -> list:
+        """클라이언트에 보낼 전체 대화 기록 (메시지별 dict 목록)"""
+        return [message.to_dict() for message in self.messages]
+    
+    def add_message(self, role: str, content: str, message_id: str = None, reply_to: str = None):
+        """메시지 추가 (reply_to는 답변이 가리키는 질문의 메시지 ID)"""
         if message_id is None:
             message_id = str(uuid.uuid4())  # 고유한 메시지 ID 생성
         
-        timestamp = time.time()
-        message = {
-            "id": message_id,
-            "role": role,
-            "content": content, 
-            "timestamp": timestamp,
-            "timestamp_formatted": format_timestamp(timestamp)
-        }
-        self.conversation_history.append(message)
+        message = Message(message_id, role, content, time.time(), reply_to)
+        self.last_interaction = message.timestamp
         
-        if role == "user":
-            self.memory.save_context({"input": content}, {"output": ""})
-        elif role == "🖥️ Biblo AI":
-            # 이전 컨텍스트의 출력을 업데이트
-            if self.conversation_history and len(self.conversation_history) >= 2:
-                prev_context = self.memory.load_memory_variables({})
-                prev_inputs = prev_context.get("history", [])
-                if prev_inputs and len(prev_inputs) >= 1:
-                    # 마지막 입력의 출력을 현재 어시스턴트 응답으로 설정
-                    self.memory.save_context({"input": self.conversation_history[-2]["content"]}, {"output": content})
+        # 저장소를 거쳐 기록 (공유 저장소는 다른 워커가 추가한 메시지도 함께 반영)
+        if self.store is not None:
+            self.store.append_message(self, message)
+        else:
+            self.load_message(message)
         
-        self.last_interaction = time.time()
-        self.last_interaction_formatted = format_timestamp(self.last_interaction)
         return message_id
     
+    def load_message(self, message: Message):
+        """메시지를 대화 기록에 추가 (저장소에서 읽은 메시지도 이 경로로 추가)"""
+        index = len(self.messages)
+        # 세션 내에서 단조 증가하는 순번 (공유 저장소에서도 모든 워커가 같은 순서로 읽으므로 동일)
+        message.seq = index + 1
+        self._message_index[message.id] = index
+        self.messages.append(message)
+        self.approx_bytes += MESSAGE_BASE_BYTES + sys.getsizeof(message.content)
+        
+        # 질문과 답변 연결 (reply_to가 없거나 찾을 수 없으면 가장 오래된 미답변 질문과 연결)
+        if message.role == "user":
+            self._unanswered.append(index)
+        else:
+            if message.role == ASSISTANT_ROLE:
+                self.response_count += 1
+            question = self._message_index.get(message.reply_to) if message.reply_to else None
+            if question is None or question not in self._unanswered:
+                question = self._unanswered[0] if self._unanswered else None
+            if question is not None:
+                self._unanswered.remove(question)
+                message.pair = question
+                self.messages[question].pair = index
+        
+        # 프롬프트용 기록에 한 줄 추가하고 토큰 예산을 넘으면 오래된 메시지를 발췌로 이동
+        tokens = count_tokens(_history_line(message))
+        self._history_tokens.append(tokens)
+        self._window_tokens += tokens
+        # 가장 최근 메시지는 예산을 넘더라도 원문으로 유지
+        while self._window_tokens > HISTORY_TOKEN_BUDGET and self._window_start < len(self.messages) - 1:
+            self._excerpt_oldest()
+        self._formatted_history = None
+    
+    def _excerpt_oldest(self):
+        """윈도우의 가장 오래된 메시지를 첫 문장 발췌로 옮기고 발췌 예산을 넘는 오래된 발췌는 제거"""
+        index = self._window_start
+        self._window_tokens -= self._history_tokens[index]
+        self._window_start += 1
+        
+        msg = self.messages[index]
+        excerpt_line = f"- {_role_text(msg.role)}: {excerpt_message(msg.content)}\n"
+        self._excerpt_lines.append(excerpt_line)
+        self._excerpt_tokens.append(count_tokens(excerpt_line))
+        while sum(self._excerpt_tokens) > HISTORY_EXCERPT_TOKEN_BUDGET and len(self._excerpt_lines) > 1:
+            self._excerpt_lines.pop(0)
+            self._excerpt_tokens.pop(0)
+    
+    @property
+    def last_seq(self) -> int:
+        """마지막 메시지의 순번 (메시지가 없으면 0)"""
+        return len(self.messages)
+    
+    def get_messages_since(self, last_message_id: str = None) -> tuple:
+        """클라이언트가 마지막으로 받은 메시지 이후의 메시지 목록과 기준 순번 반환
+
+        last_message_id가 없거나 이 세션에서 찾을 수 없으면 기준 순번 0과 전체 기록을 반환합니다.
+        """
+        index = self._message_index.get(last_message_id) if last_message_id else None
+        if index is None:
+            return 0, self.conversation_history
+        return index + 1, [message.to_dict() for message in self.messages[index + 1:]]
+    
+    def save(self):
+        """사용자 정보, query_type 등 세션 메타데이터 변경 사항을 저장소에 반영"""
+        if self.store is not None:
+            self.store.save_session(self)
+    
+    def load_feedback(self, message_id: str, feedback_value: int):
+        """피드백을 기록하고 요약 카운터 갱신 (저장소에서 읽은 피드백도 이 경로로 추가)"""
+        previous = self.feedback.get(message_id)
+        if previous == 1:
+            self.positive_feedback -= 1
+        if feedback_value == 1:
+            self.positive_feedback += 1
+        self.feedback[message_id] = feedback_value
+    
     def add_feedback(self, message_id: str, feedback_value: int):
         """메시지 ID에 대한 피드백 추가 (1: 좋아요, 0: 싫어요)"""
-        if message_id in [msg["id"] for msg in self.conversation_history]:
-            self.feedback[message_id] = feedback_value
+        if message_id in self._message_index:
+            self.load_feedback(message_id, feedback_value)
+            if self.store is not None:
+                self.store.save_feedback(self, message_id, feedback_value)
             return True
         return False
     
     def get_formatted_history(self) -> str:
         """대화 기록을 LLM 프롬프트용으로 포맷팅"""
-        if not self.conversation_history:
+        if not self.messages:
             return "이전 대화 내용이 없습니다."
         
-        history_text = "이전 대화 내용:\n"
-        for msg in self.conversation_history:
-            role_text = "👤 사용자" if msg["role"] == "user" else "🖥️ Biblo AI"
-            history_text += f"{role_text}: {msg['content']}\n"
-        return history_text
+        if self._formatted_history is None:
+            parts = []
+            if self._excerpt_lines:
+                parts.append("이전 대화 발췌 (메시지별 첫 문장):\n")
+                parts.extend(self._excerpt_lines)
+            parts.append("이전 대화 내용:\n")
+            parts.extend(_history_line(message) for message in self.messages[self._window_start:])
+            self._formatted_history = "".join(parts)
+        return self._formatted_history
     
     def get_feedback_summary(self) -> dict:
         """피드백 통계 요약"""
         total_feedback = len(self.feedback)
-        positive_feedback = sum(1 for v in self.feedback.values() if v == 1)
+        positive_feedback = self.positive_feedback
         
         return {
-            "total_responses": sum(1 for msg in self.conversation_history if msg["role"] == "🖥️ Biblo AI"),
+            "total_responses": self.response_count,
             "total_feedback": total_feedback,
             "positive_feedback": positive_feedback,
             "negative_feedback": total_feedback - positive_feedback,
@@ -84,26 +254,172 @@ class ChatSession:
         }
     
     def get_chat_log(self) -> list:
-        """모든 채팅 로그 반환 (포맷팅된 타임스탬프 포함)"""
+        """질문과 답변 쌍별 채팅 로그 반환 (포맷팅된 타임스탬프 포함, 답변 순서)"""
         chat_logs = []
         
-        for i in range(0, len(self.conversation_history), 2):
-            if i + 1 < len(self.conversation_history):
-                user_msg = self.conversation_history[i]
-                ai_msg = self.conversation_history[i + 1]
-                
-                # 해당 메시지에 대한 피드백 찾기
-                feedback = self.feedback.get(ai_msg["id"], None)
-                
-                chat_logs.append({
-                    "chatID": ai_msg["id"],
-                    "chat_time": ai_msg["timestamp_formatted"],  # 포맷팅된 타임스탬프 사용
-                    "user_prompt": user_msg["content"],
-                    "assistant_prompt": ai_msg["content"],
-                    "user_feedback": feedback
-                })
+        for ai_msg in self.messages:
+            if ai_msg.role == "user" or ai_msg.pair is None:
+                continue
+            user_msg = self.messages[ai_msg.pair]
+            chat_logs.append({
+                "chatID": ai_msg.id,
+                "chat_time": ai_msg.timestamp_formatted,  # 포맷팅된 타임스탬프 사용
+                "user_prompt": user_msg.content,
+                "assistant_prompt": ai_msg.content,
+                "user_feedback": self.feedback.get(ai_msg.id, None)  # 해당 메시지에 대한 피드백
+            })
         
         return chat_logs
 
-# 채팅 세션 저장소
-chat_sessions: Dict[str, ChatSession] = {} 
\ No newline at end of file
+# 채팅 세션 저장소 (SESSION_STORE 환경변수로 memory 또는 sqlite 선택)
+chat_sessions: SessionStore = create_session_store()
+
+
+class SessionReaper:
+    """유휴 세션을 만료시키고 세션 수/메모리 예산을 넘으면 LRU 순으로 정리하는 백그라운드 작업
+
+    정리되는 세션은 on_evict(session_id)로 전달되어 /end_session과 같은 경로로 처리됩니다.
+    대상 선정은 저장소의 usage()로 하므로 공유 저장소에서도 세션 전체를 읽어 오지 않습니다.
+    세션 수 상한은 새 세션을 등록할 때마다 enforce_max_sessions()로도 확인하고,
+    이 워커에서 응답을 생성 중인 세션(hold/release)은 어느 경우에도 정리하지 않습니다.
+    """
+
+    def __init__(
+        self,
+        sessions: SessionStore,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_bytes: int = SESSION_MAX_BYTES,
+        interval: float = SESSION_REAP_INTERVAL,
+    ):
+        self.sessions = sessions
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.on_evict: Callable[[str], None] = None
+        self.stats = {
+            "runs": 0, "evicted_idle": 0, "evicted_max_sessions": 0, "evicted_max_bytes": 0, "skipped_active": 0,
+        }
+        self._task = None
+        # 응답 생성 중인 세션 ID -> 진행 중인 응답 수
+        self._answering: Dict[str, int] = {}
+
+    def hold(self, session_id: str):
+        """응답 생성을 시작한 세션을 정리 대상에서 제외"""
+        self._answering[session_id] = self._answering.get(session_id, 0) + 1
+
+    def release(self, session_id: str):
+        """hold한 세션의 응답 생성이 끝남"""
+        remaining = self._answering.get(session_id, 0) - 1
+        if remaining > 0:
+            self._answering[session_id] = remaining
+        else:
+            self._answering.pop(session_id, None)
+
+    def is_answering(self, session_id: str) -> bool:
+        return session_id in self._answering
+
+    def _skip(self, session_id: str) -> bool:
+        """정리 대상이지만 응답 생성 중이라 남겨 둘 세션인지 확인"""
+        if self.is_answering(session_id):
+            self.stats["skipped_active"] += 1
+            return True
+        return False
+
+    def _evict(self, session_id: str, reason: str):
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+        try:
+            del self.sessions[session_id]
+        except KeyError:
+            pass
+        self.stats[f"evicted_{reason}"] += 1
+
+    def reap(self, now: float = None) -> int:
+        """만료 및 예산 초과 세션 정리 후 정리된 세션 수 반환"""
+        now = time.time() if now is None else now
+        self.stats["runs"] += 1
+        evicted = 0
+
+        # 마지막 상호작용 순(오래된 것부터)
+        remaining = []
+        for session_id, last_interaction, approx_bytes in self.sessions.usage():
+            if now - last_interaction >= self.idle_ttl and not self._skip(session_id):
+                self._evict(session_id, "idle")
+                evicted += 1
+            else:
+                remaining.append((session_id, approx_bytes))
+
+        total_bytes = sum(approx_bytes for _, approx_bytes in remaining)
+        count = len(remaining)
+        for session_id, approx_bytes in remaining:
+            if count > self.max_sessions:
+                reason = "max_sessions"
+            elif total_bytes > self.max_bytes:
+                reason = "max_bytes"
+            else:
+                break
+            if self._skip(session_id):
+                continue
+            self._evict(session_id, reason)
+            evicted += 1
+            count -= 1
+            total_bytes -= approx_bytes
+        return evicted
+
+    def enforce_max_sessions(self, keep: str = None) -> int:
+        """세션 수가 상한을 넘으면 오래된 세션부터 정리 (새 세션 등록 직후 호출, keep은 방금 등록한 세션)
+
+        응답 생성 중인 세션만 남아 있으면 상한을 잠시 넘을 수 있으며 다음 정리 때 다시 확인합니다.
+        """
+        excess = len(self.sessions) - self.max_sessions
+        if excess <= 0:
+            return 0
+        evicted = 0
+        for session_id, _, _ in self.sessions.usage():
+            if evicted >= excess:
+                break
+            if session_id == keep or self._skip(session_id):
+                continue
+            self._evict(session_id, "max_sessions")
+            evicted += 1
+        return evicted
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                evicted = await self.sessions.call(self.reap)
+                if evicted:
+                    log.info("세션 정리", evicted=evicted)
+            except Exception as e:
+                log.error("세션 정리 오류", error=str(e))
+
+    def start(self, on_evict: Callable[[str], None] = None):
+        """백그라운드 정리 작업 시작"""
+        if on_evict is not None:
+            self.on_evict = on_evict
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """백그라운드 정리 작업 중지"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        usage = self.sessions.usage()
+        return dict(
+            self.stats,
+            active_sessions=len(usage),
+            approx_bytes=sum(approx_bytes for _, _, approx_bytes in usage),
+        )
+
+# 유휴 세션 정리 작업
+session_reaper = SessionReaper(chat_sessions)
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import queue
+import sqlite3
+import datetime
+import threading
+from typing import Callable, Dict, List
+
+from utils.log import get_logger
+
+log = get_logger("session_log")
+
+# 세션 로그 설정
+SESSION_LOG_BACKENDS = os.getenv("SESSION_LOG_BACKENDS", "jsonl,sqlite")  # 쉼표로 구분된 백엔드 목록
+SESSION_LOG_DIR = os.getenv("SESSION_LOG_DIR", "./logs")
+SESSION_LOG_DB_PATH = os.getenv("SESSION_LOG_DB_PATH", "./logs/session_logs.db")
+SESSION_LOG_BATCH_SIZE = int(os.getenv("SESSION_LOG_BATCH_SIZE", "200"))
+SESSION_LOG_BATCH_BYTES = int(os.getenv("SESSION_LOG_BATCH_BYTES", str(1024 * 1024)))
+SESSION_LOG_FLUSH_INTERVAL = float(os.getenv("SESSION_LOG_FLUSH_INTERVAL", "1.0"))
+SESSION_LOG_QUEUE_SIZE = int(os.getenv("SESSION_LOG_QUEUE_SIZE", "100000"))
+SESSION_LOG_SHUTDOWN_TIMEOUT = float(os.getenv("SESSION_LOG_SHUTDOWN_TIMEOUT", "10"))
+
+
+class SessionLogBackend:
+    """세션 로그 저장 백엔드 인터페이스 (백그라운드 쓰기 스레드에서만 호출)"""
+
+    def write_batch(self, records: List[dict], lines: List[str]):
+        """레코드 묶음 저장 (lines는 레코드별 JSON 문자열)"""
+        raise NotImplementedError
+
+    def close(self):
+        """백엔드 자원 정리"""
+
+
+class JsonlSessionLogBackend(SessionLogBackend):
+    """날짜별 JSONL 파일에 세션 로그를 추가하는 백엔드"""
+
+    def __init__(self, directory: str = SESSION_LOG_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, records: List[dict], lines: List[str]):
+        filename = f"session_logs_{datetime.date.today().strftime('%Y%m%d')}.jsonl"
+        with open(os.path.join(self.directory, filename), "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class SQLiteSessionLogBackend(SessionLogBackend):
+    """SQLite 테이블에 세션 로그를 저장하는 백엔드"""
+
+    def __init__(self, path: str = SESSION_LOG_DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                session_start TEXT,
+                session_end TEXT,
+                log TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def write_batch(self, records: List[dict], lines: List[str]):
+        self._conn.executemany(
+            "INSERT INTO session_logs (session_id, session_start, session_end, log) VALUES (?, ?, ?, ?)",
+            [
+                (record.get("sessionID"), record.get("session_start"), record.get("session_end"), line)
+                for record, line in zip(records, lines)
+            ],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+# 백엔드 이름별 생성 함수 (RDBMS 등 새 백엔드는 register_backend로 추가)
+SESSION_LOG_BACKEND_FACTORIES: Dict[str, Callable[[], SessionLogBackend]] = {
+    "jsonl": JsonlSessionLogBackend,
+    "sqlite": SQLiteSessionLogBackend,
+}
+
+def register_backend(name: str, factory: Callable[[], SessionLogBackend]):
+    """SESSION_LOG_BACKENDS에서 사용할 수 있는 세션 로그 백엔드 등록"""
+    SESSION_LOG_BACKEND_FACTORIES[name] = factory
+
+
+class SessionLogSink:
+    """세션 로그를 큐에 모아 백그라운드 스레드에서 배치로 저장하는 싱크
+
+    submit()은 큐에 넣기만 하므로 호출한 쪽(이벤트 루프)을 막지 않으며,
+    쌓인 레코드 수나 크기가 기준을 넘거나 flush_interval이 지나면 모든 백엔드에 기록합니다.
+    """
+
+    def __init__(
+        self,
+        backend_names: str = SESSION_LOG_BACKENDS,
+        batch_size: int = SESSION_LOG_BATCH_SIZE,
+        batch_bytes: int = SESSION_LOG_BATCH_BYTES,
+        flush_interval: float = SESSION_LOG_FLUSH_INTERVAL,
+        queue_size: int = SESSION_LOG_QUEUE_SIZE,
+    ):
+        self.backend_names = [name.strip() for name in backend_names.split(",") if name.strip()]
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.backends: List[SessionLogBackend] = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def start(self):
+        """백엔드 생성 및 쓰기 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if not self.backends:
+                self.backends = [SESSION_LOG_BACKEND_FACTORIES[name]() for name in self.backend_names]
+            self._thread = threading.Thread(target=self._worker, name="session-log-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: dict):
+        """세션 로그 레코드를 큐에 추가 (큐가 가득 차면 버리고 dropped 카운트 증가)"""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            self.stats["submitted"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def close(self, timeout: float = SESSION_LOG_SHUTDOWN_TIMEOUT) -> bool:
+        """큐에 남은 로그를 timeout 안에 모두 기록하고 종료, 제시간에 끝나면 True"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return False
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            return False
+        for backend in self.backends:
+            backend.close()
+        self.backends = []
+        return True
+
+    def _write(self, records: List[dict], lines: List[str]):
+        for backend in self.backends:
+            try:
+                backend.write_batch(records, lines)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error("세션 로그 저장 오류", backend=type(backend).__name__, error=str(e))
+        self.stats["written"] += len(records)
+        self.stats["batches"] += 1
+
+    def _worker(self):
+        records, lines, size = [], [], 0
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False  # 시간 기준 flush
+
+            if record is None:
+                stopping = True
+            elif record is not False:
+                line = json.dumps(record, ensure_ascii=False)
+                records.append(record)
+                lines.append(line)
+                size += len(line)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if records and (stopping or due or len(records) >= self.batch_size or size >= self.batch_bytes):
+                self._write(records, lines)
+                records, lines, size = [], [], 0
+                deadline = None
+
+# 세션 로그 싱크 인스턴스
+session_log_sink = SessionLogSink()
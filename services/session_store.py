@@ -0,0 +1,347 @@
+import os
+import time
+import asyncio
+import sqlite3
+import weakref
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# 세션 저장소 설정
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # memory | sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./database/sessions.db")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))  # 워커마다 메모리에 유지할 최대 세션 수 (sqlite)
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "600"))  # 이 시간(초) 동안 조회하지 않은 세션은 캐시에서 제거 (sqlite)
+
+
+class SessionStore(MutableMapping):
+    """ChatSession 저장소 인터페이스
+
+    dict처럼 session_id로 세션을 조회/등록/삭제하며, ChatSession은 변경이 생길 때
+    append_message, save_feedback, save_session을 호출해 저장소에 반영합니다.
+    shared가 True인 저장소는 여러 워커 프로세스가 함께 사용하며, 이벤트 루프에서는
+    call()로 저장소 작업을 실행해 디스크 I/O가 루프를 막지 않도록 합니다.
+    """
+
+    shared = False
+
+    async def call(self, func: Callable, *args, **kwargs):
+        """저장소를 읽거나 쓰는 함수 실행 (공유 저장소는 스레드에서 실행)"""
+        if self.shared:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    async def aget(self, session_id: str, default=None):
+        """이벤트 루프용 get"""
+        return await self.call(self.get, session_id, default)
+
+    def usage(self) -> List[Tuple[str, float, int]]:
+        """세션마다 (session_id, 마지막 상호작용 시각, 추정 메모리 사용량)을 오래된 순으로 반환 (세션 정리용)"""
+        sessions = [(session_id, session.last_interaction, session.approx_bytes) for session_id, session in self.items()]
+        return sorted(sessions, key=lambda item: item[1])
+
+    def append_message(self, session, message):
+        """세션에 메시지(services.session.Message) 추가"""
+        session.load_message(message)
+
+    def save_feedback(self, session, message_id: str, feedback_value: int):
+        """메시지 피드백 저장"""
+
+    def save_session(self, session):
+        """세션 메타데이터 저장"""
+
+    def close(self):
+        """저장소 자원 정리"""
+
+
+class MemorySessionStore(SessionStore):
+    """프로세스 메모리의 dict에 세션을 보관하는 기본 저장소"""
+
+    def __init__(self):
+        self._sessions: Dict[str, object] = {}
+
+    def __getitem__(self, session_id: str):
+        return self._sessions[session_id]
+
+    def __setitem__(self, session_id: str, session):
+        session.store = self
+        self._sessions[session_id] = session
+
+    def __delitem__(self, session_id: str):
+        del self._sessions[session_id]
+
+    def __contains__(self, session_id) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """WAL 모드 SQLite 파일을 여러 워커 프로세스가 공유하는 세션 저장소
+
+    세션 메타데이터, 메시지, 피드백을 별도 테이블에 저장합니다. 메시지는 추가될 때마다
+    한 행씩 INSERT 하고, 조회 시에는 로컬에 캐시된 세션에 마지막으로 읽은 seq 이후의
+    메시지만 읽어 붙이므로 세션 전체를 다시 쓰거나 읽지 않습니다.
+
+    로컬 캐시는 최근 조회 순으로 cache_size개까지, cache_ttl초 동안만 유지합니다. 캐시에서 빠진
+    세션을 다시 조회하면 DB에서 새로 읽으며, 다른 워커가 삭제한 세션은 조회 시 캐시에서도 제거합니다.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = SESSION_DB_PATH, cache_size: int = SESSION_CACHE_SIZE, cache_ttl: float = SESSION_CACHE_TTL):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        # session_id -> (세션, 마지막 조회 시각), 오래 조회하지 않은 순
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # 세션 객체 -> 마지막으로 읽은 seq (캐시에서 빠져도 요청 처리 중인 세션 객체는 계속 이어서 읽음)
+        self._last_seq: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=30000")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    query_type INTEGER,
+                    created_at REAL,
+                    last_interaction REAL,
+                    user_ip TEXT,
+                    user_os TEXT,
+                    user_browser TEXT
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    reply_to TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, seq);
+                CREATE TABLE IF NOT EXISTS feedback (
+                    session_id TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    feedback_value INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, message_id)
+                );
+            """)
+            # reply_to 열이 없던 기존 DB 파일 갱신
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(messages)")]
+            if "reply_to" not in columns:
+                self._conn.execute("ALTER TABLE messages ADD COLUMN reply_to TEXT")
+
+    def _upsert_session(self, session):
+        self._conn.execute(
+            """
+            INSERT INTO sessions (session_id, query_type, created_at, last_interaction, user_ip, user_os, user_browser)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                query_type = excluded.query_type,
+                last_interaction = MAX(sessions.last_interaction, excluded.last_interaction),
+                user_ip = excluded.user_ip,
+                user_os = excluded.user_os,
+                user_browser = excluded.user_browser
+            """,
+            (session.session_id, session.query_type, session.created_at, session.last_interaction,
+             session.user_ip, session.user_os, session.user_browser),
+        )
+
+    def _cache_get(self, session_id: str):
+        entry = self._cache.get(session_id)
+        if entry is None:
+            return None
+        self._cache[session_id] = (entry[0], time.monotonic())
+        self._cache.move_to_end(session_id)
+        return entry[0]
+
+    def _cache_put(self, session_id: str, session):
+        self._cache[session_id] = (session, time.monotonic())
+        self._cache.move_to_end(session_id)
+        self._prune_cache()
+
+    def _prune_cache(self):
+        """캐시 크기와 유지 시간을 넘은 세션을 오래 조회하지 않은 순으로 제거"""
+        now = time.monotonic()
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        while self._cache and now - next(iter(self._cache.values()))[1] > self.cache_ttl:
+            self._cache.popitem(last=False)
+
+    def _apply_row(self, session, row, loaded: bool = False):
+        session.query_type, session.created_at, last_interaction, session.user_ip, session.user_os, session.user_browser = row
+        if loaded or last_interaction > session.last_interaction:
+            session.last_interaction = last_interaction
+
+    def _load_new_messages(self, session):
+        """마지막으로 읽은 seq 이후에 추가된 메시지만 읽어 세션에 반영"""
+        from services.session import Message
+
+        last_seq = self._last_seq.get(session, 0)
+        rows = self._conn.execute(
+            "SELECT seq, message_id, role, content, timestamp, reply_to FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session.session_id, last_seq),
+        ).fetchall()
+        for seq, message_id, role, content, timestamp, reply_to in rows:
+            session.load_message(Message(message_id, role, content, timestamp, reply_to))
+            last_seq = seq
+        self._last_seq[session] = last_seq
+
+    def _load_feedback(self, session):
+        rows = self._conn.execute(
+            "SELECT message_id, feedback_value FROM feedback WHERE session_id = ?", (session.session_id,)
+        ).fetchall()
+        for message_id, feedback_value in rows:
+            session.load_feedback(message_id, feedback_value)
+
+    def __getitem__(self, session_id: str):
+        from services.session import ChatSession
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT query_type, created_at, last_interaction, user_ip, user_os, user_browser FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                # 다른 워커에서 종료된 세션
+                self._cache.pop(session_id, None)
+                raise KeyError(session_id)
+
+            session = self._cache_get(session_id)
+            loaded = session is None
+            if loaded:
+                session = ChatSession(session_id, row[0])
+                session.store = self
+                self._cache_put(session_id, session)
+            self._apply_row(session, row, loaded)
+            self._load_new_messages(session)
+            self._load_feedback(session)
+            return session
+
+    def __setitem__(self, session_id: str, session):
+        with self._lock:
+            session.store = self
+            self._cache_put(session_id, session)
+            self._last_seq[session] = 0
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._upsert_session(session)
+                for message in session.messages:
+                    self._insert_message(session_id, message)
+                for message_id, feedback_value in session.feedback.items():
+                    self._insert_feedback(session_id, message_id, feedback_value)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            seq = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+            self._last_seq[session] = seq or 0
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM feedback WHERE session_id = ?", (session_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.pop(session_id, None)
+            if not deleted:
+                raise KeyError(session_id)
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            found = self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+            if not found:
+                self._cache.pop(session_id, None)
+            return found
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT session_id FROM sessions").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def usage(self) -> List[Tuple[str, float, int]]:
+        """세션 객체를 만들지 않고 SQL 집계로 세션별 사용량 계산 (메시지 본문은 UTF-8 크기 기준 추정)"""
+        from services.session import SESSION_BASE_BYTES, MESSAGE_BASE_BYTES
+
+        with self._lock:
+            self._prune_cache()
+            rows = self._conn.execute("""
+                SELECT s.session_id, s.last_interaction, COUNT(m.seq), COALESCE(SUM(LENGTH(CAST(m.content AS BLOB))), 0)
+                FROM sessions s LEFT JOIN messages m ON m.session_id = s.session_id
+                GROUP BY s.session_id
+                ORDER BY s.last_interaction
+            """).fetchall()
+        return [
+            (session_id, last_interaction, SESSION_BASE_BYTES + count * MESSAGE_BASE_BYTES + content_bytes)
+            for session_id, last_interaction, count, content_bytes in rows
+        ]
+
+    def _insert_message(self, session_id: str, message):
+        self._conn.execute(
+            "INSERT INTO messages (session_id, message_id, role, content, timestamp, reply_to) VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, message.id, message.role, message.content, message.timestamp, message.reply_to),
+        )
+
+    def _insert_feedback(self, session_id: str, message_id: str, feedback_value: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO feedback (session_id, message_id, feedback_value) VALUES (?, ?, ?)",
+            (session_id, message_id, feedback_value),
+        )
+
+    def append_message(self, session, message):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_message(session.session_id, message)
+                self._conn.execute(
+                    "UPDATE sessions SET last_interaction = MAX(last_interaction, ?) WHERE session_id = ?",
+                    (session.last_interaction, session.session_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # 방금 추가한 메시지와 다른 워커가 먼저 추가한 메시지를 seq 순서대로 반영
+            self._load_new_messages(session)
+
+    def save_feedback(self, session, message_id: str, feedback_value: int):
+        with self._lock:
+            self._insert_feedback(session.session_id, message_id, feedback_value)
+
+    def save_session(self, session):
+        with self._lock:
+            self._upsert_session(session)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """설정에 맞는 세션 저장소 생성"""
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"지원하지 않는 세션 저장소: {kind}")
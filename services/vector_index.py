@@ -0,0 +1,159 @@
+import os
+import json
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from utils.log import get_logger
+
+log = get_logger("vector_index")
+
+# 프로세스 내 벡터 인덱스 설정
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./database/vector_index")
+VECTOR_INDEX_EXPORT_BATCH = int(os.getenv("VECTOR_INDEX_EXPORT_BATCH", "1000"))
+
+
+class VectorIndex:
+    """Milvus 컬렉션에서 내보낸 벡터를 메모리 맵 NumPy 행렬로 읽어 검색하는 프로세스 내 인덱스
+
+    여러 질문 벡터를 한 번의 행렬 곱(내적, Milvus 인덱스의 IP와 같은 점수)으로 채점하고
+    argpartition으로 top-k만 골라 정렬합니다. 결과는 Milvus 저장소와 같은 형태의 Document입니다.
+    """
+
+    def __init__(self, name: str, vectors: np.ndarray, texts: List[str], metadatas: List[dict]):
+        self.name = name
+        self.vectors = vectors
+        self.texts = texts
+        self.metadatas = metadatas
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search_ids(self, vectors, top_k: int = 3):
+        """질문 벡터별 (행 번호 배열, 점수 배열)을 점수 내림차순으로 반환"""
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        k = min(top_k, len(self))
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        scores = queries @ self.vectors.T
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), (len(queries), scores.shape[1]))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+    def search(self, vectors, top_k: int = 3, with_vectors: bool = False) -> list:
+        """질문 벡터별 Document 목록 반환 (search_by_vectors와 같은 형태, with_vectors면 문서 벡터 행렬도 함께 반환)"""
+        from langchain_core.documents import Document
+
+        ids, _ = self.search_ids(vectors, top_k)
+        results = [
+            [Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])) for i in row]
+            for row in ids.tolist()
+        ]
+        if with_vectors:
+            return [(documents, self.vectors[row]) for documents, row in zip(results, ids)]
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> list:
+        return self.search([embedding], k)[0]
+
+
+def _index_paths(directory: str, collection_name: str):
+    base = os.path.join(directory, collection_name)
+    return base + ".vectors.npy", base + ".meta.json"
+
+
+def export_collection(uri: str, collection_name: str, directory: str = VECTOR_INDEX_DIR, batch_size: int = VECTOR_INDEX_EXPORT_BATCH) -> dict:
+    """Milvus 컬렉션의 벡터와 텍스트, 메타데이터를 directory에 .npy와 .json 파일로 내보내기"""
+    from pymilvus import MilvusClient, DataType
+
+    client = MilvusClient(uri=uri)
+    try:
+        schema = client.describe_collection(collection_name)
+        vector_field = next(field["name"] for field in schema["fields"] if field["type"] == DataType.FLOAT_VECTOR)
+        primary_field = next(field["name"] for field in schema["fields"] if field.get("is_primary"))
+        metric_type = "IP"
+        for index_name in client.list_indexes(collection_name):
+            metric_type = client.describe_index(collection_name, index_name).get("metric_type", metric_type)
+        if metric_type != "IP":
+            raise ValueError(f"내적(IP) 인덱스만 지원합니다: {collection_name} ({metric_type})")
+
+        rows = []
+        iterator = client.query_iterator(collection_name, batch_size=batch_size, filter="", output_fields=["*"])
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                rows.extend(batch)
+        finally:
+            iterator.close()
+    finally:
+        client.close()
+
+    rows.sort(key=lambda row: row[primary_field])
+    vectors = np.asarray([row.pop(vector_field) for row in rows], dtype=np.float32)
+    texts = [row.pop("text") for row in rows]
+
+    os.makedirs(directory, exist_ok=True)
+    vectors_path, meta_path = _index_paths(directory, collection_name)
+    # 다른 워커가 읽는 중이어도 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+    with open(vectors_path + ".tmp", "wb") as f:
+        np.save(f, vectors)
+    meta = {
+        "collection": collection_name,
+        "source": os.path.abspath(uri),
+        "source_mtime": os.path.getmtime(uri) if os.path.exists(uri) else time.time(),
+        "exported_at": time.time(),
+        "metric_type": metric_type,
+        "count": len(texts),
+        "dim": int(vectors.shape[1]) if len(texts) else 0,
+        "texts": texts,
+        "metadatas": rows,
+    }
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(vectors_path + ".tmp", vectors_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    log.info("벡터 인덱스 내보내기 완료", collection=collection_name, count=meta["count"], dim=meta["dim"])
+    return meta
+
+
+def load_index(collection_name: str, directory: str = VECTOR_INDEX_DIR, uri: Optional[str] = None) -> VectorIndex:
+    """내보낸 인덱스를 메모리 맵으로 로드 (없거나 uri의 Milvus DB와 맞지 않으면 먼저 내보내기)"""
+    vectors_path, meta_path = _index_paths(directory, collection_name)
+    stale = not (os.path.exists(vectors_path) and os.path.exists(meta_path))
+    if not stale and uri is not None and os.path.exists(uri):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        # 다른 DB 파일(새 컬렉션 버전)에서 내보냈거나 원본이 더 새로우면 다시 내보내기
+        stale = meta.get("source") != os.path.abspath(uri) or os.path.getmtime(uri) > meta.get("source_mtime", 0)
+    if stale:
+        if uri is None:
+            raise FileNotFoundError(f"내보낸 벡터 인덱스가 없습니다: {vectors_path}")
+        export_collection(uri, collection_name, directory)
+
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    vectors = np.load(vectors_path, mmap_mode="r")
+    return VectorIndex(collection_name, vectors, meta["texts"], meta["metadatas"])
+
+
+if __name__ == "__main__":
+    import argparse
+    from services.embeddings import MILVUS_URI, COMPANY_COLLECTION, BIBLO_COLLECTION
+
+    parser = argparse.ArgumentParser(description="Milvus 컬렉션을 프로세스 내 벡터 인덱스로 내보내기")
+    parser.add_argument("--uri", default=MILVUS_URI)
+    parser.add_argument("--dir", default=VECTOR_INDEX_DIR)
+    parser.add_argument("collections", nargs="*", default=[COMPANY_COLLECTION, BIBLO_COLLECTION])
+    args = parser.parse_args()
+    for name in args.collections:
+        export_collection(args.uri, name, args.dir)
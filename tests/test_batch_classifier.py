@@ -0,0 +1,91 @@
+import time
+import asyncio
+from typing import List, Tuple
+
+from services.bert import BatchClassifier
+
+
+class KeywordClassifier:
+    """benchmarks.fakes.KeywordClassifier와 같은 predict_fn (배치마다 latency초 동안 워커 스레드 점유)"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.batch_sizes: List[int] = []
+
+    def __call__(self, prompts: List[str]) -> List[Tuple[int, float]]:
+        self.batch_sizes.append(len(prompts))
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return [(0, 0.99) if "회사" in prompt else (1, 0.99) for prompt in prompts]
+
+
+async def classify_all(classifier: BatchClassifier, prompts: List[str]) -> Tuple[list, List[float]]:
+    """동시에 분류하고 (결과 목록, 요청별 지연 시간) 반환"""
+    async def timed(prompt: str):
+        start = time.perf_counter()
+        result = await classifier.classify(prompt)
+        return result, time.perf_counter() - start
+
+    timed_results = await asyncio.gather(*(timed(prompt) for prompt in prompts))
+    return [result for result, _ in timed_results], [latency for _, latency in timed_results]
+
+
+def test_results_match_prompts():
+    predict = KeywordClassifier()
+    classifier = BatchClassifier(predict, max_batch_size=8, max_wait_ms=5)
+    prompts = [f"회사 질문 {i}" if i % 3 == 0 else f"도서관 질문 {i}" for i in range(50)]
+    try:
+        results, _ = asyncio.run(classify_all(classifier, prompts))
+    finally:
+        classifier.stop(timeout=5)
+    assert [query_type for query_type, _ in results] == [0 if i % 3 == 0 else 1 for i in range(50)]
+    assert max(predict.batch_sizes) <= 8
+
+
+def test_concurrent_requests_are_batched_for_throughput():
+    # 배치 크기와 무관하게 forward pass 한 번에 고정 시간이 드는 모델
+    latency, requests, max_batch_size = 0.05, 64, 16
+    predict = KeywordClassifier(latency)
+    classifier = BatchClassifier(predict, max_batch_size=max_batch_size, max_wait_ms=5)
+    try:
+        start = time.perf_counter()
+        results, latencies = asyncio.run(classify_all(classifier, [f"질문 {i}" for i in range(requests)]))
+        elapsed = time.perf_counter() - start
+    finally:
+        classifier.stop(timeout=5)
+
+    assert len(results) == requests
+    assert sum(predict.batch_sizes) == requests
+    # 하나씩 분류하면 64번의 forward pass가 필요
+    assert len(predict.batch_sizes) <= requests // max_batch_size + 2
+    assert elapsed < requests * latency / 4
+    # 가장 늦은 요청도 앞선 배치 몇 개만 기다림
+    assert max(latencies) < (len(predict.batch_sizes) + 1) * latency + 0.1
+
+
+def test_lone_request_waits_at_most_max_wait():
+    predict = KeywordClassifier()
+    classifier = BatchClassifier(predict, max_batch_size=32, max_wait_ms=20)
+    try:
+        asyncio.run(classifier.classify("도서관 운영 시간"))  # 워커 스레드 시작
+        _, latencies = asyncio.run(classify_all(classifier, ["도서관 운영 시간"]))
+    finally:
+        classifier.stop(timeout=5)
+    assert predict.batch_sizes == [1, 1]
+    assert latencies[0] < 0.02 + 0.2
+
+
+def test_predict_error_fails_every_request_in_batch():
+    def failing(prompts):
+        raise RuntimeError("model error")
+
+    classifier = BatchClassifier(failing, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(classifier.classify(f"질문 {i}") for i in range(4)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        classifier.stop(timeout=5)
+    assert all(isinstance(result, RuntimeError) for result in results)
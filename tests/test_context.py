@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from services.context import pack_chunks, truncate_sentences
+from utils.helpers import count_tokens
+
+
+def document(title: str, source_text: str):
+    return SimpleNamespace(page_content=title, metadata={"source_text": source_text})
+
+
+def test_truncate_sentences_keeps_whole_sentences():
+    text = "첫 번째 문장입니다. 두 번째 문장입니다. 세 번째 문장입니다."
+    first = count_tokens("첫 번째 문장입니다. ")
+    assert truncate_sentences(text, first) == "첫 번째 문장입니다."
+
+
+def test_truncate_sentences_cuts_oversized_first_sentence():
+    text = "마침표 없이 아주 길게 이어지는 규정 원문 " * 50
+    body = truncate_sentences(text, 40)
+    assert body
+    assert text.startswith(body)
+    assert count_tokens(body + " ") <= 40
+
+
+def test_pack_chunks_keeps_chunk_with_long_first_sentence():
+    documents = [
+        document("열람실 운영", "열람실은 평일 08:00~22:00에 운영합니다."),
+        document("대출 규정", "대출 기간과 연장 횟수는 이용자 유형에 따라 다르며 " * 100),
+    ]
+    chunks, used, truncated = pack_chunks(documents, budget=300, min_chunk_tokens=32)
+    assert len(chunks) == 2
+    assert truncated == 1
+    assert chunks[1].startswith("핵심정보: 대출 규정")
+    assert used <= 300
@@ -0,0 +1,36 @@
+import pytest
+
+from services.metrics import MetricsRegistry
+
+
+def test_label_values_and_help_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests_total", "Requests\nby path \\ kind", labelnames=("path",))
+    counter.labels(path='C:\\docs\\"report"\nv2').inc()
+    lines = registry.render().splitlines()
+    assert lines[0] == "# HELP test_requests_total Requests\\nby path \\\\ kind"
+    assert lines[2] == 'test_requests_total{path="C:\\\\docs\\\\\\"report\\"\\nv2"} 1'
+
+
+def test_stats_metrics_declare_types():
+    registry = MetricsRegistry()
+    registry.stats("test_scheduler", "Scheduler", lambda: {"admitted": 3, "active": 1, "enabled": True, "mode": "x"}, gauges=("active",))
+    lines = registry.render().splitlines()
+    assert "# TYPE test_scheduler_admitted counter" in lines
+    assert "# TYPE test_scheduler_active gauge" in lines
+    assert "test_scheduler_admitted 3" in lines
+    assert not any("enabled" in line or "mode" in line for line in lines)
+
+
+def test_output_parses_with_prometheus_client():
+    parser = pytest.importorskip("prometheus_client.parser")
+    registry = MetricsRegistry()
+    registry.counter("test_requests_total", "Requests", labelnames=("path",)).labels(path='a"b\\c\nd').inc(2)
+    registry.histogram("test_latency_seconds", "Latency", labelnames=("stage",)).labels(stage="ttft").observe(0.2)
+    registry.stats("test_cache", "Cache", lambda: {"hits": 5, "entries": 2}, gauges=("entries",))
+    families = {family.name: family for family in parser.text_string_to_metric_families(registry.render())}
+    # 카운터 이름의 _total은 파서 버전에 따라 제거될 수 있음
+    requests = families.get("test_requests") or families["test_requests_total"]
+    assert requests.samples[0].labels == {"path": 'a"b\\c\nd'}
+    assert families["test_cache_entries"].type == "gauge"
+    assert families["test_cache_hits"].type == "counter"
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from services.bert import load_bert, predict_classes
+from services.embeddings import load_embedding_model
+from services.onnx_models import ONNX_MODEL_DIR, EXPORTERS
+from benchmarks.bench_inference import MIN_AGREEMENT, MIN_COSINE, load_texts
+
+# 내보낸 모델이 없으면 테스트 중에 내보내지 않고 건너뜀 (python -m services.onnx_models로 먼저 내보내기)
+if not all(os.path.exists(os.path.join(ONNX_MODEL_DIR, kind, "manifest.json")) for kind in EXPORTERS):
+    pytest.skip(f"{ONNX_MODEL_DIR}에 내보낸 ONNX 모델이 없습니다", allow_module_level=True)
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return load_texts(None, 50, 0)
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    """PyTorch 백엔드의 분류 결과와 임베딩"""
+    prompts, documents = texts
+    return predict_classes(load_bert("torch"), prompts), np.asarray(load_embedding_model("torch").embed_documents(documents))
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_classifier_agrees_with_torch(backend, texts, reference):
+    prompts, _ = texts
+    classes = predict_classes(load_bert(backend), prompts)
+    agreement = np.mean([a[0] == b[0] for a, b in zip(reference[0], classes)])
+    assert agreement >= MIN_AGREEMENT
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_embeddings_match_torch(backend, texts, reference):
+    _, documents = texts
+    vectors = np.asarray(load_embedding_model(backend).embed_documents(documents))
+    expected = reference[1]
+    similarity = (vectors * expected).sum(axis=1) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(expected, axis=1) + 1e-12)
+    assert similarity.min() >= MIN_COSINE
@@ -0,0 +1,109 @@
+import gc
+import asyncio
+from contextlib import contextmanager
+
+import services.embeddings
+import services.pipeline
+from services.embeddings import RetrievalBatcher
+from services.pipeline import prepare_query
+
+
+def test_discarded_search_error_is_consumed(monkeypatch):
+    async def classify(prompt):
+        await asyncio.sleep(0.02)
+        return 1, 0.9
+
+    async def aembed_query(prompt):
+        return [1.0, 0.0]
+
+    async def aretrieve(prompt, component, query_embedding=None):
+        if component == "company_store":
+            raise RuntimeError("company collection unavailable")
+        return query_embedding, ["도서관 문서"], None
+
+    monkeypatch.setattr(services.pipeline, "classify", classify)
+    monkeypatch.setattr(services.pipeline, "aembed_query", aembed_query)
+    monkeypatch.setattr(services.pipeline, "aretrieve", aretrieve)
+    monkeypatch.setattr(services.pipeline, "refresh_collections", lambda: None)
+    monkeypatch.setattr(services.pipeline, "build_retrieved_context", lambda retrieved, title: f"{title}: {retrieved[1][0]}")
+
+    unhandled = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        prepared = await prepare_query("운영 시간?")
+        await asyncio.sleep(0.01)
+        gc.collect()
+        await asyncio.sleep(0.01)
+        return prepared
+
+    prepared = asyncio.run(main())
+    assert prepared.query_type == 1
+    assert prepared.context == "Biblo Collection: 도서관 문서"
+    assert unhandled == []
+
+
+def test_batcher_skips_requests_cancelled_while_waiting():
+    searched = []
+
+    class Batcher(RetrievalBatcher):
+        @staticmethod
+        def _run_batch(batch):
+            searched.extend(query for query, *_ in batch)
+            return [([0.0], None) for _ in batch]
+
+    async def main():
+        batcher = Batcher(None, max_batch_size=8, max_wait_ms=20)
+        kept = asyncio.create_task(batcher.submit("도서관"))
+        discarded = asyncio.create_task(batcher.submit("회사"))
+        await asyncio.sleep(0)
+        discarded.cancel()
+        return await kept
+
+    assert asyncio.run(main()) == ([0.0], None)
+    assert searched == ["도서관"]
+
+
+def test_collections_are_refreshed_once_and_search_timer_excludes_embedding(monkeypatch):
+    events = []
+
+    @contextmanager
+    def stage_timer(stage):
+        events.append(f"{stage} start")
+        yield
+        events.append(f"{stage} end")
+
+    class Batcher:
+        async def submit(self, query, store=None, top_k=3, query_embedding=None, with_vectors=False):
+            if store is None:
+                events.append("embed")
+                return [1.0, 0.0], None
+            events.append(("search", store, tuple(query_embedding)))
+            return query_embedding, ([f"{store} 문서"], None)
+
+    async def classify(prompt):
+        return 1, 0.9
+
+    async def aget(component):
+        return component
+
+    refreshed = []
+    monkeypatch.setattr(services.embeddings, "stage_timer", stage_timer)
+    monkeypatch.setattr(services.embeddings, "retrieval_batcher", Batcher())
+    monkeypatch.setattr(services.embeddings, "CONTEXT_ASSEMBLY", True)
+    monkeypatch.setattr(services.embeddings.registry, "aget", aget)
+    monkeypatch.setattr(services.embeddings, "refresh_collections", lambda: refreshed.append("aretrieve"))
+    monkeypatch.setattr(services.pipeline, "refresh_collections", lambda: refreshed.append("prepare_query"))
+    monkeypatch.setattr(services.pipeline, "classify", classify)
+    monkeypatch.setattr(services.pipeline, "build_retrieved_context", lambda retrieved, title: f"{title}: {retrieved[1][0]}")
+
+    assert asyncio.run(services.embeddings.aretrieve("운영 시간?", "biblo_store"))[1] == ["biblo_store 문서"]
+    # 임베딩이 끝난 뒤에 검색 시간 측정 시작
+    assert events == [
+        "embedding start", "embed", "embedding end",
+        "vector_search start", ("search", "biblo_store", (1.0, 0.0)), "vector_search end",
+    ]
+
+    prepared = asyncio.run(prepare_query("운영 시간?"))
+    assert prepared.context == "Biblo Collection: biblo_store 문서"
+    assert refreshed == ["prepare_query"]
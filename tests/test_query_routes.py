@@ -0,0 +1,104 @@
+import json
+import asyncio
+
+from fastapi import FastAPI
+
+import api.routes
+from api.schemas import QueryRequest
+from api.streaming import QueueSender
+
+
+def patch_run_query(monkeypatch, events: list, duration: float):
+    async def run_query(sender, req, payload):
+        events.append("started")
+        try:
+            await asyncio.sleep(duration)
+            await sender.send({"type": "error", "error": "done"})
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        finally:
+            sender.close()
+
+    monkeypatch.setattr(api.routes, "run_query", run_query)
+
+
+async def post(app, path: str, body: dict, disconnect_after: float) -> list:
+    """path로 POST 요청을 보내고 disconnect_after초 뒤 연결을 끊는 ASGI 클라이언트 (보낸 메시지 목록 반환)"""
+    messages = []
+    payload = json.dumps(body).encode()
+    received_body = False
+
+    async def receive():
+        nonlocal received_body
+        if not received_body:
+            received_body = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 5000), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return messages
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(api.routes.router)
+    return app
+
+
+def test_json_query_is_cancelled_when_client_disconnects(monkeypatch):
+    events = []
+    patch_run_query(monkeypatch, events, duration=30)
+    messages = asyncio.run(asyncio.wait_for(post(create_app(), "/query", {"prompt": "운영 시간?"}, 0.05), 5))
+    assert events == ["started", "cancelled"]
+    assert messages[0]["status"] == 499
+
+
+def test_batch_query_is_cancelled_when_client_disconnects(monkeypatch):
+    events = []
+    patch_run_query(monkeypatch, events, duration=30)
+    body = {"queries": [{"prompt": "운영 시간?"}, {"prompt": "대출 기간?"}]}
+    messages = asyncio.run(asyncio.wait_for(post(create_app(), "/query/batch", body, 0.05), 5))
+    assert events == ["started", "started", "cancelled", "cancelled"]
+    assert messages[0]["status"] == 499
+
+
+def test_json_query_completes_while_connected(monkeypatch):
+    events = []
+    patch_run_query(monkeypatch, events, duration=0.01)
+    messages = asyncio.run(post(create_app(), "/query", {"prompt": "운영 시간?"}, 30))
+    assert events == ["started"]
+    assert messages[0]["status"] == 500
+    assert json.loads(messages[1]["body"]) == {"status": "error", "message": "done"}
+
+
+def test_stream_query_starts_work_only_when_streaming_starts(monkeypatch):
+    events = []
+    patch_run_query(monkeypatch, events, duration=30)
+
+    async def main():
+        # 응답을 시작하기 전에 버려진 스트림은 작업을 만들지 않음
+        api.routes.stream_query(QueueSender(), None, QueryRequest(prompt="운영 시간?"))
+        await asyncio.sleep(0)
+        assert events == []
+
+        stream = api.routes.stream_query(QueueSender(), None, QueryRequest(prompt="운영 시간?"))
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert events == ["started"]
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert events == ["started", "cancelled"]
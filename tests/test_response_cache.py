@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import services.cache
+from services.cache import ResponseCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_exact_and_nearest_semantic_hits():
+    cache = ResponseCache(threshold=0.9)
+    cache.store(1, "biblo", unit(1, 0, 0), ["a"])
+    cache.store(1, "biblo", unit(1, 0.3, 0), ["b"])
+    cache.store(1, "biblo", unit(0, 1, 0), ["c"])
+    cache.store(2, "company", unit(1, 0.1, 0), ["other type"])
+
+    assert cache.lookup(1, [1, 0, 0]) == ["a"]
+    assert cache.lookup(1, unit(1, 0.25, 0)) == ["b"]
+    assert cache.lookup(1, unit(0, 0, 1)) is None
+    assert cache.lookup(3, unit(1, 0, 0)) is None
+    assert cache.get_stats()["exact_hits"] == 1
+    assert cache.get_stats()["semantic_hits"] == 1
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_removed_rows_keep_matrix_consistent():
+    cache = ResponseCache(threshold=0.99)
+    for i in range(100):
+        cache.store(1, "biblo" if i % 2 else "company", unit(np.cos(i / 40), np.sin(i / 40), 0), [str(i)])
+    assert cache.invalidate("company") == 50
+    for i in range(1, 100, 2):
+        assert cache.lookup(1, unit(np.cos(i / 40), np.sin(i / 40), 0)) == [str(i)]
+    matrix = cache._matrices[1]
+    assert len(matrix) == cache.get_stats()["entries"] == 50
+    for key, row in matrix.rows.items():
+        assert matrix.keys[row] == key
+        np.testing.assert_array_equal(matrix.matrix[row], cache._entries[key].embedding)
+
+
+def test_ttl_expires_by_creation_time_not_lru_order(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(services.cache, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    cache = ResponseCache(ttl=10)
+    cache.store(1, "biblo", unit(1, 0, 0), ["old"])
+    clock[0] = 5
+    cache.store(1, "biblo", unit(0, 1, 0), ["new"])
+    # 조회로 LRU 순서가 바뀌어도 먼저 만든 항목이 먼저 만료
+    assert cache.lookup(1, unit(1, 0, 0)) == ["old"]
+    clock[0] = 10
+    assert cache.lookup(1, unit(1, 0, 0)) is None
+    assert cache.lookup(1, unit(0, 1, 0)) == ["new"]
+    # 다시 저장한 항목은 이전 생성 시각으로 만료되지 않음
+    cache.store(1, "biblo", unit(0, 1, 0), ["newer"])
+    clock[0] = 16
+    assert cache.lookup(1, unit(0, 1, 0)) == ["newer"]
+    clock[0] = 20
+    assert cache.lookup(1, unit(0, 1, 0)) is None
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = ResponseCache(threshold=0.99)
+    cache.store(1, "biblo", unit(1, 0, 0), ["a" * 100])
+    cache.max_bytes = cache.get_stats()["bytes"] * 2
+    cache.store(1, "biblo", unit(0, 1, 0), ["b" * 100])
+    assert cache.lookup(1, unit(1, 0, 0)) == ["a" * 100]
+    cache.store(1, "biblo", unit(0, 0, 1), ["c" * 100])
+    assert cache.lookup(1, unit(0, 1, 0)) is None
+    assert cache.lookup(1, unit(1, 0, 0)) == ["a" * 100]
+    assert cache.get_stats()["evictions"] == 1
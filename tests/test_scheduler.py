@@ -0,0 +1,190 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+import services.llm
+from services.cache import ResponseCache
+from services.coalesce import RequestCoalescer
+from services.llm import generate_streaming_response
+from services.registry import registry
+from services.scheduler import LLMScheduler, SchedulerBusy
+from services.session import ChatSession
+
+
+class CountingLLM:
+    """호출 수를 세는 스트리밍 LLM"""
+
+    def __init__(self, tokens: int = 5, token_interval: float = 0.0):
+        self.tokens = tokens
+        self.token_interval = token_interval
+        self.calls = 0
+
+    async def astream(self, prompt: str):
+        self.calls += 1
+        for i in range(self.tokens):
+            await asyncio.sleep(self.token_interval)
+            yield f"t{i} "
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    # 슬롯 하나, 대기열 없음: 두 번째 업스트림 요청은 바로 busy
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=0, rate_per_sec=0)
+    monkeypatch.setattr(services.llm, "llm_scheduler", scheduler)
+    monkeypatch.setattr(services.llm, "response_cache", ResponseCache())
+    return scheduler
+
+
+@pytest.fixture(autouse=True)
+def retrieval(monkeypatch):
+    """임베딩 모델과 Milvus 없이 고정된 임베딩과 검색 결과 사용"""
+    async def aembed_query(prompt):
+        return [1.0, 0.0, 0.0]
+
+    async def asearch(prompt, query_embedding=None):
+        return "핵심정보: 열람실은 평일 08:00~22:00에 운영합니다."
+
+    monkeypatch.setattr(services.llm, "aembed_query", aembed_query)
+    monkeypatch.setattr(services.llm, "asearch_company_collections", asearch)
+    monkeypatch.setattr(services.llm, "asearch_biblo_collections", asearch)
+
+
+@pytest.fixture
+def llm():
+    llm = CountingLLM()
+    registry.set("llm", llm)
+    return llm
+
+
+def new_session(session_id: str, prompt: str) -> ChatSession:
+    session = ChatSession(session_id, 1)
+    session.add_message("user", prompt)
+    return session
+
+
+async def collect(stream) -> str:
+    async with aclosing(stream) as chunks:
+        return "".join([chunk async for chunk in chunks])
+
+
+async def hold_slot(scheduler: LLMScheduler, started: asyncio.Event, release: asyncio.Event):
+    async with scheduler.admit("other-session"):
+        started.set()
+        await release.wait()
+
+
+def test_cache_hit_does_not_take_scheduler_slot(scheduler, llm):
+    async def main():
+        services.llm.response_cache.store(1, "biblo", [1.0, 0.0, 0.0], ["캐시된 ", "답변"])
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, started, release))
+        await started.wait()
+        try:
+            answer = await collect(generate_streaming_response("운영 시간?", new_session("s1", "운영 시간?"), 1))
+        finally:
+            release.set()
+            await holder
+        return answer
+
+    assert asyncio.run(main()) == "캐시된 답변"
+    assert llm.calls == 0
+    assert scheduler.stats["admitted"] == 1
+    assert scheduler.stats["rejected"] == 0
+
+
+def test_busy_is_raised_instead_of_error_text(scheduler, llm):
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(scheduler, started, release))
+        await started.wait()
+        try:
+            await collect(generate_streaming_response("운영 시간?", new_session("s1", "운영 시간?"), 1))
+        finally:
+            release.set()
+            await holder
+
+    with pytest.raises(SchedulerBusy):
+        asyncio.run(main())
+    assert llm.calls == 0
+
+
+def test_slot_is_released_when_upstream_ends(scheduler, llm):
+    async def main():
+        answer = await collect(generate_streaming_response("운영 시간?", new_session("s1", "운영 시간?"), 1))
+        return answer, scheduler.active
+
+    assert asyncio.run(main()) == ("t0 t1 t2 t3 t4 ", 0)
+    assert llm.calls == 1
+    assert scheduler.stats["admitted"] == 1
+
+
+def test_slot_is_released_when_upstream_ends_before_slow_consumer(scheduler, llm):
+    coalescer = RequestCoalescer()
+
+    async def main():
+        session = new_session("s1", "운영 시간?")
+        chunks = []
+        async with aclosing(coalescer.stream("운영 시간?", session, 1)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if len(chunks) == 1:
+                    # 느린 전송: 업스트림은 버퍼에 끝까지 받아 두고 슬롯을 반납
+                    for _ in range(100):
+                        await asyncio.sleep(0.01)
+                        if scheduler.active == 0:
+                            break
+                    assert scheduler.active == 0
+        return "".join(chunks)
+
+    assert asyncio.run(main()) == "t0 t1 t2 t3 t4 "
+    assert scheduler.stats["admitted"] == 1
+
+
+def test_coalesced_joiners_do_not_take_slots(scheduler, llm):
+    llm.token_interval = 0.01
+    coalescer = RequestCoalescer()
+
+    async def main():
+        streams = [
+            collect(coalescer.stream("운영 시간?", new_session(f"s{i}", "운영 시간?"), 1))
+            for i in range(3)
+        ]
+        return await asyncio.gather(*streams)
+
+    assert asyncio.run(main()) == ["t0 t1 t2 t3 t4 "] * 3
+    assert llm.calls == 1
+    assert scheduler.stats["admitted"] == 1
+    assert scheduler.stats["rejected"] == 0
+
+
+def test_with_fake_openai_server(scheduler):
+    """실제 ChatOpenAI 클라이언트로 benchmarks.fake_openai 서버에 스트리밍 요청"""
+    pytest.importorskip("langchain_openai")
+    import httpx
+    from langchain_openai import ChatOpenAI
+    from benchmarks.fake_openai import create_app
+
+    app = create_app(tokens=20, ttft=0.05, token_interval=0.0)
+    scheduler.max_queue = 4
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as client:
+            registry.set("llm", ChatOpenAI(
+                model="gpt-4-turbo",
+                base_url="http://fake-openai/v1",
+                api_key="test",
+                max_retries=0,
+                streaming=True,
+                http_async_client=client,
+            ))
+            return await asyncio.gather(*(
+                collect(generate_streaming_response(f"질문 {i}", new_session(f"s{i}", f"질문 {i}"), 1))
+                for i in range(3)
+            ))
+
+    answers = asyncio.run(main())
+    assert all(answer and not answer.startswith("스트리밍 응답 생성 중 오류") for answer in answers)
+    assert app.state.stats["completed"] == 3
+    assert scheduler.stats["admitted"] == 3
+    assert scheduler.active == 0
@@ -0,0 +1,29 @@
+import services.session
+from services.session import ChatSession, excerpt_message
+from utils.helpers import count_tokens
+
+
+def test_excerpt_keeps_first_sentence_within_char_limit():
+    assert excerpt_message("학부생은 5권까지 빌릴 수 있습니다. 연체료는 하루 500원입니다.") == "학부생은 5권까지 빌릴 수 있습니다."
+    excerpt = excerpt_message("가" * 200)
+    assert excerpt == "가" * services.session.HISTORY_EXCERPT_MAX_CHARS + "…"
+
+
+def test_history_stays_within_token_budget_over_long_session(monkeypatch):
+    monkeypatch.setattr(services.session, "HISTORY_TOKEN_BUDGET", 200)
+    monkeypatch.setattr(services.session, "HISTORY_EXCERPT_TOKEN_BUDGET", 80)
+    session = ChatSession("long-session", 1)
+    for turn in range(200):
+        session.add_message("user", f"{turn}번째 질문입니다. 열람실 좌석은 몇 시까지 예약할 수 있나요?")
+        session.add_message("assistant", f"{turn}번째 답변입니다. " + "열람실 좌석은 22시까지 예약할 수 있습니다. " * 5)
+
+        history = session.get_formatted_history()
+        excerpt, _, window = history.partition("이전 대화 내용:\n")
+        assert count_tokens(window) <= 200
+        assert count_tokens(excerpt) <= 80 + count_tokens("이전 대화 발췌 (메시지별 첫 문장):\n")
+
+    # 가장 최근 메시지는 원문, 윈도우 밖 메시지는 첫 문장 발췌로 남음
+    assert history.endswith("열람실 좌석은 22시까지 예약할 수 있습니다. \n")
+    assert "- 🖥️ Biblo AI: 198번째 답변입니다.\n" in excerpt
+    assert "👤 사용자: 199번째 질문입니다. 열람실 좌석은 몇 시까지 예약할 수 있나요?\n" in window
+    assert "- 👤 사용자: 0번째 질문" not in excerpt
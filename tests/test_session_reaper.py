@@ -0,0 +1,63 @@
+import time
+
+from services.session import ChatSession, SessionReaper
+from services.session_store import MemorySessionStore
+
+
+def new_session(sessions: MemorySessionStore, session_id: str, last_interaction: float) -> ChatSession:
+    session = ChatSession(session_id, 1)
+    session.add_message("user", "운영 시간이 어떻게 되나요?")
+    session.last_interaction = last_interaction
+    sessions[session_id] = session
+    return session
+
+
+def test_reaper_evicts_idle_then_least_recently_used():
+    now = time.time()
+    sessions = MemorySessionStore()
+    for i in range(4):
+        new_session(sessions, f"s{i}", now - 4000 + i * 1000)
+    evicted_ids = []
+    reaper = SessionReaper(sessions, idle_ttl=3600, max_sessions=2, max_bytes=10 ** 9)
+    reaper.on_evict = evicted_ids.append
+
+    # s0은 유휴 시간 초과, s1은 세션 수 상한 초과
+    assert reaper.reap(now=now) == 2
+    assert evicted_ids == ["s0", "s1"]
+    assert sorted(sessions) == ["s2", "s3"]
+    assert reaper.stats["evicted_idle"] == 1
+    assert reaper.stats["evicted_max_sessions"] == 1
+
+
+def test_reaper_enforces_cap_on_insert_and_skips_answering_sessions():
+    now = time.time()
+    sessions = MemorySessionStore()
+    evicted_ids = []
+    reaper = SessionReaper(sessions, idle_ttl=3600, max_sessions=2, max_bytes=10 ** 9)
+    reaper.on_evict = evicted_ids.append
+    for i in range(2):
+        new_session(sessions, f"s{i}", now + i)
+    assert reaper.enforce_max_sessions() == 0
+
+    # 가장 오래된 s0은 응답 생성 중이라 건너뛰고 그다음 세션을 정리
+    reaper.hold("s0")
+    new_session(sessions, "s2", now + 2)
+    assert reaper.enforce_max_sessions(keep="s2") == 1
+    assert evicted_ids == ["s1"]
+    assert sorted(sessions) == ["s0", "s2"]
+
+    # 응답 생성 중인 세션과 방금 등록한 세션만 남으면 상한을 잠시 넘김
+    new_session(sessions, "s3", now + 3)
+    assert reaper.enforce_max_sessions(keep="s3") == 1
+    assert evicted_ids == ["s1", "s2"]
+
+    # 유휴 시간이 지나도 응답 생성 중인 세션은 남김
+    later = now + 7200
+    assert reaper.reap(now=later) == 1
+    assert list(sessions) == ["s0"]
+
+    # 응답이 끝나면 다음 정리에서 만료
+    reaper.release("s0")
+    assert reaper.reap(now=later) == 1
+    assert evicted_ids == ["s1", "s2", "s3", "s0"]
+    assert reaper.get_stats()["skipped_active"] >= 2
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import multiprocessing
+
+import pytest
+
+from services.session import ChatSession, SessionReaper, ASSISTANT_ROLE
+from services.session_store import SQLiteSessionStore
+
+
+def _answer_in_other_worker(path: str, session_id: str):
+    """다른 워커 프로세스: 세션을 읽고 답변과 피드백 추가"""
+    store = SQLiteSessionStore(path)
+    session = store[session_id]
+    question_id = session.messages[-1].id
+    answer_id = session.add_message(ASSISTANT_ROLE, "평일 08:00~22:00입니다.", reply_to=question_id)
+    session.add_feedback(answer_id, 1)
+    store.close()
+
+
+def _end_in_other_worker(path: str, session_id: str):
+    store = SQLiteSessionStore(path)
+    del store[session_id]
+    store.close()
+
+
+def run_in_process(target, *args):
+    process = multiprocessing.get_context("spawn").Process(target=target, args=args)
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+
+
+def new_session(store, session_id: str, question: str = "운영 시간이 어떻게 되나요?") -> ChatSession:
+    session = ChatSession(session_id, 1)
+    store[session_id] = session
+    session.add_message("user", question)
+    return session
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def test_sessions_are_shared_between_processes(db_path):
+    store = SQLiteSessionStore(db_path)
+    session = new_session(store, "s1")
+
+    run_in_process(_answer_in_other_worker, db_path, "s1")
+
+    session = store["s1"]
+    assert [message.role for message in session.messages] == ["user", ASSISTANT_ROLE]
+    assert session.messages[1].pair == 0
+    assert session.get_feedback_summary()["positive_feedback"] == 1
+
+    # 다른 워커가 종료한 세션은 이 워커의 캐시에서도 제거
+    run_in_process(_end_in_other_worker, db_path, "s1")
+    assert "s1" not in store
+    assert store.get("s1") is None
+    assert "s1" not in store._cache
+    store.close()
+
+
+def test_cache_is_bounded_and_evicted_sessions_keep_working(db_path):
+    store = SQLiteSessionStore(db_path, cache_size=2)
+    held = new_session(store, "s0")
+    for i in range(1, 5):
+        new_session(store, f"s{i}")
+    assert list(store._cache) == ["s3", "s4"]
+
+    # 캐시에서 빠진 세션 객체로 계속 대화해도 메시지가 중복되지 않음
+    held.add_message(ASSISTANT_ROLE, "답변", reply_to=held.messages[0].id)
+    assert len(held.messages) == 2
+    reloaded = store["s0"]
+    assert reloaded is not held
+    assert [message.id for message in reloaded.messages] == [message.id for message in held.messages]
+    assert len(store._cache) == 2
+    store.close()
+
+
+def test_cache_ttl(db_path):
+    store = SQLiteSessionStore(db_path, cache_ttl=0)
+    new_session(store, "s1")
+    store.usage()
+    assert len(store._cache) == 0
+    assert len(store["s1"].messages) == 1
+    store.close()
+
+
+def test_reaper_selects_sessions_from_sql(db_path):
+    writer = SQLiteSessionStore(db_path)
+    for i in range(3):
+        new_session(writer, f"s{i}", "질문" * (i + 1))
+    writer.close()
+
+    store = SQLiteSessionStore(db_path)
+    evicted_ids = []
+    reaper = SessionReaper(store, idle_ttl=3600, max_sessions=1, max_bytes=10 ** 9)
+    reaper.on_evict = evicted_ids.append
+    assert reaper.reap() == 2
+    assert evicted_ids == ["s0", "s1"]
+    assert list(store) == ["s2"]
+    # 정리 대상을 고르기 위해 세션 객체를 만들지 않음
+    assert len(store._cache) == 0
+    assert reaper.get_stats()["active_sessions"] == 1
+    store.close()
+
+
+def test_store_calls_run_off_the_event_loop(db_path):
+    store = SQLiteSessionStore(db_path)
+    new_session(store, "s1")
+
+    async def main():
+        session = await store.aget("s1")
+        missing = await store.aget("missing")
+        thread_id = await store.call(threading.get_ident)
+        return session, missing, thread_id
+
+    session, missing, thread_id = asyncio.run(main())
+    assert session.session_id == "s1"
+    assert missing is None
+    assert thread_id != threading.get_ident()
+    store.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from services.vector_index import VectorIndex, export_collection, load_index
+
+
+def new_index(count: int = 50, dim: int = 8, seed: int = 0) -> VectorIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return VectorIndex("test", vectors, [f"doc {i}" for i in range(count)], [{"pk": i} for i in range(count)])
+
+
+def full_sort(index: VectorIndex, queries: np.ndarray, top_k: int):
+    scores = queries @ index.vectors.T
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+    return order, np.take_along_axis(scores, order, axis=1)
+
+
+def test_search_ids_matches_full_argsort_for_query_batch():
+    index = new_index()
+    queries = np.random.default_rng(1).standard_normal((6, 8)).astype(np.float32)
+    ids, scores = index.search_ids(queries, top_k=5)
+    expected_ids, expected_scores = full_sort(index, queries, 5)
+    assert ids.shape == scores.shape == (6, 5)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+
+def test_search_ids_accepts_single_query_vector():
+    index = new_index()
+    query = np.random.default_rng(2).standard_normal(8).astype(np.float32)
+    ids, scores = index.search_ids(query, top_k=3)
+    expected_ids, expected_scores = full_sort(index, query[None, :], 3)
+    assert ids.shape == (1, 3)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+
+def test_search_ids_returns_every_row_when_k_exceeds_size():
+    index = new_index(count=4)
+    queries = np.random.default_rng(3).standard_normal((2, 8)).astype(np.float32)
+    for top_k in (4, 10):
+        ids, scores = index.search_ids(queries, top_k=top_k)
+        expected_ids, _ = full_sort(index, queries, 4)
+        assert ids.shape == (2, 4)
+        np.testing.assert_array_equal(ids, expected_ids)
+        assert (np.diff(scores, axis=1) <= 0).all()
+
+
+def test_search_ids_on_empty_index():
+    index = VectorIndex("empty", np.empty((0, 8), dtype=np.float32), [], [])
+    ids, scores = index.search_ids(np.ones((2, 8), dtype=np.float32), top_k=3)
+    assert ids.shape == scores.shape == (2, 0)
+
+
+def test_exported_index_matches_milvus_top_k(tmp_path):
+    """Milvus Lite 컬렉션을 내보내 메모리 맵으로 읽은 인덱스가 Milvus와 같은 top-k pk를 돌려주는지 확인"""
+    pytest.importorskip("langchain_milvus")
+    from benchmarks.fakes import HashEmbeddings, seed_milvus
+    from services.embeddings import BIBLO_COLLECTION
+
+    uri = str(tmp_path / "milvus.db")
+    embeddings = HashEmbeddings(dim=64)
+    _, store = seed_milvus(uri, embeddings, docs_per_collection=60)
+    export_collection(uri, BIBLO_COLLECTION, str(tmp_path / "index"))
+    index = load_index(BIBLO_COLLECTION, str(tmp_path / "index"))
+    assert isinstance(index.vectors, np.memmap)
+    assert len(index) == 60
+
+    queries = ["학부생 대출 기간", "열람실 좌석 예약", "도서 반납 방법", "연체료 안내"]
+    vectors = [embeddings.embed_query(query) for query in queries]
+    for vector, documents in zip(vectors, index.search(vectors, top_k=5)):
+        expected = store.similarity_search_by_vector(vector, k=5)
+        assert [document.metadata["pk"] for document in documents] == \
+            [document.metadata["pk"] for document in expected]
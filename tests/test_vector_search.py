@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.embeddings import MilvusBatchSearch, search_by_vectors
+
+
+class PublicOnlyStore:
+    """다중 벡터 검색에 필요한 내부 속성이 없는 저장소 (공개 API만 제공)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        self.calls.append((tuple(embedding), k))
+        return [SimpleNamespace(page_content=f"{embedding[0]}-{i}", metadata={}) for i in range(k)]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.searches = []
+
+    def search(self, data, anns_field, param, limit, output_fields, timeout):
+        self.searches.append(len(data))
+        return [
+            [SimpleNamespace(entity=SimpleNamespace(fields=output_fields, get=lambda name, i=i: {"text": f"{v[0]}-{i}", "vector": [float(i)]}[name]))
+             for i in range(limit)]
+            for v in data
+        ]
+
+
+class PrivateApiStore:
+    """langchain_milvus.Milvus의 내부 속성을 흉내 낸 저장소"""
+
+    def __init__(self):
+        self.col = FakeCollection()
+        self.search_params = {"metric_type": "IP"}
+        self.enable_dynamic_field = False
+        self.fields = ["text"]
+        self.timeout = None
+        self._vector_field = "vector"
+
+    @staticmethod
+    def _as_list(value):
+        return [value]
+
+    @staticmethod
+    def _remove_forbidden_fields(fields):
+        return fields
+
+    @staticmethod
+    def _parse_document(data):
+        return SimpleNamespace(page_content=data["text"], metadata={})
+
+
+def test_falls_back_to_public_api_without_private_attributes():
+    store = PublicOnlyStore()
+    results = search_by_vectors(store, [[1.0, 0.0], [2.0, 0.0]], top_k=2)
+    assert [[document.page_content for document in documents] for documents in results] == [["1.0-0", "1.0-1"], ["2.0-0", "2.0-1"]]
+    assert store.calls == [((1.0, 0.0), 2), ((2.0, 0.0), 2)]
+
+    # 문서 벡터가 없으면 컨텍스트 조립은 텍스트 기준 중복 제거로 동작
+    documents, vectors = search_by_vectors(store, [[1.0, 0.0]], top_k=1, with_vectors=True)[0]
+    assert documents[0].page_content == "1.0-0"
+    assert vectors is None
+
+
+
+def test_batches_vectors_into_one_milvus_search():
+    store = PrivateApiStore()
+    assert MilvusBatchSearch.supports(store)
+    results = search_by_vectors(store, [[1.0], [2.0], [3.0]], top_k=2, with_vectors=True)
+    assert store.col.searches == [3]
+    documents, vectors = results[2]
+    assert [document.page_content for document in documents] == ["3.0-0", "3.0-1"]
+    assert vectors == [[0.0], [1.0]]
+
+
+def test_pinned_langchain_milvus_supports_batch_search(tmp_path):
+    """설치된 langchain_milvus가 어댑터가 사용하는 내부 속성을 제공하는지 실제 Milvus Lite로 확인"""
+    pytest.importorskip("langchain_milvus")
+    from langchain_core.embeddings import Embeddings
+    from langchain_milvus import Milvus
+
+    class CharEmbeddings(Embeddings):
+        """글자 코드로 만든 작은 정규화 벡터 (모델 다운로드 없이 검색 순서 비교용)"""
+
+        def embed_query(self, text):
+            vector = [0.0] * 16
+            for i, char in enumerate(text):
+                vector[(ord(char) + i) % 16] += 1.0
+            norm = sum(value * value for value in vector) ** 0.5
+            return [value / norm for value in vector]
+
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+    embeddings = CharEmbeddings()
+    texts = [f"{subject} {topic} 안내" for subject in ("중앙도서관", "법학도서관", "의학도서관") for topic in ("대출 기간", "열람실 좌석", "운영 시간", "반납 방법")]
+    store = Milvus.from_texts(
+        texts,
+        embeddings,
+        collection_name="parity_collection",
+        connection_args={"uri": str(tmp_path / "milvus.db")},
+        index_params={"index_type": "FLAT", "metric_type": "IP"},
+        search_params={"metric_type": "IP", "params": {}},
+        auto_id=True,
+    )
+    assert MilvusBatchSearch.supports(store)
+
+    vectors = [embeddings.embed_query(query) for query in ("학부생 대출 기간", "열람실 좌석")]
+    batched = search_by_vectors(store, vectors, top_k=3)
+    expected = [store.similarity_search_by_vector(vector, k=3) for vector in vectors]
+    assert [[document.page_content for document in documents] for documents in batched] == \
+        [[document.page_content for document in documents] for documents in expected]
+
+    documents, document_vectors = search_by_vectors(store, vectors[:1], top_k=3, with_vectors=True)[0]
+    assert len(document_vectors) == len(documents) == 3
@@ -0,0 +1,78 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.websocket
+from services.session import ChatSession, chat_sessions
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.websocket("/ws/{session_id}")(api.websocket.websocket_endpoint)
+    return app
+
+
+def patch_handle_query_request(monkeypatch):
+    """취소될 때까지 응답하지 않는 질문 처리 (취소되면 cancelled 프레임 전송)"""
+    async def handle_query_request(sender, session_id, request, sync_mode=None):
+        tag = {"request_id": request["request_id"]}
+        try:
+            await sender.send({"type": "started", **tag})
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            await sender.send({"type": "cancelled", **tag})
+            raise
+
+    monkeypatch.setattr(api.websocket, "handle_query_request", handle_query_request)
+
+
+def new_session(session_id: str) -> ChatSession:
+    session = ChatSession(session_id, 1)
+    chat_sessions[session_id] = session
+    return session
+
+
+def test_duplicate_request_id_is_rejected_while_in_flight(monkeypatch):
+    patch_handle_query_request(monkeypatch)
+    new_session("ws-duplicate")
+    with TestClient(create_app()) as client:
+        with client.websocket_connect("/ws/ws-duplicate") as websocket:
+            assert websocket.receive_json()["status"] == "active"
+            websocket.send_json({"type": "query", "request_id": "r1", "prompt": "운영 시간?"})
+            assert websocket.receive_json() == {"type": "started", "request_id": "r1"}
+
+            websocket.send_json({"type": "query", "request_id": "r1", "prompt": "다른 질문"})
+            frame = websocket.receive_json()
+            assert frame["type"] == "error" and frame["request_id"] == "r1"
+
+            # 처음 요청은 계속 진행 중이므로 취소할 수 있고, 끝난 뒤에는 같은 request_id를 다시 사용 가능
+            websocket.send_json({"type": "cancel", "request_id": "r1"})
+            assert websocket.receive_json() == {"type": "cancelled", "request_id": "r1"}
+            websocket.send_json({"type": "query", "request_id": "r1", "prompt": "다시 질문"})
+            assert websocket.receive_json() == {"type": "started", "request_id": "r1"}
+
+
+def test_created_session_takes_query_type_from_param_or_first_query(monkeypatch):
+    async def classify(prompt):
+        return 0, 0.99
+
+    monkeypatch.setattr(api.websocket, "QUERY_PIPELINE", "serial")
+    monkeypatch.setattr(api.websocket, "classify", classify)
+    with TestClient(create_app()) as client:
+        with client.websocket_connect("/ws/missing?create=true&query_type=0") as websocket:
+            info = websocket.receive_json()
+            assert chat_sessions[info["session_id"]].query_type == 0
+
+        with client.websocket_connect("/ws/missing?create=true") as websocket:
+            info = websocket.receive_json()
+            assert info["type"] == "session_info" and info["is_new_session"]
+            session = chat_sessions[info["session_id"]]
+            # 첫 질문을 분류하기 전에는 도서관 타입으로 가정하지 않음
+            assert session.query_type is None
+
+    async def first_query():
+        await api.websocket.start_query(None, "텐소프트웍스는 어떤 회사인가요?", session)
+
+    asyncio.run(first_query())
+    assert session.query_type == 0
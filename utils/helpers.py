@@ -1,4 +1,5 @@
 import datetime
+from functools import lru_cache
 from fastapi import Request
 from user_agents import parse
 
@@ -6,6 +7,30 @@ def format_timestamp(timestamp):
     """Unix 타임스탬프를 읽기 좋은 형식으로 변환"""
     return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
 
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """gpt-4-turbo 기준 토큰 수 (tiktoken을 사용할 수 없으면 UTF-8 바이트 수로 추정)"""
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text.encode("utf-8")) // 3 + 1
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """앞에서부터 max_tokens 토큰까지만 남기기 (count_tokens와 같은 기준, 잘린 글자는 버림)"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip("\ufffd")
+    return text.encode("utf-8")[:(max_tokens - 1) * 3].decode("utf-8", errors="ignore")
+
 def extract_user_info(request: Request):
     """요청에서 사용자 IP, OS, 브라우저 정보 추출"""
     client_host = request.client.host if request.client else "unknown"
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import datetime
+import threading
+from typing import Callable, Dict, List
+
+# 로그 설정
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")  # debug | info | warning | error
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # 카테고리별 레벨 (예: "prompt=debug,retrieval=debug")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # 카테고리별 기록 비율 0~1 (예: "prompt=0.01", warning 이상은 항상 기록)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))  # 문자열 값 최대 길이 (0이면 자르지 않음)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_SHUTDOWN_TIMEOUT = float(os.getenv("LOG_SHUTDOWN_TIMEOUT", "5"))
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+def parse_category_settings(spec: str, convert: Callable[[str], object]) -> Dict[str, object]:
+    """"카테고리=값,카테고리=값" 형식의 설정을 dict로 변환"""
+    settings = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        category, value = item.split("=", 1)
+        settings[category.strip()] = convert(value.strip())
+    return settings
+
+
+def truncate(value: str, max_chars: int = LOG_MAX_FIELD_CHARS) -> str:
+    if max_chars <= 0 or len(value) <= max_chars:
+        return value
+    return f"{value[:max_chars]}…(+{len(value) - max_chars}자)"
+
+
+class LogWriter:
+    """로그 레코드를 큐에 모아 백그라운드 스레드에서 표준 출력에 기록
+
+    submit()은 큐에 넣기만 하므로 이벤트 루프를 막지 않으며, 값 자르기와 JSON/텍스트 변환도
+    쓰기 스레드에서 합니다. 큐가 가득 차면 레코드를 버리고 dropped 카운트를 올립니다.
+    """
+
+    def __init__(
+        self,
+        log_format: str = LOG_FORMAT,
+        max_field_chars: int = LOG_MAX_FIELD_CHARS,
+        queue_size: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        stream=None,
+    ):
+        self.log_format = log_format
+        self.max_field_chars = max_field_chars
+        self.batch_size = max(1, batch_size)
+        self.stream = stream
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        self.stats = {"submitted": 0, "written": 0, "dropped": 0, "sampled_out": 0, "errors": 0}
+
+    def start(self):
+        """쓰기 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker, name="log-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                # CLI처럼 서버 종료 이벤트 없이 끝나는 프로세스에서도 남은 로그 기록
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def submit(self, record: dict):
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+            self.stats["submitted"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def close(self, timeout: float = LOG_SHUTDOWN_TIMEOUT) -> bool:
+        """큐에 남은 로그를 timeout 안에 모두 기록하고 종료, 제시간에 끝나면 True"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return False
+        thread.join(max(0.0, deadline - time.monotonic()))
+        return not thread.is_alive()
+
+    def _value(self, value):
+        if isinstance(value, str):
+            return truncate(value, self.max_field_chars)
+        if isinstance(value, (list, tuple)):
+            return [self._value(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._value(item) for key, item in value.items()}
+        if value is None or isinstance(value, (int, float, bool)):
+            return value
+        return truncate(str(value), self.max_field_chars)
+
+    def format(self, record: dict) -> str:
+        timestamp = datetime.datetime.fromtimestamp(record.pop("ts")).isoformat(timespec="milliseconds")
+        record = {key: self._value(value) for key, value in record.items()}
+        if self.log_format == "text":
+            fields = " ".join(
+                f"{key}={json.dumps(value, ensure_ascii=False) if not isinstance(value, str) else value}"
+                for key, value in record.items()
+                if key not in ("level", "category", "message")
+            )
+            line = f"{timestamp} {record['level'].upper():<7} [{record['category']}] {record['message']}"
+            return f"{line} {fields}" if fields else line
+        return json.dumps({"ts": timestamp, **record}, ensure_ascii=False, default=str)
+
+    def _write(self, records: List[dict]):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception as e:
+                self.stats["errors"] += 1
+                lines.append(json.dumps({"level": "error", "category": "log", "message": f"로그 변환 오류: {str(e)}"}))
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:
+            self.stats["errors"] += 1
+        self.stats["written"] += len(records)
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            records = []
+            record = self._queue.get()
+            # 쌓여 있는 레코드를 한 번의 쓰기로 기록
+            while True:
+                if record is None:
+                    stopping = True
+                    break
+                records.append(record)
+                if len(records) >= self.batch_size:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if records:
+                self._write(records)
+
+
+class Logger:
+    """카테고리별 로거 (레벨과 기록 비율은 LOG_LEVELS, LOG_SAMPLE_RATES로 카테고리마다 지정)
+
+    레벨 확인과 샘플링은 호출한 쪽에서 바로 하므로 꺼진 레벨의 로그는 큐에 들어가지 않습니다.
+    기록할 값을 만드는 데 비용이 드는 경우 enabled()로 먼저 확인합니다.
+    """
+
+    def __init__(self, category: str, writer: LogWriter, level: str = LOG_LEVEL, sample_rate: float = 1.0):
+        self.category = category
+        self.writer = writer
+        self.level = LEVELS.get(level.lower(), LEVELS["info"])
+        self.sample_rate = sample_rate
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS[level] >= self.level
+
+    def log(self, level: str, message: str, **fields):
+        if LEVELS[level] < self.level:
+            return
+        if self.sample_rate < 1.0 and LEVELS[level] < LEVELS["warning"] and random.random() >= self.sample_rate:
+            self.writer.stats["sampled_out"] += 1
+            return
+        self.writer.submit({"ts": time.time(), "level": level, "category": self.category, "message": message, **fields})
+
+    def debug(self, message: str, **fields):
+        self.log("debug", message, **fields)
+
+    def info(self, message: str, **fields):
+        self.log("info", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.log("warning", message, **fields)
+
+    def error(self, message: str, **fields):
+        self.log("error", message, **fields)
+
+
+# 로그 쓰기 인스턴스와 카테고리별 설정
+log_writer = LogWriter()
+_category_levels = parse_category_settings(LOG_LEVELS, str)
+_category_sample_rates = parse_category_settings(LOG_SAMPLE_RATES, float)
+_loggers: Dict[str, Logger] = {}
+
+
+def get_logger(category: str) -> Logger:
+    """카테고리별 로거 반환 (같은 카테고리는 같은 인스턴스)"""
+    logger = _loggers.get(category)
+    if logger is None:
+        logger = _loggers[category] = Logger(
+            category,
+            log_writer,
+            level=_category_levels.get(category, LOG_LEVEL),
+            sample_rate=_category_sample_rates.get(category, 1.0),
+        )
+    return logger